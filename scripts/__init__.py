@@ -1,2 +1,29 @@
 __version__ = "1.0.0b"
 __url__ = "https://github.com/nillyr/octowriter"
+
+# The generators are imported on first access (PEP 562), so that using one output format does
+# not load the dependencies of the others
+_LAZY_EXPORTS = {
+    "PDFGenerator": ".generate_pdf",
+    "XLSGenerator": ".generate_xls",
+    "ReportGenerator": ".generate_report",
+    "ColumnarGenerator": ".generate_columnar",
+    "ReportModel": ".report_model",
+    "ResultsStore": ".results_store",
+    "WorkspaceManager": ".workspace",
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    import importlib
+
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_EXPORTS))
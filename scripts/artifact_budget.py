@@ -0,0 +1,271 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+"""
+Generates the reports of fixed fixture results and checks their metrics against budgets, so
+that a change bloating the reports fails loudly.
+
+The metrics are the XLSX size and compression ratio, its formula cells, data validations and
+conditional formats, the number and size of the AsciiDoc files, and the PDF pages and size
+(of the draft backend, and of asciidoctor-pdf when it is installed).
+
+Usage: python -m scripts.artifact_budget [--json] [--scale FACTOR]
+"""
+
+import argparse
+from dataclasses import dataclass
+import json
+from pathlib import Path
+import re
+import sys
+import tempfile
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import zipfile
+
+from .generate_pdf import PDFGenerator
+from .generate_report import to_xls_report_information
+from .generate_xls import XLSGenerator
+from .report_model import LEVELS, ReportModel
+
+_FORMULA_REGEX = re.compile(rb"<f[ >]")
+_VALIDATION_REGEX = re.compile(rb"<dataValidation[ >]")
+_CONDITIONAL_FORMAT_REGEX = re.compile(rb"<cfRule[ >]")
+_PAGE_COUNT_REGEX = re.compile(
+    rb"/Type\s*/Pages\b[^>]*?/Count\s+(\d+)|/Count\s+(\d+)[^>]*?/Type\s*/Pages\b"
+)
+
+# Report information of the fixtures: fixed, so that the reports do not depend on the day
+REPORT_INFORMATION = {
+    "filename": "budget",
+    "document-title": "Compliance report",
+    "audited_asset": "srv-budget-01",
+    "auditee_name": "Auditee",
+    "auditee_contact_full_name": "Alice Auditee; Bob Auditee",
+    "auditee_contact_email": "alice@auditee.example; bob@auditee.example",
+    "project_manager_full_name": "Paul Manager",
+    "project_manager_email": "paul@auditor.example",
+    "authors_list_full_name": "Anna Author",
+    "authors_list_email": "anna@auditor.example",
+    "baseline_name": "Budget baseline",
+    "revnumber": "1.0",
+    "revdate": "2021-01-01",
+    "classification-level": "Internal",
+    "auditor-company-name": "Auditor",
+}
+
+
+@dataclass
+class Fixture:
+    name: str
+    categories: int
+    rules: int
+    # Lines of terminal output of each rule
+    output_lines: int = 5
+    streaming: bool = False
+
+
+FIXTURES = [
+    Fixture("small", categories=3, rules=5),
+    Fixture("large", categories=20, rules=50),
+    Fixture("large-streaming", categories=20, rules=50, streaming=True),
+]
+
+# Maximum value of each metric (minimum for the `_min` metrics). The budgets leave ~15% of
+# headroom over the values measured when they were set: update them deliberately, with the
+# reason, when a report must grow. The asciidoctor-pdf metrics (`pdf_*`) are only reported until
+# budgets are measured on a host with asciidoctor-pdf.
+# fmt:off
+BUDGETS: Dict[str, Dict[str, float]] = {
+    "small": {
+        "xlsx_bytes": 16_000, "xlsx_compression_ratio_min": 3.0, "xlsx_formula_cells": 42,
+        "xlsx_validations": 36, "xlsx_conditional_formats": 50,
+        "adoc_files": 25, "adoc_bytes": 18_500,
+        "draft_pdf_pages": 11, "draft_pdf_bytes": 10_500,
+    },
+    "large": {
+        "xlsx_bytes": 80_000, "xlsx_compression_ratio_min": 8.5, "xlsx_formula_cells": 220,
+        "xlsx_validations": 2_300, "xlsx_conditional_formats": 325,
+        "adoc_files": 1_050, "adoc_bytes": 980_000,
+        "draft_pdf_pages": 400, "draft_pdf_bytes": 440_000,
+    },
+    "large-streaming": {
+        "xlsx_bytes": 72_000, "xlsx_compression_ratio_min": 5.7, "xlsx_formula_cells": 220,
+        # A single ranged validation per column instead of one per row
+        "xlsx_validations": 48, "xlsx_conditional_formats": 325,
+        "adoc_files": 1_050, "adoc_bytes": 980_000,
+        "draft_pdf_pages": 400, "draft_pdf_bytes": 440_000,
+    },
+}
+# fmt:on
+
+
+def make_fixture_results(fixture: Fixture) -> SimpleNamespace:
+    """
+    Returns deterministic results shaped like an octoconf `Baseline`.
+    """
+    categories = []
+    for c in range(fixture.categories):
+        rules = []
+        for r in range(fixture.rules):
+            rules.append(
+                SimpleNamespace(
+                    id=f"{c + 1}.{r + 1}",
+                    title=f"Rule {c + 1}.{r + 1} of the budget baseline",
+                    description="Checks that the setting is configured as recommended.",
+                    level=LEVELS[r % len(LEVELS)],
+                    severity=("low", "medium", "high")[r % 3],
+                    check=f"grep -E '^setting_{r}' /etc/budget.conf",
+                    expected=f"setting_{r} = enabled",
+                    output="\n".join(
+                        f"line {line}: setting_{r} = value"
+                        for line in range(fixture.output_lines)
+                    ),
+                    compliant=(c + r) % 3 != 0,
+                    recommendation=f"Set setting_{r} to enabled.",
+                    references=[f"https://example.org/budget/{c + 1}/{r + 1}"],
+                )
+            )
+        categories.append(
+            SimpleNamespace(
+                category=f"category_{c + 1}",
+                name=f"Category {c + 1}",
+                description="Settings of the budget category.",
+                rules=rules,
+            )
+        )
+    return SimpleNamespace(title="Budget baseline", categories=categories)
+
+
+def xlsx_metrics(path: Path) -> Dict[str, float]:
+    size = path.stat().st_size
+    uncompressed = 0
+    formulas = validations = conditional_formats = 0
+    with zipfile.ZipFile(path) as archive:
+        for info in archive.infolist():
+            uncompressed += info.file_size
+            if info.filename.startswith("xl/worksheets/"):
+                content = archive.read(info)
+                formulas += len(_FORMULA_REGEX.findall(content))
+                validations += len(_VALIDATION_REGEX.findall(content))
+                conditional_formats += len(_CONDITIONAL_FORMAT_REGEX.findall(content))
+    return {
+        "xlsx_bytes": size,
+        "xlsx_compression_ratio_min": round(uncompressed / size, 2),
+        "xlsx_formula_cells": formulas,
+        "xlsx_validations": validations,
+        "xlsx_conditional_formats": conditional_formats,
+    }
+
+
+def adoc_metrics(build_dir: Path) -> Dict[str, float]:
+    files = list(build_dir.glob("*.adoc"))
+    return {"adoc_files": len(files), "adoc_bytes": sum(f.stat().st_size for f in files)}
+
+
+def pdf_metrics(path: Path, prefix: str = "pdf") -> Dict[str, float]:
+    content = path.read_bytes()
+    counts = [int(a or b) for a, b in _PAGE_COUNT_REGEX.findall(content)]
+    # The root of the page tree has the largest count
+    return {f"{prefix}_pages": max(counts, default=0), f"{prefix}_bytes": len(content)}
+
+
+def measure(fixture: Fixture, work_dir: Path) -> Dict[str, float]:
+    results = make_fixture_results(fixture)
+    model = ReportModel.build(results)
+    output_dir = work_dir / fixture.name
+    output_dir.mkdir()
+
+    xlsx_path = XLSGenerator().generate_xls(
+        "budget",
+        results,
+        output_dir,
+        streaming=fixture.streaming,
+        model=model,
+        report_information=to_xls_report_information(REPORT_INFORMATION),
+    )
+    metrics = xlsx_metrics(xlsx_path)
+
+    # The AsciiDoc files are generated as generate_pdf does, then rendered if possible
+    pdf_generator = PDFGenerator()
+    pdf_generator._use_theme("default")
+    build_dir, _ = pdf_generator._generate_front_matter(
+        "budget", results.title, output_dir, None, "default", "default.yml", REPORT_INFORMATION
+    )
+    pdf_generator._generate_synthesis_file(model, build_dir)
+    pdf_generator._generate_categories_files(model.categories, build_dir)
+    metrics.update(adoc_metrics(build_dir))
+
+    # The draft backend is always measured, asciidoctor-pdf when it is installed
+    draft_path = pdf_generator.generate_pdf(
+        "budget-draft",
+        results,
+        output_dir,
+        model=model,
+        report_information=REPORT_INFORMATION,
+        draft=True,
+    )
+    metrics.update(pdf_metrics(draft_path, "draft_pdf"))
+    if pdf_generator._is_asciidoctor_pdf_installed():
+        pdf_path = pdf_generator.generate_pdf(
+            "budget", results, output_dir, model=model, report_information=REPORT_INFORMATION
+        )
+        if pdf_path is not None:
+            metrics.update(pdf_metrics(pdf_path))
+    return metrics
+
+
+def check(name: str, metrics: Dict[str, float], scale: float = 1.0) -> List[str]:
+    """
+    Returns the metrics of the fixture `name` which are over their budget.
+    """
+    failures = []
+    for metric, budget in BUDGETS.get(name, {}).items():
+        value = metrics.get(metric)
+        if value is None:
+            continue
+        if metric.endswith("_min"):
+            if value < budget / scale:
+                failures.append(f"{name}: {metric} = {value} < {budget / scale:g}")
+        elif value > budget * scale:
+            failures.append(f"{name}: {metric} = {value} > {budget * scale:g}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--json", action="store_true", help="print the metrics as JSON")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="factor applied to the budgets"
+    )
+    parser.add_argument("fixtures", nargs="*", help="only measure these fixtures")
+    args = parser.parse_args(argv)
+
+    all_metrics: Dict[str, Dict[str, float]] = dict()
+    failures: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="octowriter-budget-") as work_dir:
+        for fixture in FIXTURES:
+            if args.fixtures and fixture.name not in args.fixtures:
+                continue
+            all_metrics[fixture.name] = measure(fixture, Path(work_dir))
+            failures += check(fixture.name, all_metrics[fixture.name], args.scale)
+
+    if args.json:
+        print(json.dumps(all_metrics, indent=2))
+    else:
+        for name, metrics in all_metrics.items():
+            print(f"{name}:")
+            for metric, value in metrics.items():
+                budget = BUDGETS.get(name, {}).get(metric)
+                print(f"  {metric:<28} {value:>12} {'' if budget is None else f'(budget {budget:g})'}")
+
+    for failure in failures:
+        print(f"[x] Over budget: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,229 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Iterable, List, Optional, Tuple
+
+from octoconf.utils.logger import *
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+logger = logging.getLogger(__name__)
+
+_RULE_ATTRIBUTES = (
+    "id",
+    "title",
+    "description",
+    "level",
+    "severity",
+    "check",
+    "expected",
+    "output",
+    "compliant",
+    "recommendation",
+    "references",
+)
+
+
+def _update(digest, value: object) -> None:
+    # Canonical JSON: the same values always give the same bytes, whatever the dict order
+    digest.update(json.dumps(value, sort_keys=True, default=str).encode("utf-8"))
+    digest.update(b"\0")
+
+
+def results_fingerprint(baseline: Baseline) -> str:
+    """
+    Returns the SHA-256 of the normalized results: the title, then the categories and their rules
+    with all their attributes, in the order of the report.
+    """
+    digest = hashlib.sha256()
+    _update(digest, baseline.title)
+    for category in baseline.categories:
+        _update(digest, [category.category, category.name, category.description])
+        for rule in category.rules:
+            _update(digest, [getattr(rule, name, None) for name in _RULE_ATTRIBUTES])
+    return digest.hexdigest()
+
+
+def files_fingerprint(paths: Iterable[Path], root: Optional[Path] = None) -> str:
+    """
+    Returns the SHA-256 of the content of the files (and of their path relative to `root`).
+    Missing files are part of the fingerprint, as missing.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        _update(digest, str(path.relative_to(root)) if root else str(path))
+        try:
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(1 << 20), b""):
+                    digest.update(chunk)
+        except FileNotFoundError:
+            _update(digest, None)
+    return digest.hexdigest()
+
+
+def directory_fingerprint(directory: Path) -> str:
+    """
+    Returns the SHA-256 of all the files of `directory`, e.g. a template folder.
+    """
+    return files_fingerprint(
+        (path for path in directory.rglob("*") if path.is_file()), directory
+    )
+
+
+def fingerprint(*parts: object) -> str:
+    """
+    Returns the cache key of an artifact generated from `parts` (JSON serializable values,
+    typically other fingerprints, the report information, the locale and the tool versions).
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        _update(digest, part)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    Content-addressed cache of generated reports.
+
+    An artifact is stored under its key (see `fingerprint`), which covers every input of the
+    generation: when the key is found, the cached report is copied (or hardlinked, with `link`)
+    instead of being generated again.
+
+    The cache is bounded to `max_size` bytes: the least recently used artifacts are evicted
+    first. The last use of an artifact is its modification time, updated on each hit, so the
+    cache directory can be shared by several processes.
+
+    Note: with `link`, the report and the cached artifact are the same file, which must then not
+    be modified in place.
+    """
+
+    def __init__(self, directory: Path, max_size: int = 1 << 30, link: bool = False) -> None:
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        logger.info(
+            f"Init ArtifactCache with directory = {self.directory}, max_size = {max_size}, link = {link}"
+        )
+
+    def _path(self, key: str, suffix: str) -> Path:
+        # Two levels, to keep the directories small
+        return self.directory / key[:2] / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str) -> Optional[Path]:
+        """
+        Returns the cached artifact of `key`, or None, and marks it as recently used.
+        """
+        path = self._path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            logger.debug(f"Cache miss: {key}{suffix}")
+            return None
+
+        with self._lock:
+            self.hits += 1
+        logger.debug(f"Cache hit: {path}")
+        return path
+
+    def fetch(self, key: str, suffix: str, destination: Path) -> bool:
+        """
+        Copies (or hardlinks) the cached artifact of `key` to `destination`. Returns False when it
+        is not cached.
+        """
+        path = self.get(key, suffix)
+        if path is None:
+            return False
+
+        try:
+            if self.link:
+                destination.unlink(missing_ok=True)
+                try:
+                    os.link(path, destination)
+                    return True
+                except OSError:
+                    # e.g. another file system
+                    logger.debug(f"Unable to hardlink {path}, copying it")
+            shutil.copyfile(path, destination)
+        except FileNotFoundError:
+            # Evicted in the meantime by another process
+            logger.debug(f"{path} was evicted before being copied")
+            return False
+        return True
+
+    def put(self, key: str, suffix: str, artifact: Path) -> Path:
+        """
+        Stores a copy of `artifact` under `key`, then evicts the least recently used artifacts if
+        the cache is over its size. Returns the path of the cached artifact.
+        """
+        path = self._path(key, suffix)
+        path.parent.mkdir(exist_ok=True)
+
+        # Copied next to its final path then renamed: a concurrent reader never sees a partial file
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as file, open(artifact, "rb") as src:
+                shutil.copyfileobj(src, file)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+        logger.debug(f"Cached {artifact} as {path}")
+        self.evict()
+        return path
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries = []
+        for path in self.directory.glob("*/*"):
+            if path.name.startswith(".tmp-"):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, max_size: Optional[int] = None) -> int:
+        """
+        Removes the least recently used artifacts until the cache fits in `max_size` bytes
+        (defaults to `max_size`). Returns the number of bytes removed.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        with self._lock:
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in entries:
+                if total - removed <= max_size:
+                    break
+                path.unlink(missing_ok=True)
+                removed += size
+                logger.debug(f"Evicted {path} ({size} bytes)")
+        return removed
+
+    def clear(self) -> None:
+        self.evict(0)
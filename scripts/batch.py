@@ -0,0 +1,496 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+import json
+import logging
+import multiprocessing
+import os
+from pathlib import Path
+import time
+import traceback
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set
+
+import configparser
+
+from octoconf.utils.logger import *
+from octoconf.utils.timestamp import today
+
+from . import __version__
+from .artifact_cache import (
+    directory_fingerprint,
+    files_fingerprint,
+    fingerprint,
+    results_fingerprint,
+)
+from .generate_pdf import PDFGenerator
+from .generate_xls import XLSGenerator
+from .workspace import WorkspaceManager
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class XLSJob:
+    filename: str
+    results: Baseline
+    output_dir: Path
+    ini_file: Optional[Path] = None
+    streaming: bool = False
+
+
+@dataclass
+class JobResult:
+    filename: str
+    output_path: Optional[Path]
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None
+
+
+def _run_xls_job(job: XLSJob) -> JobResult:
+    # Runs in a worker process: each job gets its own generator, and the style sheet is
+    # compiled once per worker process
+    start = time.perf_counter()
+    try:
+        output_path = XLSGenerator().generate_xls(
+            job.filename,
+            job.results,
+            job.output_dir,
+            ini_file=job.ini_file,
+            streaming=job.streaming,
+        )
+    except Exception:
+        logger.exception(f"Unable to generate the XLSX report '{job.filename}'")
+        return JobResult(
+            job.filename, None, time.perf_counter() - start, traceback.format_exc()
+        )
+
+    return JobResult(job.filename, output_path, time.perf_counter() - start)
+
+
+# Queue of the indexes of the jobs started by the workers of the current pool, see `_run_pool`
+_started_jobs = None
+
+
+def _init_pool_worker(started_jobs, initializer: Optional[Callable], initargs: tuple) -> None:
+    global _started_jobs
+    _started_jobs = started_jobs
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_pool_job(function: Callable, index: int, job: Any) -> Any:
+    # SimpleQueue.put writes into the pipe before returning: the start is known even when the
+    # worker process dies right after
+    _started_jobs.put(index)
+    return function(job)
+
+
+def _run_pool(
+    function: Callable[[Any], Any],
+    jobs: Dict[int, Any],
+    on_done: Callable[[int, Any], None],
+    on_crash: Callable[[int, float, str], Any],
+    on_start: Optional[Callable[[int], None]] = None,
+    max_workers: Optional[int] = None,
+    mp_context=None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> None:
+    """
+    Runs `function` on each job (by index) in a pool of `max_workers` processes and calls
+    `on_done(index, result)` as soon as each job is done, and `on_start(index)` when a worker
+    starts it.
+
+    When a worker process dies (e.g. killed by the OOM killer), the pool is broken and all its
+    jobs are lost: the jobs which had not started yet are run again in a new pool, and the ones
+    which were running are run again, alone, so that only the job crashing its worker is
+    reported as failed, with `on_crash(index, elapsed, error)`. The elapsed time of a job is
+    measured from its first submission.
+    """
+    context = mp_context or multiprocessing.get_context()
+    submitted: Dict[int, float] = dict()
+    queued = list(jobs)
+    # Jobs running when a worker died: one of them crashed it
+    suspects: List[int] = []
+
+    while queued or suspects:
+        if queued:
+            batch, queued, workers = queued, [], max_workers
+        else:
+            batch, workers = [suspects.pop(0)], 1
+
+        started_jobs = context.SimpleQueue()
+        started: Set[int] = set()
+        finished: Set[int] = set()
+        broken = None
+
+        def read_started() -> None:
+            while not started_jobs.empty():
+                index = started_jobs.get()
+                started.add(index)
+                if on_start is not None:
+                    on_start(index)
+
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_pool_worker,
+            initargs=(started_jobs, initializer, initargs),
+        ) as executor:
+            futures = dict()
+            for index in batch:
+                submitted.setdefault(index, time.perf_counter())
+                futures[executor.submit(_run_pool_job, function, index, jobs[index])] = index
+
+            not_done = set(futures)
+            while not_done and broken is None:
+                done, not_done = wait(not_done, timeout=0.5, return_when=FIRST_COMPLETED)
+                read_started()
+                for future in done:
+                    index = futures[future]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        broken = e
+                        continue
+                    except Exception:
+                        # e.g. the job or its result cannot be pickled
+                        logger.exception(f"The job {index} failed in its worker")
+                        result = on_crash(
+                            index, time.perf_counter() - submitted[index], traceback.format_exc()
+                        )
+                    finished.add(index)
+                    on_done(index, result)
+
+        started_jobs.close()
+        if broken is None:
+            continue
+
+        unfinished = [index for index in batch if index not in finished]
+        if workers == 1:
+            # Run alone: this job crashed its worker
+            index = unfinished[0]
+            logger.error(f"The job {index} crashed its worker: {broken}")
+            on_done(
+                index,
+                on_crash(index, time.perf_counter() - submitted[index], repr(broken)),
+            )
+            continue
+
+        running = [index for index in unfinished if index in started]
+        logger.warning(
+            f"A worker process died, running again {len(running)} interrupted jobs alone and {len(unfinished) - len(running)} queued jobs"
+        )
+        # Without any started job (e.g. the initializer crashed), all the jobs are suspects
+        suspects.extend(running or unfinished)
+        queued = [index for index in unfinished if index not in running] if running else []
+
+
+def generate_xls_batch(
+    jobs: List[XLSJob],
+    max_workers: Optional[int] = None,
+    mp_context=None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> List[JobResult]:
+    """
+    Generates the XLSX reports of the jobs in a pool of `max_workers` processes (defaults to the
+    number of CPUs) and returns one result per job, in the order of the jobs.
+
+    A job that fails is reported in its result and does not stop the other jobs. When a job
+    crashes its worker process, the other jobs are run again (see `_run_pool`) and only this
+    job is reported as failed. The workers inherit the octoconf configuration and locale of the
+    current process when they are forked; with another start method (`mp_context`), use
+    `initializer` to load them in each worker.
+    """
+    logger.info(f"Running XLSX batch generation of {len(jobs)} jobs with max_workers = {max_workers}")
+    results: List[Optional[JobResult]] = [None] * len(jobs)
+
+    def on_done(index: int, result: JobResult) -> None:
+        results[index] = result
+        logger.debug(f"Job {jobs[index].filename} done: {result}")
+
+    _run_pool(
+        _run_xls_job,
+        dict(enumerate(jobs)),
+        on_done,
+        lambda index, elapsed, error: JobResult(jobs[index].filename, None, elapsed, error),
+        max_workers=max_workers,
+        mp_context=mp_context,
+        initializer=initializer,
+        initargs=initargs,
+    )
+    return results
+
+
+@dataclass
+class ReportJob:
+    filename: str
+    results: Baseline
+    output_dir: Path
+    # Required for the PDF report: the information cannot be prompted in a worker process
+    ini_file: Optional[Path] = None
+    theme_dir: str = "default"
+    pdf_theme: str = "default.yml"
+    streaming: bool = False
+    report_date: Optional[str] = None
+    pdf: bool = True
+    xlsx: bool = True
+
+    @property
+    def key(self) -> str:
+        return str(Path(self.output_dir) / self.filename)
+
+    @property
+    def outputs(self) -> List[Path]:
+        suffixes = [".pdf"] * self.pdf + [".xlsx"] * self.xlsx
+        return [Path(self.output_dir) / f"{self.filename}{suffix}" for suffix in suffixes]
+
+
+@dataclass
+class ReportJobResult:
+    filename: str
+    # "rendered", "skipped" (rendered by a previous run with the same inputs) or "failed"
+    status: str
+    outputs: List[Path]
+    elapsed: float
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status in ("rendered", "skipped")
+
+
+class BatchJournal:
+    """
+    Append-only journal of the states of the jobs of a batch, one JSON object per line:
+    `pending` when the batch starts, `building` when a worker starts the job, then `rendered` or
+    `failed`. Each entry has the fingerprint of the job inputs.
+
+    Each entry is flushed to the disk before the batch goes on, so after a crash the journal
+    tells which jobs were completed. A truncated last line (crash while writing) is ignored.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._repaired = False
+
+    def _repair(self) -> None:
+        # Terminates a truncated last line, otherwise the next entry would be appended to it
+        try:
+            with open(self.path, "rb+") as file:
+                file.seek(0, os.SEEK_END)
+                if file.tell() == 0:
+                    return
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    file.write(b"\n")
+        except FileNotFoundError:
+            pass
+
+    def append(self, job: str, state: str, inputs: str, **details) -> None:
+        if not self._repaired:
+            self._repair()
+            self._repaired = True
+
+        entry = {"job": job, "state": state, "inputs": inputs, "time": time.time(), **details}
+        with open(self.path, "a") as file:
+            file.write(json.dumps(entry, default=str) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    def states(self) -> Dict[str, dict]:
+        """
+        Returns the last entry of each job.
+        """
+        states: Dict[str, dict] = dict()
+        try:
+            with open(self.path, "r") as file:
+                for line in file:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f"Ignoring a truncated entry of the journal {self.path}")
+                        continue
+                    states[entry["job"]] = entry
+        except FileNotFoundError:
+            pass
+        return states
+
+    def compact(self) -> None:
+        """
+        Rewrites the journal with the last entry of each job only.
+        """
+        states = self.states()
+        tmp = self.path.with_name(f".{self.path.name}.tmp")
+        with open(tmp, "w") as file:
+            for entry in states.values():
+                file.write(json.dumps(entry, default=str) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, self.path)
+
+
+def job_fingerprint(job: ReportJob, pdf_generator: Optional[PDFGenerator] = None) -> str:
+    """
+    Returns the fingerprint of the inputs of the job: results, ini file (and auditee logo),
+    theme, options and report date (today when not set, as in the reports).
+    """
+    logo = None
+    if job.ini_file:
+        cfg_parser = configparser.ConfigParser()
+        cfg_parser.read(job.ini_file)
+        logo = cfg_parser.get("DEFAULT", "auditee_logo_path", fallback=None)
+
+    theme = None
+    if job.pdf:
+        theme_directory = (pdf_generator or PDFGenerator())._get_theme_directory(job.theme_dir)
+        theme = directory_fingerprint(theme_directory)
+
+    return fingerprint(
+        __version__,
+        results_fingerprint(job.results),
+        files_fingerprint([Path(job.ini_file)]) if job.ini_file else None,
+        files_fingerprint([Path(logo)]) if logo else None,
+        theme,
+        job.pdf_theme,
+        job.streaming,
+        job.pdf,
+        job.xlsx,
+        job.report_date or today(),
+    )
+
+
+def _run_report_job(job: ReportJob) -> ReportJobResult:
+    # Runs in a worker process
+    start = time.perf_counter()
+    outputs = []
+    try:
+        if job.pdf:
+            if not job.ini_file:
+                raise ValueError("An ini file is required to generate the PDF report in a batch")
+            # The jobs may share an output directory: each one is built in its own workspace,
+            # and only its PDF is moved into the output directory
+            pdf_path = PDFGenerator(workspace_manager=WorkspaceManager()).generate_pdf(
+                job.filename,
+                job.results,
+                job.output_dir,
+                ini_file=job.ini_file,
+                theme_dir=job.theme_dir,
+                pdf_theme=job.pdf_theme,
+                report_date=job.report_date,
+            )
+            if pdf_path is None:
+                raise RuntimeError(f"The PDF report '{job.filename}' was not generated")
+            outputs.append(pdf_path)
+        if job.xlsx:
+            outputs.append(
+                XLSGenerator().generate_xls(
+                    job.filename,
+                    job.results,
+                    job.output_dir,
+                    ini_file=job.ini_file,
+                    streaming=job.streaming,
+                    report_date=job.report_date,
+                )
+            )
+    except Exception:
+        logger.exception(f"Unable to generate the reports '{job.filename}'")
+        return ReportJobResult(
+            job.filename, "failed", outputs, time.perf_counter() - start, traceback.format_exc()
+        )
+
+    return ReportJobResult(job.filename, "rendered", outputs, time.perf_counter() - start)
+
+
+def generate_report_batch(
+    jobs: List[ReportJob],
+    journal: BatchJournal,
+    max_workers: Optional[int] = None,
+    mp_context=None,
+    initializer: Optional[Callable] = None,
+    initargs: tuple = (),
+) -> List[ReportJobResult]:
+    """
+    Generates the PDF and XLSX reports of the jobs in a pool of `max_workers` processes, as
+    `generate_xls_batch` does, and returns one result per job, in the order of the jobs. Each
+    PDF report is built in its own workspace, so the jobs may share an output directory.
+
+    The states of the jobs are recorded in the `journal`. When the batch is run again after a
+    crash, the jobs already rendered with the same inputs (and whose reports still exist) are
+    skipped; the others (pending, interrupted while building, failed, or whose inputs changed)
+    are generated again.
+    """
+    logger.info(f"Running report batch generation of {len(jobs)} jobs with journal = {journal.path}")
+    results: List[Optional[ReportJobResult]] = [None] * len(jobs)
+    states = journal.states()
+    pdf_generator = PDFGenerator()
+
+    to_run = []
+    for index, job in enumerate(jobs):
+        inputs = job_fingerprint(job, pdf_generator)
+        state = states.get(job.key)
+        if (
+            state is not None
+            and state["state"] == "rendered"
+            and state["inputs"] == inputs
+            and all(path.exists() for path in job.outputs)
+        ):
+            logger.debug(f"Job {job.filename} already rendered, skipped")
+            results[index] = ReportJobResult(job.filename, "skipped", job.outputs, 0.0)
+            continue
+        journal.append(job.key, "pending", inputs)
+        to_run.append((index, inputs))
+
+    logger.info(f"{len(jobs) - len(to_run)} jobs already rendered, {len(to_run)} jobs to run")
+    if not to_run:
+        return results
+
+    fingerprints = dict(to_run)
+
+    def on_start(index: int) -> None:
+        journal.append(jobs[index].key, "building", fingerprints[index])
+
+    def on_done(index: int, result: ReportJobResult) -> None:
+        job = jobs[index]
+        journal.append(
+            job.key,
+            result.status,
+            fingerprints[index],
+            outputs=[str(path) for path in result.outputs],
+            elapsed=result.elapsed,
+            error=result.error,
+        )
+        results[index] = result
+        logger.debug(f"Job {job.filename} done: {result}")
+
+    # A job crashing its worker does not fail the others, see `_run_pool`
+    _run_pool(
+        _run_report_job,
+        {index: jobs[index] for index, _ in to_run},
+        on_done,
+        lambda index, elapsed, error: ReportJobResult(
+            jobs[index].filename, "failed", [], elapsed, error
+        ),
+        on_start=on_start,
+        max_workers=max_workers,
+        mp_context=mp_context,
+        initializer=initializer,
+        initargs=initargs,
+    )
+    return results
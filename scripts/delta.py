@@ -0,0 +1,97 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+import copy
+from dataclasses import dataclass, field
+import logging
+from typing import TYPE_CHECKING, List, Optional
+
+from octoconf.utils.logger import *
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+    from octoconf.entities.category import Category
+    from octoconf.entities.rule import Rule
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RuleDelta:
+    category: Category
+    rule: Rule
+    # None when the rule was not part of the previous results
+    previous: Optional[Rule]
+
+
+@dataclass
+class BaselineDelta:
+    newly_failing: List[RuleDelta] = field(default_factory=list)
+    newly_fixed: List[RuleDelta] = field(default_factory=list)
+    unchanged: List[RuleDelta] = field(default_factory=list)
+    # Categories of the current results
+    categories: List[Category] = field(default_factory=list)
+
+    @property
+    def changed(self) -> List[RuleDelta]:
+        return self.newly_failing + self.newly_fixed
+
+    def changed_categories(self) -> List[Category]:
+        """
+        Returns shallow copies of the categories, with only the rules whose result changed,
+        in the order of the current results.
+        """
+        changed_ids = {id(rule_delta.rule) for rule_delta in self.changed}
+        changed_categories = []
+        for category in self.categories:
+            rules = [rule for rule in category.rules if id(rule) in changed_ids]
+            if rules:
+                changed_category = copy.copy(category)
+                changed_category.rules = rules
+                changed_categories.append(changed_category)
+        return changed_categories
+
+
+def compute_delta(previous: Baseline, current: Baseline) -> BaselineDelta:
+    """
+    Compares the results of two audits of the same host, indexing the previous results by rule id.
+
+    A rule missing from the previous results is considered newly failing when it fails, and
+    unchanged otherwise. The rules missing from the current results are ignored.
+    """
+    if previous.title != current.title:
+        logger.warning(
+            f"Computing the delta between different baselines: '{previous.title}' and '{current.title}'"
+        )
+
+    previous_rules = {
+        rule.id: rule for category in previous.categories for rule in category.rules
+    }
+
+    delta = BaselineDelta(categories=list(current.categories))
+    for category in current.categories:
+        for rule in category.rules:
+            previous_rule = previous_rules.pop(rule.id, None)
+            was_compliant = previous_rule is None or previous_rule.compliant == True
+            is_compliant = rule.compliant == True
+
+            rule_delta = RuleDelta(category, rule, previous_rule)
+            if was_compliant and not is_compliant:
+                delta.newly_failing.append(rule_delta)
+            elif not was_compliant and is_compliant:
+                delta.newly_fixed.append(rule_delta)
+            else:
+                delta.unchanged.append(rule_delta)
+
+    if previous_rules:
+        logger.info(f"Rules missing from the current results: {list(previous_rules)}")
+
+    logger.debug(
+        f"Delta: {len(delta.newly_failing)} newly failing, {len(delta.newly_fixed)} newly fixed, {len(delta.unchanged)} unchanged"
+    )
+    return delta
@@ -0,0 +1,434 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import BinaryIO, Callable, List, Optional, Tuple
+import zlib
+
+from octoconf.utils.logger import *
+import octoconf.utils.global_values as global_values
+
+from .lazy_import import lazy_import
+from .report_model import ReportModel
+
+config = lazy_import("octoconf.utils.config")
+
+logger = logging.getLogger(__name__)
+
+# A4, in points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+MARGIN = 56
+
+# Standard Type 1 fonts: they are not embedded, every PDF reader provides them
+_FONTS = {
+    "F1": "Helvetica",
+    "F2": "Helvetica-Bold",
+    "F3": "Courier",
+}
+
+# Widths (1/1000 em) of the printable ASCII characters, from the Adobe font metrics
+# fmt:off
+_HELVETICA_WIDTHS = dict(zip(map(chr, range(32, 127)), [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]))
+_HELVETICA_BOLD_WIDTHS = dict(zip(map(chr, range(32, 127)), [
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584,
+]))
+# fmt:on
+_COURIER_WIDTH = 600
+
+Color = Tuple[float, float, float]
+_BLACK: Color = (0, 0, 0)
+_GREY: Color = (0.4, 0.4, 0.4)
+
+
+def _text_width(text: str, font: str, size: float) -> float:
+    if font == "F3":
+        return _COURIER_WIDTH * len(text) * size / 1000
+    widths = _HELVETICA_BOLD_WIDTHS if font == "F2" else _HELVETICA_WIDTHS
+    return sum(widths.get(char, 556) for char in text) * size / 1000
+
+
+def _pdf_string(text: str) -> bytes:
+    # The standard fonts use the WinAnsi (cp1252) encoding
+    data = text.encode("cp1252", errors="replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def _pdf_text_string(text: str) -> bytes:
+    # Document information strings: UTF-16BE with a byte order mark
+    return b"<FEFF" + text.encode("utf-16-be").hex().upper().encode("ascii") + b">"
+
+
+def _parse_color(value: str, default: Color) -> Color:
+    value = (value or "").strip().lstrip("#")
+    try:
+        return tuple(int(value[i : i + 2], 16) / 255 for i in (0, 2, 4))
+    except ValueError:
+        return default
+
+
+class PDFStreamWriter:
+    """
+    Minimal PDF 1.4 writer: each page is written to `file` as soon as it is added, so only the
+    offsets of the objects are kept in memory. `file` does not need to be seekable.
+    """
+
+    def __init__(self, file: BinaryIO) -> None:
+        self._file = file
+        self._position = 0
+        # Offset of each object, by object number (0 is the head of the free list)
+        self._offsets: List[Optional[int]] = [0]
+        self._page_ids: List[int] = []
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        # Catalog and page tree are written last, when all the pages are known
+        self._catalog_id = self._reserve()
+        self._pages_id = self._reserve()
+        self._font_ids = {
+            name: self._add_object(
+                b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>"
+                % base_font.encode("ascii")
+            )
+            for name, base_font in _FONTS.items()
+        }
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._position += len(data)
+
+    def _reserve(self) -> int:
+        self._offsets.append(None)
+        return len(self._offsets) - 1
+
+    def _add_object(self, body: bytes, object_id: Optional[int] = None) -> int:
+        if object_id is None:
+            object_id = self._reserve()
+        self._offsets[object_id] = self._position
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+        return object_id
+
+    def add_page(
+        self, content: bytes, width: float = PAGE_WIDTH, height: float = PAGE_HEIGHT
+    ) -> None:
+        data = zlib.compress(content)
+        stream_id = self._add_object(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(data), data)
+        )
+        fonts = b" ".join(
+            b"/%s %d 0 R" % (name.encode("ascii"), font_id)
+            for name, font_id in self._font_ids.items()
+        )
+        self._page_ids.append(
+            self._add_object(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %g %g] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+                % (self._pages_id, width, height, fonts, stream_id)
+            )
+        )
+
+    def close(self, title: str = "", subject: str = "") -> None:
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._add_object(
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._page_ids)),
+            self._pages_id,
+        )
+        self._add_object(b"<< /Type /Catalog /Pages %d 0 R >>" % self._pages_id, self._catalog_id)
+        info_id = self._add_object(
+            b"<< /Title %s /Subject %s /Producer %s >>"
+            % (_pdf_text_string(title), _pdf_text_string(subject), _pdf_text_string("octowriter"))
+        )
+
+        xref = self._position
+        entries = [b"0000000000 65535 f \n"]
+        entries += [b"%010d 00000 n \n" % offset for offset in self._offsets[1:]]
+        self._write(b"xref\n0 %d\n%s" % (len(self._offsets), b"".join(entries)))
+        self._write(
+            b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(self._offsets), self._catalog_id, info_id, xref)
+        )
+
+
+class DraftPDFRenderer:
+    """
+    Renders the report (title page, participants, synthesis of the non-conformities, then the
+    rules of each category) directly into a PDF, without asciidoctor-pdf.
+
+    The layout is simple (standard fonts, no table of contents, no theme): it is meant for
+    drafts, and as a fallback when asciidoctor-pdf cannot be installed. The pages are written as
+    soon as they are full, so the memory usage does not grow with the size of the report.
+    """
+
+    _line_height = 1.3
+
+    def __init__(self, gettext: Optional[Callable[[str], str]] = None) -> None:
+        # Translations of the generator, the global octoconf ones by default
+        self._gettext = gettext
+        self._writer: Optional[PDFStreamWriter] = None
+        self._ops: List[bytes] = []
+        self._y = 0.0
+        self._header = ""
+        self._success_color: Color = (0, 0.5, 0)
+        self._failed_color: Color = (0.8, 0, 0)
+
+    # Layout primitives
+
+    def _start_page(self) -> None:
+        self._flush_page()
+        self._ops = []
+        self._y = PAGE_HEIGHT - MARGIN
+        page_number = self._writer.page_count + 1
+        # Classification level in the header, page number in the footer
+        if self._header:
+            x = PAGE_WIDTH - MARGIN - _text_width(self._header, "F1", 8)
+            self._draw_text(self._header, x, PAGE_HEIGHT - 30, "F1", 8, _GREY)
+        number = str(page_number)
+        x = (PAGE_WIDTH - _text_width(number, "F1", 8)) / 2
+        self._draw_text(number, x, 30, "F1", 8, _GREY)
+
+    def _flush_page(self) -> None:
+        if self._ops:
+            self._writer.add_page(b"\n".join(self._ops))
+            self._ops = []
+
+    def _draw_text(
+        self, text: str, x: float, y: float, font: str, size: float, color: Color
+    ) -> None:
+        self._ops.append(
+            b"%.3f %.3f %.3f rg BT /%s %g Tf %.2f %.2f Td %s Tj ET"
+            % (*color, font.encode("ascii"), size, x, y, _pdf_string(text))
+        )
+
+    def _draw_rect(self, x: float, y: float, width: float, height: float, grey: float) -> None:
+        self._ops.append(b"%.3f g %.2f %.2f %.2f %.2f re f" % (grey, x, y, width, height))
+
+    def _ensure(self, height: float) -> None:
+        if self._y - height < MARGIN:
+            self._start_page()
+
+    def _space(self, height: float) -> None:
+        self._y -= height
+
+    def _wrap(self, text: str, font: str, size: float, width: float) -> List[str]:
+        lines = []
+        for paragraph in str(text).expandtabs(4).splitlines() or [""]:
+            line = ""
+            for word in paragraph.split(" "):
+                candidate = f"{line} {word}" if line else word
+                if _text_width(candidate, font, size) <= width:
+                    line = candidate
+                    continue
+                if line:
+                    lines.append(line)
+                # Words longer than the line are cut
+                while _text_width(word, font, size) > width:
+                    cut = max(1, int(len(word) * width / _text_width(word, font, size)))
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                line = word
+            lines.append(line)
+        return lines
+
+    def _paragraph(
+        self,
+        text: str,
+        font: str = "F1",
+        size: float = 10,
+        color: Color = _BLACK,
+        indent: float = 0,
+    ) -> None:
+        leading = size * self._line_height
+        for line in self._wrap(text, font, size, PAGE_WIDTH - 2 * MARGIN - indent):
+            self._ensure(leading)
+            self._y -= leading
+            self._draw_text(line, MARGIN + indent, self._y + size * 0.25, font, size, color)
+
+    def _heading(self, text: str, size: float) -> None:
+        # Keeps the heading with the beginning of the section
+        self._ensure(size * self._line_height * 4)
+        self._space(size * 0.5)
+        self._paragraph(text, "F2", size)
+        self._space(size * 0.3)
+
+    def _code_block(self, caption: str, text: str) -> None:
+        size = 8
+        leading = size * self._line_height
+        self._ensure(leading * 3)
+        self._paragraph(caption, "F2", 9, _GREY)
+        width = PAGE_WIDTH - 2 * MARGIN
+        for line in self._wrap(text or "", "F3", size, width - 8):
+            self._ensure(leading)
+            self._y -= leading
+            self._draw_rect(MARGIN, self._y, width, leading, 0.95)
+            self._draw_text(line, MARGIN + 4, self._y + size * 0.3, "F3", size, _BLACK)
+        self._space(6)
+
+    def _table(self, headers: List[str], rows: List[List[str]], widths: List[float]) -> None:
+        size = 9
+        leading = size * self._line_height
+
+        def draw_row(cells: List[str], font: str, grey: Optional[float]) -> None:
+            wrapped = [self._wrap(cell, font, size, width - 6) for cell, width in zip(cells, widths)]
+            height = max(len(lines) for lines in wrapped) * leading + 4
+            self._ensure(height)
+            self._y -= height
+            if grey is not None:
+                self._draw_rect(MARGIN, self._y, sum(widths), height, grey)
+            x = MARGIN
+            for lines, width in zip(wrapped, widths):
+                for index, line in enumerate(lines):
+                    y = self._y + height - (index + 1) * leading + 2
+                    self._draw_text(line, x + 3, y, font, size, _BLACK)
+                x += width
+
+        draw_row(headers, "F2", 0.85)
+        for index, row in enumerate(rows):
+            draw_row(row, "F1", 0.96 if index % 2 else None)
+        self._space(8)
+
+    # Report sections
+
+    def _title_page(self, report_information: dict) -> None:
+        self._space(180)
+        self._paragraph(report_information.get("document-title", ""), "F2", 24)
+        self._space(8)
+        self._paragraph(report_information.get("audited_asset", ""), "F1", 16, _GREY)
+        self._space(40)
+        for key in ("auditee_name", "baseline_name", "auditor-company-name"):
+            self._paragraph(report_information.get(key, ""), "F1", 12)
+        self._space(20)
+        self._paragraph(
+            f'{report_information.get("revnumber", "")} - {report_information.get("revdate", "")}',
+            "F1",
+            10,
+            _GREY,
+        )
+        self._paragraph(report_information.get("classification-level", ""), "F2", 10)
+
+    def _participants(self, report_information: dict) -> None:
+        gettext = self._gettext or global_values.localize.gettext
+        self._start_page()
+        self._heading(gettext("participants"), 16)
+
+        def people(names_key: str, emails_key: str) -> List[List[str]]:
+            names = [x.strip() for x in report_information.get(names_key, "").split(";")]
+            emails = [x.strip() for x in report_information.get(emails_key, "").split(";")]
+            return [list(pair) for pair in zip(names, emails)]
+
+        widths = [180, PAGE_WIDTH - 2 * MARGIN - 180]
+        for title, names_key, emails_key in (
+            (gettext("auditee"), "auditee_contact_full_name", "auditee_contact_email"),
+            (gettext("project_management"), "project_manager_full_name", "project_manager_email"),
+            (gettext("authors"), "authors_list_full_name", "authors_list_email"),
+        ):
+            self._heading(title, 12)
+            self._table(
+                [gettext("role"), gettext("contact_information")],
+                people(names_key, emails_key),
+                widths,
+            )
+
+    def _synthesis(self, model: ReportModel) -> None:
+        gettext = self._gettext or global_values.localize.gettext
+        self._start_page()
+        self._heading(gettext("nc_summary_title"), 16)
+        rows = [
+            [
+                entry.category.name,
+                rule.rule.title,
+                model.label(rule.rule.level),
+                model.label(rule.rule.severity),
+            ]
+            for entry, rule in model.non_conformities
+        ]
+        self._table(
+            ["Section", gettext("rule_name"), gettext("rule_level"), gettext("rule_severity")],
+            rows,
+            [110, 223, 75, 75],
+        )
+
+    def _categories(self, model: ReportModel) -> None:
+        gettext = self._gettext or global_values.localize.gettext
+        non_conformity = 0
+        for category_number, entry in enumerate(model.categories, start=1):
+            self._start_page()
+            category = entry.category
+            self._heading(f"{category_number}. {category.name}", 16)
+            if category.description is not None:
+                self._paragraph(category.description)
+
+            for rule_number, rule_entry in enumerate(entry.rules, start=1):
+                rule = rule_entry.rule
+                self._heading(f"{category_number}.{rule_number}. {rule.title}", 12)
+                self._paragraph(rule.description)
+                if rule.references:
+                    self._space(4)
+                    self._paragraph(gettext("references"), "F2", 10)
+                    for reference in rule.references:
+                        self._paragraph(f"- {reference}", indent=10)
+                self._space(6)
+                self._code_block(gettext("check_command"), rule.check)
+                self._code_block(gettext("expected_result"), rule.expected)
+                self._code_block(gettext("terminal_output"), rule.output)
+
+                if rule_entry.compliant:
+                    self._paragraph(model.label("success"), "F2", 10, self._success_color)
+                else:
+                    non_conformity += 1
+                    self._paragraph(
+                        f"[NC-{non_conformity:03}] {rule.title}", "F2", 10, self._failed_color
+                    )
+                    self._paragraph(rule.recommendation, indent=10)
+                self._space(8)
+
+    def render(self, model: ReportModel, report_information: dict, file: BinaryIO) -> int:
+        """
+        Writes the report into the binary `file` and returns the number of pages.
+        """
+        self._success_color = _parse_color(
+            config.get_config("status_colors", "success"), self._success_color
+        )
+        self._failed_color = _parse_color(
+            config.get_config("status_colors", "failed"), self._failed_color
+        )
+        self._header = report_information.get("classification-level", "")
+        self._writer = PDFStreamWriter(file)
+        try:
+            self._start_page()
+            self._title_page(report_information)
+            self._participants(report_information)
+            self._synthesis(model)
+            self._categories(model)
+            self._flush_page()
+            self._writer.close(
+                report_information.get("document-title", ""),
+                report_information.get("audited_asset", ""),
+            )
+            return self._writer.page_count
+        finally:
+            self._writer = None
+            self._ops = []
+
+    def render_to_path(self, model: ReportModel, report_information: dict, path: Path) -> int:
+        with open(path, "wb") as file:
+            return self.render(model, report_information, file)
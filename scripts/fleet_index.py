@@ -0,0 +1,124 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import logging
+from typing import TYPE_CHECKING, Dict, List, Tuple
+
+from octoconf.utils.logger import *
+
+from .report_model import anchor_id
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+    from octoconf.entities.category import Category
+    from octoconf.entities.rule import Rule
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HostFailure:
+    host: str
+    # The rule as checked on the host, with its terminal output
+    rule: Rule
+
+
+@dataclass
+class FleetRule:
+    category: Category
+    # The rule of the first host checked against it: its description, check and
+    # recommendation are the same on all the hosts
+    rule: Rule
+    failing: List[HostFailure] = field(default_factory=list)
+    compliant_hosts: int = 0
+
+    @property
+    def anchor(self) -> str:
+        return anchor_id(self.rule.id)
+
+    @property
+    def checked_hosts(self) -> int:
+        return len(self.failing) + self.compliant_hosts
+
+
+@dataclass
+class FleetCategory:
+    category: Category
+    rules: List[FleetRule] = field(default_factory=list)
+
+    @property
+    def failing_rules(self) -> List[FleetRule]:
+        return [rule for rule in self.rules if rule.failing]
+
+
+@dataclass
+class FleetIndex:
+    hosts: List[str] = field(default_factory=list)
+    categories: List[FleetCategory] = field(default_factory=list)
+
+    @property
+    def rules(self) -> List[FleetRule]:
+        return [rule for category in self.categories for rule in category.rules]
+
+    @property
+    def failing_rules(self) -> List[FleetRule]:
+        return [rule for category in self.categories for rule in category.failing_rules]
+
+
+def index_fleet_results(results: List[Tuple[str, Baseline]]) -> FleetIndex:
+    """
+    Indexes the results of several hosts audited with the same baseline by rule id: each rule
+    is kept once, with the hosts failing it.
+
+    The categories and rules are in the order of the first results they appear in.
+    """
+    baseline_titles = {baseline.title for _, baseline in results}
+    if len(baseline_titles) > 1:
+        logger.warning(f"The results do not come from the same baseline: {baseline_titles}")
+
+    index = FleetIndex(hosts=[host for host, _ in results])
+    categories: Dict[str, FleetCategory] = dict()
+    rules: Dict[str, FleetRule] = dict()
+    for host, baseline in results:
+        for category in baseline.categories:
+            fleet_category = categories.get(category.category)
+            if fleet_category is None:
+                fleet_category = categories[category.category] = FleetCategory(category)
+                index.categories.append(fleet_category)
+
+            for rule in category.rules:
+                fleet_rule = rules.get(rule.id)
+                if fleet_rule is None:
+                    fleet_rule = rules[rule.id] = FleetRule(category, rule)
+                    fleet_category.rules.append(fleet_rule)
+
+                if rule.compliant == True:
+                    fleet_rule.compliant_hosts += 1
+                else:
+                    fleet_rule.failing.append(HostFailure(host, rule))
+
+    logger.debug(
+        f"Fleet index: {len(index.hosts)} hosts, {len(rules)} rules, {len(index.failing_rules)} failing on at least one host"
+    )
+    return index
+
+
+def excerpt(output: str, max_lines: int = 5, max_chars: int = 300) -> str:
+    """
+    Returns the first `max_lines` lines and `max_chars` characters of a terminal output, with
+    an ellipsis when it was cut.
+    """
+    output = (output or "").strip()
+    lines = output.splitlines()
+    text = "\n".join(lines[:max_lines])
+    cut = len(lines) > max_lines
+    if len(text) > max_chars:
+        text = text[:max_chars].rstrip()
+        cut = True
+    return f"{text}\n[...]" if cut else text
@@ -0,0 +1,163 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+import logging
+from typing import TYPE_CHECKING, List, Tuple
+
+from octoconf.utils.logger import *
+
+from .lazy_import import lazy_import
+from .report_model import LEVELS
+
+try:
+    # Loaded on first use
+    np = lazy_import("numpy")
+except ImportError:
+    np = None
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+logger = logging.getLogger(__name__)
+
+# Values of the results matrix
+COMPLIANT = 1
+FAILED = 0
+MISSING = -1
+
+
+class FleetMatrix:
+    """
+    Dense hosts x rules matrix of the results of many hosts, with the level, severity and category
+    of each rule as vectors, so that the fleet statistics are computed with array operations.
+
+    `results[h, r]` is `COMPLIANT`, `FAILED`, or `MISSING` when host `h` was not checked against
+    rule `r`. Requires the optional `numpy` dependency.
+    """
+
+    def __init__(
+        self,
+        hosts: List[str],
+        rule_ids: List[str],
+        rule_titles: List[str],
+        categories: List[str],
+        category_names: List[str],
+        rule_categories: "np.ndarray",
+        levels: "np.ndarray",
+        severities: List[str],
+        results: "np.ndarray",
+    ) -> None:
+        self.hosts = hosts
+        self.rule_ids = rule_ids
+        self.rule_titles = rule_titles
+        self.categories = categories
+        self.category_names = category_names
+        # Index in `categories` of the category of each rule
+        self.rule_categories = rule_categories
+        # Index in `LEVELS` of the level of each rule, -1 for an unknown level
+        self.levels = levels
+        self.severities = severities
+        self.results = results
+
+    @classmethod
+    def from_results(cls, results: List[Tuple[str, Baseline]]) -> "FleetMatrix":
+        if np is None:
+            raise RuntimeError("The fleet matrix requires 'numpy', which is not installed")
+
+        rule_index: dict = dict()
+        category_index: dict = dict()
+        rule_ids: List[str] = []
+        rule_titles: List[str] = []
+        rule_categories: List[int] = []
+        levels: List[int] = []
+        severities: List[str] = []
+        category_names: List[str] = []
+        level_index = {level: index for index, level in enumerate(LEVELS)}
+
+        # First pass: index the rules and collect the results of each host as index/value arrays
+        host_columns = []
+        for _, baseline in results:
+            columns: List[int] = []
+            values: List[int] = []
+            for category in baseline.categories:
+                if category.category not in category_index:
+                    category_index[category.category] = len(category_names)
+                    category_names.append(category.name)
+                for rule in category.rules:
+                    index = rule_index.get(rule.id)
+                    if index is None:
+                        index = rule_index[rule.id] = len(rule_ids)
+                        rule_ids.append(rule.id)
+                        rule_titles.append(rule.title)
+                        rule_categories.append(category_index[category.category])
+                        levels.append(level_index.get(rule.level, -1))
+                        severities.append(rule.severity)
+                    columns.append(index)
+                    values.append(COMPLIANT if rule.compliant == True else FAILED)
+            host_columns.append((columns, values))
+
+        matrix = np.full((len(results), len(rule_ids)), MISSING, dtype=np.int8)
+        for row, (columns, values) in enumerate(host_columns):
+            matrix[row, np.asarray(columns, dtype=np.intp)] = np.asarray(
+                values, dtype=np.int8
+            )
+
+        logger.debug(f"Built fleet matrix of {matrix.shape[0]} hosts x {matrix.shape[1]} rules")
+        return cls(
+            [host for host, _ in results],
+            rule_ids,
+            rule_titles,
+            list(category_index),
+            category_names,
+            np.asarray(rule_categories, dtype=np.intp),
+            np.asarray(levels, dtype=np.int8),
+            severities,
+            matrix,
+        )
+
+    def _ratio(self, numerator: "np.ndarray", denominator: "np.ndarray") -> "np.ndarray":
+        # NaN where nothing was checked
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(denominator > 0, numerator / denominator, np.nan)
+
+    def rule_failure_rates(self) -> "np.ndarray":
+        """
+        Failed / checked hosts ratio of each rule.
+        """
+        failed = (self.results == FAILED).sum(axis=0)
+        checked = (self.results != MISSING).sum(axis=0)
+        return self._ratio(failed, checked)
+
+    def host_scores(self) -> "np.ndarray":
+        """
+        Compliant / checked rules ratio of each host.
+        """
+        compliant = (self.results == COMPLIANT).sum(axis=1)
+        checked = (self.results != MISSING).sum(axis=1)
+        return self._ratio(compliant, checked)
+
+    def _rollup(self, groups: "np.ndarray", nb_groups: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        # One-hot rules x groups matrix: the products sum the rules of each group for every host
+        one_hot = np.zeros((len(self.rule_ids), nb_groups), dtype=np.int32)
+        known = groups >= 0
+        one_hot[np.nonzero(known)[0], groups[known]] = 1
+        failed = (self.results == FAILED).astype(np.int32) @ one_hot
+        checked = (self.results != MISSING).astype(np.int32) @ one_hot
+        return failed, checked
+
+    def category_rollup(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Returns the hosts x categories matrices of the failed and checked rules.
+        """
+        return self._rollup(self.rule_categories, len(self.categories))
+
+    def level_rollup(self) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        Returns the hosts x levels (see `LEVELS`) matrices of the failed and checked rules.
+        """
+        return self._rollup(self.levels.astype(np.intp), len(LEVELS))
@@ -0,0 +1,207 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import configparser
+
+from octoconf.utils.logger import *
+
+from .lazy_import import lazy_import
+
+try:
+    # Loaded on first use, the compute and file format modules are imported by the methods
+    # needing them
+    pa = lazy_import("pyarrow")
+except ImportError:
+    pa = None
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnarGenerator:
+    """
+    Writes the results as a columnar dataset (Apache Parquet or Arrow IPC), with one row per rule,
+    for analytics tools. The summaries by category and level are computed with Arrow compute
+    kernels on the whole columns.
+
+    Requires the optional `pyarrow` dependency.
+    """
+
+    _extensions = {"parquet": "parquet", "arrow": "arrow"}
+
+    def __init__(self) -> None:
+        pass
+
+    def _is_pyarrow_installed(self) -> bool:
+        return pa is not None
+
+    def _build_table(
+        self, results: List[Tuple[str, Baseline]], include_output: bool = False
+    ) -> "pa.Table":
+        columns: dict = {
+            "host": [],
+            "baseline": [],
+            "category": [],
+            "rule_id": [],
+            "level": [],
+            "severity": [],
+            "compliant": [],
+        }
+        if include_output:
+            columns["output_length"] = []
+            columns["output_sha256"] = []
+
+        for host, baseline in results:
+            for category in baseline.categories:
+                for rule in category.rules:
+                    columns["host"].append(host)
+                    columns["baseline"].append(baseline.title)
+                    columns["category"].append(category.category)
+                    columns["rule_id"].append(rule.id)
+                    columns["level"].append(rule.level)
+                    columns["severity"].append(rule.severity)
+                    columns["compliant"].append(rule.compliant == True)
+                    if include_output:
+                        output = (rule.output or "").encode("utf-8")
+                        columns["output_length"].append(len(output))
+                        columns["output_sha256"].append(
+                            hashlib.sha256(output).hexdigest()
+                        )
+
+        schema = [
+            ("host", pa.string()),
+            ("baseline", pa.string()),
+            ("category", pa.string()),
+            ("rule_id", pa.string()),
+            # Few distinct values: dictionary encoded
+            ("level", pa.dictionary(pa.int8(), pa.string())),
+            ("severity", pa.dictionary(pa.int8(), pa.string())),
+            ("compliant", pa.bool_()),
+        ]
+        if include_output:
+            schema += [("output_length", pa.int64()), ("output_sha256", pa.string())]
+
+        return pa.table(
+            {name: pa.array(columns[name], type=type) for name, type in schema}
+        )
+
+    def _summarize(self, table: "pa.Table") -> "pa.Table":
+        """
+        Counts the successful and failed rules by host, baseline, category and level.
+        """
+        import pyarrow.compute as pc
+
+        table = table.append_column(
+            "success", pc.cast(table["compliant"], pa.int64())
+        ).append_column(
+            "level_str", pc.cast(table["level"], pa.string())
+        )
+        summary = table.group_by(["host", "baseline", "category", "level_str"]).aggregate(
+            [("success", "sum"), ("rule_id", "count")]
+        )
+        total = summary["rule_id_count"]
+        success = summary["success_sum"]
+        return pa.table(
+            {
+                "host": summary["host"],
+                "baseline": summary["baseline"],
+                "category": summary["category"],
+                "level": summary["level_str"],
+                "total": total,
+                "success": success,
+                "failed": pc.subtract(total, success),
+                "compliance_rate": pc.divide(
+                    pc.cast(success, pa.float64()), pc.cast(total, pa.float64())
+                ),
+            }
+        )
+
+    def _write_table(self, table: "pa.Table", path: Path, file_format: str) -> None:
+        logger.debug(f"Writing {table.num_rows} rows into {path}")
+        if file_format == "parquet":
+            import pyarrow.parquet as pq
+
+            pq.write_table(table, path)
+        else:
+            import pyarrow.feather as feather
+
+            feather.write_feather(table, path)
+
+    def generate_fleet_columnar(
+        self,
+        filename: str,
+        results: List[Tuple[str, Baseline]],
+        output_dir: Path,
+        file_format: str = "parquet",
+        include_output: bool = False,
+    ) -> Optional[Tuple[Path, Path]]:
+        """
+        Writes the (host, results) pairs into `<filename>.<format>` and their summary by category
+        and level into `<filename>-summary.<format>`, and returns both paths.
+
+        With `include_output`, the length and the SHA-256 of the terminal output of each rule are
+        added to the dataset.
+        """
+        logger.info("Running columnar results export")
+        logger.debug(
+            f"args: filename = {filename}, hosts = {[host for host, _ in results]}, output_dir = {output_dir}, file_format = {file_format}, include_output = {include_output}"
+        )
+
+        if not self._is_pyarrow_installed():
+            logger.error("The columnar export requires 'pyarrow', which is not installed")
+            return None
+
+        if file_format not in self._extensions:
+            raise ValueError(
+                f"Unknown format '{file_format}', expected one of {list(self._extensions)}"
+            )
+
+        table = self._build_table(results, include_output)
+        summary = self._summarize(table)
+
+        extension = self._extensions[file_format]
+        results_path = output_dir / f"{filename}.{extension}"
+        summary_path = output_dir / f"{filename}-summary.{extension}"
+        self._write_table(table, results_path, file_format)
+        self._write_table(summary, summary_path, file_format)
+        return results_path, summary_path
+
+    def generate_columnar(
+        self,
+        filename: str,
+        results: Baseline,
+        output_dir: Path,
+        ini_file: Optional[Path] = None,
+        host: Optional[str] = None,
+        file_format: str = "parquet",
+        include_output: bool = False,
+    ) -> Optional[Tuple[Path, Path]]:
+        """
+        Writes the results of a single host, see `generate_fleet_columnar`.
+
+        The host defaults to the audited asset of the ini file, then to the filename.
+        """
+        if host is None and ini_file:
+            cfg_parser = configparser.ConfigParser()
+            cfg_parser.read(ini_file)
+            host = cfg_parser.get("DEFAULT", "audited_asset", fallback=None)
+
+        return self.generate_fleet_columnar(
+            filename,
+            [(host or filename, results)],
+            output_dir,
+            file_format=file_format,
+            include_output=include_output,
+        )
@@ -4,39 +4,125 @@
 # @link https://github.com/nillyr/octowriter
 # @since 0.1.0
 
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+import hashlib
+import io
 import logging
+import os
 from pathlib import Path, PurePosixPath, PureWindowsPath
 import platform
 import shutil
 import subprocess
-from typing import List, Optional
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
 
 import configparser
 
 from octoconf.__init__ import __version__, __url__
-from octoconf.entities.baseline import Baseline
-from octoconf.entities.category import Category
-from octoconf.entities.rule import Rule
 from octoconf.interfaces.generate_pdf import IPDFGenerator
 from octoconf.utils.logger import *
 import octoconf.utils.global_values as global_values
 from octoconf.utils.timestamp import today
 
+from .delta import BaselineDelta, compute_delta
+from .draft_pdf import DraftPDFRenderer
+from .fleet_index import FleetIndex, FleetRule, excerpt, index_fleet_results
+from .localization import Localization
+from .profiling import Profiler, phase, profiling
+from .report_model import CategoryEntry, ReportModel, RuleEntry, anchor_id
+from .template_registry import Theme, TemplateRegistry, get_template_registry
+from .workspace import Workspace, WorkspaceManager
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+    from octoconf.entities.category import Category
+
+    from .results_store import ResultsStore
+
 logger = logging.getLogger(__name__)
 
 
+@lru_cache(maxsize=None)
+def asciidoctor_pdf_version() -> str:
+    """
+    Returns the version output of asciidoctor-pdf (empty when it is not installed), computed once
+    per process.
+    """
+    if platform.system() == "Windows":
+        cmd = ["powershell.exe", "asciidoctor-pdf --version"]
+    else:
+        cmd = "asciidoctor-pdf --version"
+
+    process = subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, shell=True
+    )
+    output, _ = process.communicate()
+    return output.decode("utf-8").strip() if process.returncode == 0 else ""
+
+
 class PDFGenerator(IPDFGenerator):
-    def __init__(self) -> None:
+    # Below this number of rules, the fragments are written by the calling thread
+    parallel_fragments_threshold = 64
+    # Hosts named in the subtitle of the consolidated report, the others are counted
+    fleet_subtitle_hosts = 3
+
+    def __init__(
+        self,
+        template_registry: Optional[TemplateRegistry] = None,
+        workspace_manager: Optional[WorkspaceManager] = None,
+        localization: Optional[Localization] = None,
+        fragment_workers: Optional[int] = None,
+        reuse_workspaces: bool = False,
+    ) -> None:
         self._template_dir = Path(__file__).resolve().parent.parent / "template"
+        # Shared by default by all the generators, so that each template is read once
+        self._template_registry = template_registry or get_template_registry(
+            self._template_dir
+        )
+        # Digest of the last content written to each fragment, see `_write_fragment`
+        self._fragments: Dict[Path, bytes] = dict()
+        self._fragments_lock = threading.Lock()
+        # Threads writing the rule fragments, see `_generate_categories_files`
+        self._fragment_workers = fragment_workers or min(32, (os.cpu_count() or 1) + 4)
+        # With a workspace manager, the AsciiDoc files are generated in a workspace and only
+        # the PDF report is written into the output directory
+        self._workspace_manager = workspace_manager
+        # With `reuse_workspaces`, each report keeps its workspace from one generation to the
+        # next, so that only its changed fragments are written again (see `_write_fragment`)
+        self._reuse_workspaces = reuse_workspaces
+        self._reused_workspaces: Dict[str, Workspace] = dict()
+        # Locale of the reports, the global octoconf locale by default
+        self._localization = localization
+        # Profiler of the current generation, see `generate_pdf`
+        self._profiler: Optional[Profiler] = None
 
         self._header_file = self._template_dir / "default" / "header.adoc"
         self._introduction_file = self._template_dir / "default" / "introduction.adoc"
         self._synthesis_file = self._template_dir / "default" / "synthesis.adoc"
+        self._delta_file = self._template_dir / "default" / "delta.adoc"
+        self._fleet_file = self._template_dir / "default" / "fleet.adoc"
+        self._fleet_hosts_file = self._template_dir / "default" / "fleet_hosts.adoc"
 
         logger.info(
             f"Init PDFGenerator with template_dir = {self._template_dir}, header_file = {self._header_file}, introduction_file = {self._introduction_file}, synthesis_file = {self._synthesis_file}"
         )
 
+    def _gettext(self, message: str) -> str:
+        if self._localization is not None:
+            return self._localization.gettext(message)
+        return global_values.localize.gettext(message)
+
+    def _get_locale(self) -> str:
+        if self._localization is not None:
+            return self._localization.locale
+        return global_values.get_locale()
+
     def _is_asciidoctor_pdf_installed(self) -> bool:
         if platform.system() == "Windows":
             cmd = ["powershell.exe", 'if (Get-Command "asciidoctor-pdf") { "true" }']
@@ -50,14 +136,18 @@ class PDFGenerator(IPDFGenerator):
         return output.decode("utf-8").strip() == "true"
 
     def _initialize_report_from_ini(
-        self, filename: str, baseline_name: str, ini_file: Path
+        self,
+        filename: str,
+        baseline_name: str,
+        ini_file: Path,
+        report_date: Optional[str] = None,
     ) -> dict:
         cfg_parser = configparser.ConfigParser()
         cfg_parser.read(ini_file)
 
         report_information: dict = dict()
         report_information["filename"] = filename
-        report_information["document-title"] = global_values.localize.gettext(
+        report_information["document-title"] = self._gettext(
             "compliance_report_title"
         )
         report_information["auditee_name"] = cfg_parser.get("DEFAULT", "auditee_name")
@@ -87,7 +177,7 @@ class PDFGenerator(IPDFGenerator):
         )
         report_information["baseline_name"] = baseline_name
         report_information["revnumber"] = "1.0"
-        report_information["revdate"] = today()
+        report_information["revdate"] = report_date or today()
         report_information["audited_asset"] = cfg_parser.get("DEFAULT", "audited_asset")
         report_information["classification-level"] = cfg_parser.get(
             "DEFAULT", "classification_level"
@@ -99,65 +189,67 @@ class PDFGenerator(IPDFGenerator):
         logger.debug(f"Loaded information from {ini_file}: {report_information}")
         return report_information
 
-    def _initialize_report(self, filename: str, baseline_name: str) -> dict:
+    def _initialize_report(
+        self, filename: str, baseline_name: str, report_date: Optional[str] = None
+    ) -> dict:
         report_information: dict = dict()
 
         while True:
             report_information["filename"] = filename
 
-            report_information["document-title"] = global_values.localize.gettext(
+            report_information["document-title"] = self._gettext(
                 "compliance_report_title"
             )
             report_information["audited_asset"] = input(
-                f'{global_values.localize.gettext("audited_asset")} : '
+                f'{self._gettext("audited_asset")} : '
             )
 
             report_information["auditee_name"] = input(
-                f'{global_values.localize.gettext("auditee_name")} : '
+                f'{self._gettext("auditee_name")} : '
             )
 
             report_information["auditee_logo_path"] = input(
-                f'{global_values.localize.gettext("auditee_logo_path")} : '
+                f'{self._gettext("auditee_logo_path")} : '
             )
 
             report_information["auditee_contact_full_name"] = input(
-                f'{global_values.localize.gettext("auditee_contact_full_name")} : '
+                f'{self._gettext("auditee_contact_full_name")} : '
             )
 
             report_information["auditee_contact_email"] = input(
-                f'{global_values.localize.gettext("auditee_contact_email")} : '
+                f'{self._gettext("auditee_contact_email")} : '
             )
 
             report_information["project_manager_full_name"] = input(
-                f'{global_values.localize.gettext("project_manager_full_name")} : '
+                f'{self._gettext("project_manager_full_name")} : '
             )
             report_information["project_manager_email"] = input(
-                f'{global_values.localize.gettext("project_manager_email")} : '
+                f'{self._gettext("project_manager_email")} : '
             )
 
             report_information["authors_list_full_name"] = input(
-                f'{global_values.localize.gettext("authors_list_full_name")} : '
+                f'{self._gettext("authors_list_full_name")} : '
             )
             report_information["authors_list_email"] = input(
-                f'{global_values.localize.gettext("authors_list_email")} : '
+                f'{self._gettext("authors_list_email")} : '
             )
 
             report_information["baseline_name"] = baseline_name
 
             report_information["revnumber"] = "1.0"
-            report_information["revdate"] = today()
+            report_information["revdate"] = report_date or today()
 
             report_information["classification-level"] = input(
-                f'{global_values.localize.gettext("classification_level")} : '
+                f'{self._gettext("classification_level")} : '
             )
 
             report_information["auditor-company-name"] = input(
-                f'{global_values.localize.gettext("auditor_company_name")} : '
+                f'{self._gettext("auditor_company_name")} : '
             )
 
             if (
                 input(
-                    f'{global_values.localize.gettext("init_user_confirmation")} [y/N] : '
+                    f'{self._gettext("init_user_confirmation")} [y/N] : '
                 )
                 .upper()
                 .strip()
@@ -168,6 +260,29 @@ class PDFGenerator(IPDFGenerator):
         logger.debug(f"Loaded information user input: {report_information}")
         return report_information
 
+    def _write_fragment(self, path: Path, content: str) -> bool:
+        """
+        Writes a generated AsciiDoc fragment, unless this generator already wrote the same content
+        there in one of its reused workspaces. Returns whether the file was written.
+        """
+        # Any other build directory may be written by another generator or process
+        owned = any(
+            workspace.path in path.parents for workspace in list(self._reused_workspaces.values())
+        )
+        digest = hashlib.sha256(content.encode("utf-8")).digest()
+        if owned:
+            with self._fragments_lock:
+                unchanged = self._fragments.get(path) == digest
+            if unchanged and path.exists():
+                return False
+
+        with open(path, "w") as file:
+            file.write(content)
+        if owned:
+            with self._fragments_lock:
+                self._fragments[path] = digest
+        return True
+
     def _include_file_in_header(self, file_to_include: str, build_dir: Path) -> None:
         with open(build_dir / self._header_file.name, "a") as file:
             file.write(f"include::{file_to_include}[]\n")
@@ -175,11 +290,10 @@ class PDFGenerator(IPDFGenerator):
     def _generate_header_file(
         self, report_information: dict, build_dir: Path, pdf_theme: str
     ) -> None:
-        with open(self._header_file, "r") as file:
-            header = file.read()
+        header = self._template_registry.read(self._header_file)
 
         header = header.replace(
-            "MATCH_AND_REPLACE_DOCUMENT_LANG", global_values.get_locale().upper()
+            "MATCH_AND_REPLACE_DOCUMENT_LANG", self._get_locale().upper()
         )
         header = header.replace(
             "MATCH_AND_REPLACE_FILENAME", report_information["filename"]
@@ -247,23 +361,22 @@ class PDFGenerator(IPDFGenerator):
     def _generate_introduction_file(
         self, authors: dict, auditee: dict, build_dir: Path
     ) -> None:
-        with open(self._introduction_file, "r") as file:
-            introduction = file.read()
+        introduction = self._template_registry.read(self._introduction_file)
 
         introduction = introduction.replace(
             "MATCH_AND_REPLACE_PARTICIPANTS",
-            global_values.localize.gettext("participants"),
+            self._gettext("participants"),
         )
         introduction = introduction.replace(
-            "MATCH_AND_REPLACE_ROLE", global_values.localize.gettext("role")
+            "MATCH_AND_REPLACE_ROLE", self._gettext("role")
         )
         introduction = introduction.replace(
             "MATCH_AND_REPLACE_CONTACT_INFORMATION",
-            global_values.localize.gettext("contact_information"),
+            self._gettext("contact_information"),
         )
 
         introduction = introduction.replace(
-            "MATCH_AND_REPLACE_AUDITEE", global_values.localize.gettext("auditee")
+            "MATCH_AND_REPLACE_AUDITEE", self._gettext("auditee")
         )
 
         auditee_list_str = ""
@@ -277,10 +390,10 @@ class PDFGenerator(IPDFGenerator):
 
         introduction = introduction.replace(
             "MATCH_AND_REPLACE_PROJECT_MANAGEMENT",
-            global_values.localize.gettext("project_management"),
+            self._gettext("project_management"),
         )
         introduction = introduction.replace(
-            "MATCH_AND_REPLACE_AUTHORS", global_values.localize.gettext("authors")
+            "MATCH_AND_REPLACE_AUTHORS", self._gettext("authors")
         )
 
         authors_list_str = ""
@@ -294,64 +407,125 @@ class PDFGenerator(IPDFGenerator):
 
         introduction = introduction.replace(
             "MATCH_AND_REPLACE_MODIFICATION_HISTORY",
-            global_values.localize.gettext("modification_history"),
+            self._gettext("modification_history"),
         )
         introduction = introduction.replace(
-            "MATCH_AND_REPLACE_AUTHOR", global_values.localize.gettext("author")
+            "MATCH_AND_REPLACE_AUTHOR", self._gettext("author")
         )
         introduction = introduction.replace(
             "MATCH_AND_REPLACE_REPORT_WRITING",
-            global_values.localize.gettext("report_writing"),
+            self._gettext("report_writing"),
         )
 
-        with open(build_dir / self._introduction_file.name, "w") as file:
-            file.write(introduction)
+        self._write_fragment(build_dir / self._introduction_file.name, introduction)
 
         self._include_file_in_header(
             str(build_dir / self._introduction_file.name), build_dir
         )
 
-    def _generate_synthesis_file(
-        self, categories: List[Category], build_dir: Path
-    ) -> None:
-        with open(self._synthesis_file, "r") as file:
-            synthesis = file.read()
+    def _generate_synthesis_file(self, model: ReportModel, build_dir: Path) -> None:
+        synthesis = self._template_registry.read(self._synthesis_file)
 
         synthesis = synthesis.replace(
             "MATCH_AND_REPLACE_NC_SUMMARY_TITLE",
-            global_values.localize.gettext("nc_summary_title"),
+            self._gettext("nc_summary_title"),
         )
 
         synthesis = synthesis.replace(
-            "MATCH_AND_REPLACE_RULE_NAME", global_values.localize.gettext("rule_name")
+            "MATCH_AND_REPLACE_RULE_NAME", self._gettext("rule_name")
         )
         synthesis = synthesis.replace(
-            "MATCH_AND_REPLACE_RULE_LEVEL", global_values.localize.gettext("rule_level")
+            "MATCH_AND_REPLACE_RULE_LEVEL", self._gettext("rule_level")
         )
         synthesis = synthesis.replace(
             "MATCH_AND_REPLACE_RULE_SEVERITY",
-            global_values.localize.gettext("rule_severity"),
+            self._gettext("rule_severity"),
         )
 
         non_conformity_rows = ""
-        for category in categories:
-            for rule in category.rules:
-                if not rule.compliant:
-                    # asciidoc does not like '.' char for references -> replace with '_'
-                    non_conformity_rows += f"| <<{category.category}>> | <<nc_{rule.id.replace('.', '_')}>> | {global_values.localize.gettext(rule.level)} | {global_values.localize.gettext(rule.severity)} \n"
+        for category_entry, rule_entry in model.non_conformities:
+            rule = rule_entry.rule
+            non_conformity_rows += f"| <<{category_entry.category.category}>> | <<nc_{rule_entry.anchor}>> | {model.label(rule.level)} | {model.label(rule.severity)} \n"
 
         synthesis = synthesis.replace(
             "MATCH_AND_REPLACE_NON_CONFORMITY", non_conformity_rows
         )
 
-        with open(build_dir / self._synthesis_file.name, "w") as file:
-            file.write(synthesis)
+        self._write_fragment(build_dir / self._synthesis_file.name, synthesis)
+
+        self._include_file_in_header(
+            str(build_dir / self._synthesis_file.name), build_dir
+        )
+
+    def _generate_delta_synthesis_file(
+        self, delta: BaselineDelta, build_dir: Path
+    ) -> None:
+        synthesis = self._template_registry.read(self._delta_file)
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_RULE_NAME", self._gettext("rule_name")
+        )
+        synthesis = synthesis.replace("MATCH_AND_REPLACE_RESULT", self._gettext("result"))
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_RULE_LEVEL", self._gettext("rule_level")
+        )
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_RULE_SEVERITY",
+            self._gettext("rule_severity"),
+        )
+
+        changed_rows = ""
+        for rule_delta in delta.newly_failing:
+            rule = rule_delta.rule
+            changed_rows += f"| <<{rule_delta.category.category}>> | <<nc_{anchor_id(rule.id)}>> | {self._gettext('failed')} | {self._gettext(rule.level)} | {self._gettext(rule.severity)} \n"
+        for rule_delta in delta.newly_fixed:
+            rule = rule_delta.rule
+            changed_rows += f"| <<{rule_delta.category.category}>> | {rule.title} | {self._gettext('success')} | {self._gettext(rule.level)} | {self._gettext(rule.severity)} \n"
+
+        synthesis = synthesis.replace("MATCH_AND_REPLACE_CHANGED_RULES", changed_rows)
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_UNCHANGED_COUNT", str(len(delta.unchanged))
+        )
+
+        self._write_fragment(build_dir / self._synthesis_file.name, synthesis)
 
         self._include_file_in_header(
             str(build_dir / self._synthesis_file.name), build_dir
         )
 
-    def _generate_rule_file(self, rule: Rule, build_dir: Path) -> None:
+    def _generate_fleet_synthesis_file(self, index: FleetIndex, build_dir: Path) -> None:
+        synthesis = self._template_registry.read(self._fleet_file)
+        synthesis = synthesis.replace("MATCH_AND_REPLACE_HOST_COUNT", str(len(index.hosts)))
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_RULE_NAME", self._gettext("rule_name")
+        )
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_RULE_LEVEL", self._gettext("rule_level")
+        )
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_RULE_SEVERITY",
+            self._gettext("rule_severity"),
+        )
+        synthesis = synthesis.replace("MATCH_AND_REPLACE_FAILED", self._gettext("failed"))
+
+        failing_rows = ""
+        failing_rules = index.failing_rules
+        for fleet_rule in failing_rules:
+            rule = fleet_rule.rule
+            failing_rows += f"| <<{fleet_rule.category.category}>> | <<nc_{fleet_rule.anchor}>> | {self._gettext(rule.level)} | {self._gettext(rule.severity)} | {len(fleet_rule.failing)} / {fleet_rule.checked_hosts} \n"
+
+        synthesis = synthesis.replace("MATCH_AND_REPLACE_FAILING_RULES", failing_rows)
+        synthesis = synthesis.replace(
+            "MATCH_AND_REPLACE_COMPLIANT_COUNT", str(len(index.rules) - len(failing_rules))
+        )
+
+        self._write_fragment(build_dir / self._synthesis_file.name, synthesis)
+
+        self._include_file_in_header(
+            str(build_dir / self._synthesis_file.name), build_dir
+        )
+
+    def _render_rule_file(self, entry: RuleEntry) -> str:
+        rule = entry.rule
         rule_file_content = f"=== {rule.title}\n"
         rule_file_content += f"{rule.description}\n"
 
@@ -360,7 +534,7 @@ class PDFGenerator(IPDFGenerator):
             reference_content += f"* {reference}\n"
 
         if reference_content != "":
-            rule_file_content += f'\n*{global_values.localize.gettext("references")}*\n\n'
+            rule_file_content += f'\n*{self._gettext("references")}*\n\n'
             rule_file_content += reference_content
 
         rule_file_content += "\n"
@@ -370,7 +544,7 @@ class PDFGenerator(IPDFGenerator):
 ----
 {1}
 ----\n\n""".format(
-            global_values.localize.gettext("check_command"), rule.check
+            self._gettext("check_command"), rule.check
         )
 
         rule_file_content += """.{0}
@@ -379,7 +553,7 @@ class PDFGenerator(IPDFGenerator):
 ----
 {1}
 ----\n\n""".format(
-            global_values.localize.gettext("expected_result"), rule.expected
+            self._gettext("expected_result"), rule.expected
         )
 
         rule_file_content += """.{0}
@@ -388,7 +562,7 @@ class PDFGenerator(IPDFGenerator):
 ----
 {1}
 ----\n\n""".format(
-            global_values.localize.gettext("terminal_output"), rule.output
+            self._gettext("terminal_output"), rule.output
         )
 
         if rule.compliant:
@@ -404,131 +578,448 @@ endif::[]\n"""
 ====
 {3}
 ====\n""".format(
-                rule.title, rule.id.replace('.', '_'), "{counter:non-compliance:001}", rule.recommendation
+                rule.title, entry.anchor, "{counter:non-compliance:001}", rule.recommendation
             )
 
         rule_file_content += "\n"
-        with open(f"{str(build_dir / rule.id)}.adoc", "w") as file:
-            file.write(rule_file_content)
+        return rule_file_content
 
-    def _generate_categories_files(
-        self, categories: List[Category], build_dir: Path
+    def _generate_rule_file(self, entry: RuleEntry, build_dir: Path) -> bool:
+        return self._write_fragment(
+            build_dir / f"{entry.rule.id}.adoc", self._render_rule_file(entry)
+        )
+
+    def _render_fleet_rule_file(self, fleet_rule: FleetRule, evidence_lines: int) -> str:
+        # The rule is described once, then the failing hosts are listed with an excerpt of
+        # their terminal output
+        rule = fleet_rule.rule
+        rule_file_content = f"=== {rule.title}\n"
+        rule_file_content += f"{rule.description}\n"
+
+        reference_content = ""
+        for reference in rule.references:
+            reference_content += f"* {reference}\n"
+
+        if reference_content != "":
+            rule_file_content += f'\n*{self._gettext("references")}*\n\n'
+            rule_file_content += reference_content
+
+        rule_file_content += "\n"
+        rule_file_content += """.{0}
+[source%linenums,shell]
+[options="nowrap"]
+----
+{1}
+----\n\n""".format(
+            self._gettext("check_command"), rule.check
+        )
+
+        rule_file_content += """.{0}
+[source%linenums,console]
+[options="nowrap"]
+----
+{1}
+----\n\n""".format(
+            self._gettext("expected_result"), rule.expected
+        )
+
+        rule_file_content += """.{0}
+[#nc_{1}, caption="[NC-{2}] "]
+====
+{3}
+====\n\n""".format(
+            rule.title, fleet_rule.anchor, "{counter:non-compliance:001}", rule.recommendation
+        )
+
+        failing_hosts = ""
+        for failure in fleet_rule.failing:
+            evidence = excerpt(failure.rule.output, evidence_lines).replace("|", "\\|")
+            failing_hosts += f"| {failure.host}\nl| {evidence}\n"
+
+        # Read once, then from the cache of the registry
+        hosts = self._template_registry.read(self._fleet_hosts_file)
+        hosts = hosts.replace("MATCH_AND_REPLACE_FAILING_COUNT", str(len(fleet_rule.failing)))
+        hosts = hosts.replace("MATCH_AND_REPLACE_CHECKED_COUNT", str(fleet_rule.checked_hosts))
+        hosts = hosts.replace("MATCH_AND_REPLACE_HOST", self._gettext("asset"))
+        hosts = hosts.replace(
+            "MATCH_AND_REPLACE_TERMINAL_OUTPUT", self._gettext("terminal_output")
+        )
+        hosts = hosts.replace("MATCH_AND_REPLACE_FAILING_HOSTS", failing_hosts)
+
+        return rule_file_content + hosts
+
+    def _generate_fleet_rule_file(
+        self, fleet_rule: FleetRule, build_dir: Path, evidence_lines: int = 5
+    ) -> bool:
+        return self._write_fragment(
+            build_dir / f"{fleet_rule.rule.id}.adoc",
+            self._render_fleet_rule_file(fleet_rule, evidence_lines),
+        )
+
+    def _generate_rules_files(
+        self,
+        rules: List[Any],
+        build_dir: Path,
+        generate: Optional[Callable[[Any, Path], bool]] = None,
     ) -> None:
-        for category in categories:
-            category_file_content = f"[#{category.category},reftext={category.name}]\n"
-            category_file_content += f"== {category.name}\n"
-            category_file_content += (
-                f"{category.description}\n" if category.description is not None else ""
+        # Each rule has its own fragment: they are rendered and written by a pool of threads,
+        # the file writes (slow on network file systems) releasing the GIL
+        generate = generate or self._generate_rule_file
+        if self._fragment_workers <= 1 or len(rules) < self.parallel_fragments_threshold:
+            for entry in rules:
+                generate(entry, build_dir)
+            return
+
+        with ThreadPoolExecutor(
+            max_workers=self._fragment_workers, thread_name_prefix="fragments"
+        ) as executor:
+            # Consumed to raise the first error of the workers
+            written = sum(
+                executor.map(lambda entry: generate(entry, build_dir), rules, chunksize=64)
             )
-            category_file_content += "\n\n"
+        logger.debug(
+            f"{written} of {len(rules)} rule fragments written with {self._fragment_workers} threads"
+        )
 
-            for rule in category.rules:
-                category_file_content += f"include::{str(build_dir / rule.id)}.adoc[]\n"
-                self._generate_rule_file(rule, build_dir)
+    def _generate_category_file(
+        self, category: Category, rule_ids: List[str], build_dir: Path
+    ) -> None:
+        category_file_content = f"[#{category.category},reftext={category.name}]\n"
+        category_file_content += f"== {category.name}\n"
+        category_file_content += (
+            f"{category.description}\n" if category.description is not None else ""
+        )
+        category_file_content += "\n\n"
+
+        for rule_id in rule_ids:
+            category_file_content += f"include::{str(build_dir / rule_id)}.adoc[]\n"
+
+        category_file_content += "\n"
+        self._write_fragment(build_dir / f"{category.category}.adoc", category_file_content)
 
-            category_file_content += "\n"
-            with open(f"{str(build_dir / category.category)}.adoc", "w") as file:
-                file.write(category_file_content)
+        self._include_file_in_header(f"{str(build_dir / category.category)}.adoc", build_dir)
+
+    def _generate_categories_files(
+        self, categories: List[CategoryEntry], build_dir: Path
+    ) -> None:
+        self._generate_rules_files(
+            [rule_entry for entry in categories for rule_entry in entry.rules], build_dir
+        )
 
-            self._include_file_in_header(
-                f"{str(build_dir / category.category)}.adoc", build_dir
+        # The includes only depend on the model: their order does not depend on the threads
+        for entry in categories:
+            self._generate_category_file(
+                entry.category, [rule_entry.rule.id for rule_entry in entry.rules], build_dir
             )
 
-    def build_pdf(
+    @staticmethod
+    def _images_dir(build_dir: Path) -> Path:
+        return build_dir.parent / "images"
+
+    def _copy_images(self, theme_dir: str, report_information: dict, build_dir: Path) -> None:
+        """
+        With a custom theme, copies its images and the audited entity's logo into the images
+        directory of the build, which is then used as imagesdir: the theme is never written, so
+        concurrent reports of different auditees do not overwrite each other's logo.
+        """
+        images_dir = self._images_dir(build_dir)
+        # Left by a previous generation in the same build directory
+        shutil.rmtree(images_dir, ignore_errors=True)
+        if theme_dir == "default":
+            return
+
+        src = report_information.get("auditee_logo_path")
+        if not src or not Path(src).is_file():
+            logger.warning("There is no auditee logo to copy.")
+            return
+        theme = self._template_registry.get_theme(theme_dir) or Theme(
+            theme_dir, self._get_theme_directory(theme_dir)
+        )
+        if theme.images_dir.is_dir():
+            shutil.copytree(theme.images_dir, images_dir)
+        images_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(str(src), str(images_dir / "logo_auditee_header.png"))
+
+    def _asciidoctor_pdf_command(
         self,
-        filename: str,
-        output_directory: Path,
         build_dir: Path,
-        header_file: Optional[str] = None,
-        theme_dir: str = "default",
-        pdf_theme: str = "default.yml",
-    ) -> None:
+        header_file: Optional[str],
+        theme_dir: str,
+        pdf_theme: str,
+        output_directory: Optional[Path],
+        output: str,
+    ):
         header_file = Path(header_file).name if header_file else self._header_file.name
 
-        # deduce dir paths from template name
-        if theme_dir != "default":
-            imagesdir = (
-                self._template_dir / "custom" / theme_dir / "resources" / "images"
-            )
-            pdf_themesdir = (
-                self._template_dir / "custom" / theme_dir / "resources" / "themes"
-            )
-        else:
-            imagesdir = self._template_dir / theme_dir / "resources" / "images"
-            pdf_themesdir = self._template_dir / theme_dir / "resources" / "themes"
+        theme = self._template_registry.get_theme(theme_dir) or Theme(
+            theme_dir, self._get_theme_directory(theme_dir)
+        )
+        # The images of the build, with the auditee logo, if any (see `_copy_images`)
+        imagesdir = self._images_dir(build_dir)
+        if not imagesdir.is_dir():
+            imagesdir = theme.images_dir
+        pdf_themesdir = theme.themes_dir
 
         logger.debug(
-            f"Running asciidoctor-pdf with the following args: imagesdir = {imagesdir}, pdf_themesdir = {pdf_themesdir}, pdf_theme = {pdf_theme}, output_directory = {output_directory}, filename = {filename}.pdf, header = {str(build_dir / header_file)}"
+            f"Running asciidoctor-pdf with the following args: imagesdir = {imagesdir}, pdf_themesdir = {pdf_themesdir}, pdf_theme = {pdf_theme}, output_directory = {output_directory}, output = {output}, header = {str(build_dir / header_file)}"
         )
         if platform.system() == "Windows":
-            cmd = [
+            directory = f' -D "{PureWindowsPath(output_directory)}"' if output_directory else ""
+            return [
                 "powershell.exe",
-                f'asciidoctor-pdf -a imagesdir="{PureWindowsPath(imagesdir)}" -a pdf-themesdir="{PureWindowsPath(pdf_themesdir)}" -a pdf-theme="{PureWindowsPath(pdf_theme).name}" -D "{PureWindowsPath(output_directory)}" -o "{filename}.pdf" "{PureWindowsPath(build_dir / header_file)}"',
+                f'asciidoctor-pdf -a imagesdir="{PureWindowsPath(imagesdir)}" -a pdf-themesdir="{PureWindowsPath(pdf_themesdir)}" -a pdf-theme="{PureWindowsPath(pdf_theme).name}"{directory} -o "{output}" "{PureWindowsPath(build_dir / header_file)}"',
             ]
+        directory = f' -D "{PurePosixPath(output_directory)}"' if output_directory else ""
+        return f'asciidoctor-pdf -a imagesdir="{PurePosixPath(imagesdir)}" -a pdf-themesdir="{PurePosixPath(pdf_themesdir)}" -a pdf-theme="{PurePosixPath(pdf_theme).name}"{directory} -o "{output}" "{PurePosixPath(build_dir / header_file)}"'
+
+    def _run_asciidoctor_pdf(self, cmd, file: Optional[BinaryIO] = None) -> int:
+        """
+        Runs asciidoctor-pdf, copies its output into `file` if any, and returns its exit code.
+        When profiling, its wall time and resource usage are recorded.
+        """
+        start = time.perf_counter()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, shell=True)
+        if file is None:
+            process.stdout.read()
+        else:
+            shutil.copyfileobj(process.stdout, file)
+        process.stdout.close()
+
+        rusage = None
+        if hasattr(os, "wait4"):
+            # Reaped here instead of by Popen, to get the resource usage of the process tree
+            _, status, rusage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
         else:
-            cmd = f'asciidoctor-pdf -a imagesdir="{PurePosixPath(imagesdir)}" -a pdf-themesdir="{PurePosixPath(pdf_themesdir)}" -a pdf-theme="{PurePosixPath(pdf_theme).name}" -D "{PurePosixPath(output_directory)}" -o "{filename}.pdf" "{PurePosixPath(build_dir / header_file)}"'
+            process.wait()
 
-        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, shell=True)
-        process.communicate()
+        if self._profiler is not None:
+            self._profiler.record_process(
+                "asciidoctor-pdf", time.perf_counter() - start, process.returncode, rusage
+            )
+        return process.returncode
 
-    def generate_pdf(
+    def build_pdf(
         self,
         filename: str,
-        baseline: Baseline,
         output_directory: Path,
-        ini_file: Optional[Path] = None,
+        build_dir: Path,
+        header_file: Optional[str] = None,
         theme_dir: str = "default",
         pdf_theme: str = "default.yml",
-    ) -> None:
-        if not self._is_asciidoctor_pdf_installed():
+    ) -> int:
+        """
+        Renders `<filename>.pdf` into `output_directory` and returns the exit code of
+        asciidoctor-pdf, or -1 when it did not write the PDF.
+
+        The PDF is rendered under a temporary name, then renamed: when the rendering fails, a
+        previous `<filename>.pdf` is left as is and never taken for the new report.
+        """
+        partial = Path(output_directory) / f".{filename}.partial.pdf"
+        cmd = self._asciidoctor_pdf_command(
+            build_dir, header_file, theme_dir, pdf_theme, output_directory, partial.name
+        )
+        returncode = self._run_asciidoctor_pdf(cmd)
+        if returncode != 0:
+            logger.error(f"asciidoctor-pdf failed with the exit code {returncode}")
+            partial.unlink(missing_ok=True)
+            return returncode
+        if not partial.exists():
+            logger.error(f"asciidoctor-pdf did not generate {partial}")
+            return -1
+
+        os.replace(partial, Path(output_directory) / f"{filename}.pdf")
+        return 0
+
+    def build_pdf_to_stream(
+        self,
+        file: BinaryIO,
+        build_dir: Path,
+        header_file: Optional[str] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+    ) -> bool:
+        """
+        Same as `build_pdf`, but the PDF is written into `file` as asciidoctor-pdf outputs it
+        (`-o -`), without being written to the disk. Returns False when asciidoctor-pdf failed.
+        """
+        if platform.system() == "Windows":
+            # PowerShell pipes are not binary safe: the PDF goes through the build directory
+            if self.build_pdf("stream", build_dir, build_dir, header_file, theme_dir, pdf_theme):
+                return False
+            pdf_path = build_dir / "stream.pdf"
+            with open(pdf_path, "rb") as pdf:
+                shutil.copyfileobj(pdf, file)
+            pdf_path.unlink()
+            return True
+
+        cmd = self._asciidoctor_pdf_command(build_dir, header_file, theme_dir, pdf_theme, None, "-")
+        returncode = self._run_asciidoctor_pdf(cmd, file)
+        if returncode != 0:
+            logger.error(f"asciidoctor-pdf failed with the exit code {returncode}")
+            return False
+        return True
+
+    def _get_theme_directory(self, theme_dir: str) -> Path:
+        if theme_dir != "default":
+            return self._template_dir / "custom" / theme_dir
+        return self._template_dir / theme_dir
+
+    @contextmanager
+    def _workspace(
+        self, key: str, required: bool = False
+    ) -> Iterator[Optional[Workspace]]:
+        if self._workspace_manager is not None and self._reuse_workspaces:
+            workspace = self._reused_workspaces.get(key)
+            if workspace is None or not workspace.path.is_dir():
+                workspace = self._reused_workspaces[key] = self._workspace_manager.create("pdf-")
+            # Released by `close`
+            yield workspace
             return
 
-        if theme_dir != "default":
-            # update paths
-            self._header_file = (
-                self._template_dir / "custom" / theme_dir / "header.adoc"
-            )
-            self._introduction_file = (
-                self._template_dir / "custom" / theme_dir / "introduction.adoc"
-            )
-            self._synthesis_file = (
-                self._template_dir / "custom" / theme_dir / "synthesis.adoc"
+        if self._workspace_manager is not None:
+            workspace = self._workspace_manager.create("pdf-")
+        elif required:
+            workspace = Workspace(Path(tempfile.mkdtemp(prefix="octowriter-pdf-")))
+        else:
+            yield None
+            return
+
+        try:
+            yield workspace
+        finally:
+            workspace.close()
+            self._forget_fragments(workspace)
+
+    def _forget_fragments(self, workspace: Workspace) -> None:
+        # The fragments of a closed workspace are never written again
+        with self._fragments_lock:
+            self._fragments = {
+                path: digest
+                for path, digest in self._fragments.items()
+                if workspace.path not in path.parents
+            }
+
+    def close(self) -> None:
+        """
+        Removes the workspaces kept with `reuse_workspaces`.
+        """
+        for workspace in self._reused_workspaces.values():
+            workspace.close()
+            self._forget_fragments(workspace)
+        self._reused_workspaces.clear()
+
+    def _publish(
+        self, pdf_path: Optional[Path], workspace: Optional[Workspace], output_directory: Path
+    ) -> Optional[Path]:
+        if workspace is None or pdf_path is None:
+            return pdf_path
+        return workspace.promote(pdf_path, output_directory)
+
+    def _record_run(
+        self,
+        results_store: Optional[ResultsStore],
+        report_information: dict,
+        baseline: Baseline,
+        pdf_path: Optional[Path],
+    ) -> None:
+        # Only the generated reports are recorded
+        if results_store is not None and pdf_path is not None:
+            results_store.record_run(
+                report_information["audited_asset"], baseline, report=pdf_path.name
             )
 
-            if (
-                not self._header_file.exists()
-                or not self._introduction_file.exists()
-                or not self._synthesis_file.exists()
-            ):
-                logger.error(
-                    f"Either 'header.adoc', 'introduction.adoc' or 'synthesis.adoc' file does not exists in the '{theme_dir}' template folder"
+    def _get_pdf_path(self, filename: str, output_directory: Path) -> Optional[Path]:
+        pdf_path = output_directory / f"{filename}.pdf"
+        if not pdf_path.exists():
+            logger.error(f"asciidoctor-pdf did not generate {pdf_path}")
+            return None
+        return pdf_path
+
+    def _use_theme(self, theme_dir: str) -> bool:
+        # The themes are discovered and validated once by the registry
+        theme = self._template_registry.get_theme(theme_dir)
+        if theme is None:
+            logger.error(f"There is no '{theme_dir}' template folder")
+            return False
+        if not theme.valid:
+            logger.error(f"The '{theme_dir}' template folder is invalid: {'; '.join(theme.errors)}")
+            return False
+        for warning in theme.warnings:
+            logger.warning(f"'{theme_dir}' template folder: {warning}")
+
+        # update paths
+        self._header_file = theme.header_file
+        self._introduction_file = theme.introduction_file
+        self._synthesis_file = theme.synthesis_file
+        self._delta_file = theme.optional_file("delta.adoc", self._template_dir / "default")
+        self._fleet_file = theme.optional_file("fleet.adoc", self._template_dir / "default")
+        self._fleet_hosts_file = theme.optional_file(
+            "fleet_hosts.adoc", self._template_dir / "default"
+        )
+
+        logger.info(
+            f"Updating attributes of PDFGenerator with template_dir = {self._template_dir}, header_file = {self._header_file}, introduction_file = {self._introduction_file}, synthesis_file = {self._synthesis_file}"
+        )
+        return True
+
+    def _get_report_information(
+        self,
+        filename: str,
+        baseline_title: str,
+        ini_file: Optional[Path],
+        report_information: Optional[dict] = None,
+        report_date: Optional[str] = None,
+    ) -> dict:
+        if report_information is None:
+            if ini_file:
+                return self._initialize_report_from_ini(
+                    filename, baseline_title, ini_file, report_date
                 )
-                return
+            return self._initialize_report(filename, baseline_title, report_date)
 
-            logger.info(
-                f"Updating attributes of PDFGenerator with template_dir = {self._template_dir}, header_file = {self._header_file}, introduction_file = {self._introduction_file}, synthesis_file = {self._synthesis_file}"
-            )
+        if report_date is not None:
+            return {**report_information, "revdate": report_date}
+        return report_information
 
+    def _generate_draft_pdf(
+        self,
+        filename: str,
+        output_directory: Path,
+        model: ReportModel,
+        report_information: dict,
+    ) -> Path:
+        pdf_path = output_directory / f"{filename}.pdf"
+        pages = DraftPDFRenderer(self._gettext).render_to_path(model, report_information, pdf_path)
+        logger.info(f"Generated draft PDF report {pdf_path} ({pages} pages)")
+        return pdf_path
+
+    def _generate_front_matter(
+        self,
+        filename: str,
+        baseline_title: str,
+        output_directory: Path,
+        ini_file: Optional[Path],
+        theme_dir: str,
+        pdf_theme: str,
+        report_information: Optional[dict] = None,
+        report_date: Optional[str] = None,
+    ) -> Tuple[Path, dict]:
+        """
+        Loads the report information, unless it is given, then generates the header and
+        introduction files. Returns the build directory and the report information.
+
+        `report_date` replaces the revision date (today by default), so that the same inputs
+        always produce the same report.
+        """
         build_dir = output_directory / "build" / "adoc"
         build_dir.mkdir(parents=True, exist_ok=True)
 
-        if ini_file:
-            report_information = self._initialize_report_from_ini(
-                filename, baseline.title, ini_file
-            )
-        else:
-            report_information = self._initialize_report(filename, baseline.title)
+        report_information = self._get_report_information(
+            filename, baseline_title, ini_file, report_information, report_date
+        )
 
-        # If the user has a custom template with the audited entity's logo, copy it to the images directory
-        # Note: this will overwrite the previous auditee's logo
-        # Hypothesis: the user will rework the report and regenerate it, so keep the pdf theme as simple as possible and avoid making it too complex
-        if theme_dir != "default":
-            try:
-                src = report_information["auditee_logo_path"]
-                dest = self._template_dir / "custom" / theme_dir / "resources" / "images" / "logo_auditee_header.png"
-                shutil.copyfile(str(src), str(dest))
-            except:
-                logger.exception("There is no auditee logo to copy.")
+        self._copy_images(theme_dir, report_information, build_dir)
 
         self._generate_header_file(report_information, build_dir, pdf_theme)
 
@@ -554,13 +1045,360 @@ endif::[]\n"""
             build_dir,
         )
 
-        self._generate_synthesis_file(baseline.categories, build_dir)
-        self._generate_categories_files(baseline.categories, build_dir)
+        return build_dir, report_information
 
-        self.build_pdf(
-            filename,
-            output_directory,
-            build_dir,
-            theme_dir=theme_dir,
-            pdf_theme=pdf_theme,
+    def generate_pdf(
+        self,
+        filename: str,
+        baseline: Baseline,
+        output_directory: Path,
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        results_store: Optional[ResultsStore] = None,
+        model: Optional[ReportModel] = None,
+        report_information: Optional[dict] = None,
+        report_date: Optional[str] = None,
+        draft: bool = False,
+        profile: bool = False,
+    ) -> Optional[Path]:
+        """
+        Generates the PDF report of the baseline results and returns its path, or None when the
+        report could not be generated.
+
+        `report_date` is the revision date of the report, today by default.
+
+        With `draft`, or when asciidoctor-pdf is not installed, the report is rendered by the
+        built-in draft backend (see `DraftPDFRenderer`): faster, without the theme.
+
+        `model` is the report model of the results, and `report_information` the information
+        loaded by `_initialize_report_from_ini`/`_initialize_report`, when they were already built
+        for another writer.
+
+        With `results_store`, the results are recorded as a run of the audited asset once the
+        PDF exists. To record a single run for the PDF and XLSX reports, pass the store to
+        `ReportGenerator.generate_reports` instead of each generator.
+
+        With a workspace manager, the AsciiDoc files and the PDF are generated in a workspace,
+        then the PDF is moved into `output_directory`. The workspace is removed after the
+        generation, unless the generator was created with `reuse_workspaces` (see `close`): only
+        then are the unchanged fragments not written again by the next generation.
+
+        With `profile`, the generation is profiled (see `Profiler`), and `<filename>-pdf.prof`
+        and `<filename>-pdf.profile.json` are written into `output_directory`.
+        """
+        with profiling(profile, output_directory, f"{filename}-pdf") as self._profiler:
+            try:
+                return self._generate_pdf(
+                    filename,
+                    baseline,
+                    output_directory,
+                    ini_file,
+                    theme_dir,
+                    pdf_theme,
+                    results_store,
+                    model,
+                    report_information,
+                    report_date,
+                    draft,
+                )
+            finally:
+                self._profiler = None
+
+    def _generate_pdf(
+        self,
+        filename: str,
+        baseline: Baseline,
+        output_directory: Path,
+        ini_file: Optional[Path],
+        theme_dir: str,
+        pdf_theme: str,
+        results_store: Optional[ResultsStore],
+        model: Optional[ReportModel],
+        report_information: Optional[dict],
+        report_date: Optional[str],
+        draft: bool,
+    ) -> Optional[Path]:
+        if not draft and not self._is_asciidoctor_pdf_installed():
+            logger.warning("asciidoctor-pdf is not installed, generating a draft PDF report")
+            draft = True
+
+        if draft:
+            with phase(self._profiler, "report_information"):
+                report_information = self._get_report_information(
+                    filename, baseline.title, ini_file, report_information, report_date
+                )
+            with phase(self._profiler, "model"):
+                model = model or ReportModel.build(baseline, self._gettext)
+            with self._workspace(filename) as workspace:
+                with phase(self._profiler, "render"):
+                    pdf_path = self._generate_draft_pdf(
+                        filename,
+                        workspace.path if workspace else output_directory,
+                        model,
+                        report_information,
+                    )
+                pdf_path = self._publish(pdf_path, workspace, output_directory)
+            self._record_run(results_store, report_information, baseline, pdf_path)
+            return pdf_path
+
+        if not self._use_theme(theme_dir):
+            return None
+
+        with self._workspace(filename) as workspace:
+            work_directory = workspace.path if workspace else output_directory
+            with phase(self._profiler, "front_matter"):
+                build_dir, report_information = self._generate_front_matter(
+                    filename,
+                    baseline.title,
+                    work_directory,
+                    ini_file,
+                    theme_dir,
+                    pdf_theme,
+                    report_information,
+                    report_date,
+                )
+
+            with phase(self._profiler, "model"):
+                if model is None:
+                    model = ReportModel.build(baseline, self._gettext)
+
+            with phase(self._profiler, "asciidoc"):
+                self._generate_synthesis_file(model, build_dir)
+                self._generate_categories_files(model.categories, build_dir)
+
+            with phase(self._profiler, "render"):
+                returncode = self.build_pdf(
+                    filename,
+                    work_directory,
+                    build_dir,
+                    theme_dir=theme_dir,
+                    pdf_theme=pdf_theme,
+                )
+            pdf_path = self._publish(
+                self._get_pdf_path(filename, work_directory) if returncode == 0 else None,
+                workspace,
+                output_directory,
+            )
+        self._record_run(results_store, report_information, baseline, pdf_path)
+        return pdf_path
+
+    def write_pdf(
+        self,
+        file: BinaryIO,
+        baseline: Baseline,
+        filename: str = "report",
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        results_store: Optional[ResultsStore] = None,
+        model: Optional[ReportModel] = None,
+        report_information: Optional[dict] = None,
+        report_date: Optional[str] = None,
+        draft: bool = False,
+    ) -> bool:
+        """
+        Same as `generate_pdf`, but the PDF is written into `file` (e.g. an HTTP response or an
+        upload stream) as it is rendered, instead of the output directory. Only the AsciiDoc
+        files go through a workspace. `file` only needs a `write` method.
+
+        `filename` is the name recorded in the results store. Returns False when the report
+        could not be generated.
+        """
+        if not draft and not self._is_asciidoctor_pdf_installed():
+            logger.warning("asciidoctor-pdf is not installed, generating a draft PDF report")
+            draft = True
+
+        if draft:
+            report_information = self._get_report_information(
+                filename, baseline.title, ini_file, report_information, report_date
+            )
+            pages = DraftPDFRenderer(self._gettext).render(
+                model or ReportModel.build(baseline, self._gettext), report_information, file
+            )
+            logger.info(f"Generated draft PDF report ({pages} pages)")
+            self._record_run(
+                results_store, report_information, baseline, Path(f"{filename}.pdf")
+            )
+            return True
+
+        if not self._use_theme(theme_dir):
+            return False
+
+        with self._workspace(filename, required=True) as workspace:
+            build_dir, report_information = self._generate_front_matter(
+                filename,
+                baseline.title,
+                workspace.path,
+                ini_file,
+                theme_dir,
+                pdf_theme,
+                report_information,
+                report_date,
+            )
+
+            if model is None:
+                model = ReportModel.build(baseline, self._gettext)
+
+            self._generate_synthesis_file(model, build_dir)
+            self._generate_categories_files(model.categories, build_dir)
+
+            generated = self.build_pdf_to_stream(
+                file, build_dir, theme_dir=theme_dir, pdf_theme=pdf_theme
+            )
+        if generated:
+            self._record_run(
+                results_store, report_information, baseline, Path(f"{filename}.pdf")
+            )
+        return generated
+
+    def generate_pdf_bytes(self, baseline: Baseline, **kwargs) -> Optional[bytes]:
+        """
+        Returns the PDF report of the baseline results, or None when the report could not be
+        generated, see `write_pdf` for the arguments.
+        """
+        file = io.BytesIO()
+        if not self.write_pdf(file, baseline, **kwargs):
+            return None
+        return file.getvalue()
+
+    def generate_delta_pdf(
+        self,
+        filename: str,
+        previous: Baseline,
+        baseline: Baseline,
+        output_directory: Path,
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        report_date: Optional[str] = None,
+    ) -> Optional[Path]:
+        """
+        Generates a follow-up report of `baseline` against the `previous` results of the same host:
+        the synthesis lists the newly failing and newly fixed rules, and only these rules are
+        detailed.
+        """
+        if not self._is_asciidoctor_pdf_installed():
+            return None
+
+        if not self._use_theme(theme_dir):
+            return None
+
+        delta = compute_delta(previous, baseline)
+
+        with self._workspace(filename) as workspace:
+            work_directory = workspace.path if workspace else output_directory
+            build_dir, _ = self._generate_front_matter(
+                filename,
+                baseline.title,
+                work_directory,
+                ini_file,
+                theme_dir,
+                pdf_theme,
+                report_date=report_date,
+            )
+
+            self._generate_delta_synthesis_file(delta, build_dir)
+            model = ReportModel.from_categories(baseline.title, delta.changed_categories())
+            self._generate_categories_files(model.categories, build_dir)
+
+            returncode = self.build_pdf(
+                filename,
+                work_directory,
+                build_dir,
+                theme_dir=theme_dir,
+                pdf_theme=pdf_theme,
+            )
+            return self._publish(
+                self._get_pdf_path(filename, work_directory) if returncode == 0 else None,
+                workspace,
+                output_directory,
+            )
+
+    def generate_fleet_pdf(
+        self,
+        filename: str,
+        results: List[Tuple[str, Baseline]],
+        output_directory: Path,
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        report_date: Optional[str] = None,
+        evidence_lines: int = 5,
+    ) -> Optional[Path]:
+        """
+        Generates one consolidated PDF report for several hosts audited with the same baseline,
+        instead of one report per host.
+
+        `results` is a list of (host, results) pairs, indexed by rule id (see
+        `index_fleet_results`). The synthesis lists the rules failing on at least one host, then
+        each of them is detailed once (description, check, recommendation), followed by the
+        table of its failing hosts with the first `evidence_lines` lines of their terminal
+        output. The rules compliant on all the hosts are only counted. The subtitle names the
+        first `fleet_subtitle_hosts` hosts and counts the others, instead of the audited asset
+        of `ini_file`.
+        """
+        logger.info("Running consolidated PDF report generation")
+        logger.debug(
+            f"args: filename = {filename}, hosts = {[host for host, _ in results]}, output_directory = {output_directory}, ini_file = {ini_file}, theme_dir = {theme_dir}, pdf_theme = {pdf_theme}"
         )
+
+        if not results:
+            logger.error("There are no results to consolidate")
+            return None
+
+        if not self._is_asciidoctor_pdf_installed():
+            return None
+
+        if not self._use_theme(theme_dir):
+            return None
+
+        index = index_fleet_results(results)
+
+        # The report covers the hosts of the results, not the single asset of the ini file
+        report_information = self._get_report_information(
+            filename, results[0][1].title, ini_file, report_date=report_date
+        )
+        named_hosts = index.hosts[: self.fleet_subtitle_hosts]
+        audited_asset = ", ".join(named_hosts)
+        if len(index.hosts) > len(named_hosts):
+            audited_asset += f" (+{len(index.hosts) - len(named_hosts)})"
+        report_information = {**report_information, "audited_asset": audited_asset}
+
+        with self._workspace(filename) as workspace:
+            work_directory = workspace.path if workspace else output_directory
+            build_dir, _ = self._generate_front_matter(
+                filename,
+                results[0][1].title,
+                work_directory,
+                ini_file,
+                theme_dir,
+                pdf_theme,
+                report_information,
+            )
+
+            self._generate_fleet_synthesis_file(index, build_dir)
+            self._generate_rules_files(
+                index.failing_rules,
+                build_dir,
+                lambda fleet_rule, build_dir: self._generate_fleet_rule_file(
+                    fleet_rule, build_dir, evidence_lines
+                ),
+            )
+            for fleet_category in index.categories:
+                rule_ids = [fleet_rule.rule.id for fleet_rule in fleet_category.failing_rules]
+                if rule_ids:
+                    self._generate_category_file(fleet_category.category, rule_ids, build_dir)
+
+            returncode = self.build_pdf(
+                filename,
+                work_directory,
+                build_dir,
+                theme_dir=theme_dir,
+                pdf_theme=pdf_theme,
+            )
+            return self._publish(
+                self._get_pdf_path(filename, work_directory) if returncode == 0 else None,
+                workspace,
+                output_directory,
+            )
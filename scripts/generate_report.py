@@ -0,0 +1,387 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import logging
+from pathlib import Path
+import time
+import traceback
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from octoconf.__init__ import __version__ as octoconf_version
+from octoconf.utils.logger import *
+
+from . import __version__
+from .artifact_cache import (
+    ArtifactCache,
+    directory_fingerprint,
+    files_fingerprint,
+    fingerprint,
+    results_fingerprint,
+)
+from .generate_pdf import PDFGenerator, asciidoctor_pdf_version
+from .generate_xls import XLSGenerator
+from .lazy_import import lazy_import
+from .localization import load_localization
+from .report_model import ReportModel
+from .workspace import WorkspaceManager
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+    from .results_store import ResultsStore
+
+xlsxwriter = lazy_import("xlsxwriter")
+
+logger = logging.getLogger(__name__)
+
+
+def to_xls_report_information(report_information: dict) -> dict:
+    """
+    Returns the information of the XLSX report from the information loaded for the PDF report.
+    """
+    return {
+        "audited-asset": report_information["audited_asset"],
+        "classification-level": report_information["classification-level"],
+        "report-date": report_information["revdate"],
+    }
+
+
+@dataclass
+class ArtifactResult:
+    kind: str
+    # "generated", "cached" (copied from the artifact cache), "skipped" (nothing was generated,
+    # e.g. the theme is invalid) or "failed"
+    status: str
+    path: Optional[Path]
+    elapsed: float
+    error: Optional[str] = None
+
+
+@dataclass
+class ReportResult:
+    pdf: ArtifactResult
+    xlsx: ArtifactResult
+    elapsed: float
+
+    @property
+    def succeeded(self) -> bool:
+        return all(
+            artifact.status in ("generated", "cached") for artifact in (self.pdf, self.xlsx)
+        )
+
+
+class ReportGenerator:
+    """
+    Generates the PDF and XLSX reports of the same results in a single call.
+
+    With an `artifact_cache`, a report whose inputs (results, report information, locale,
+    templates, theme and tool versions) did not change since a previous generation is copied
+    from the cache instead of being generated again. Pass a fixed `report_date` to
+    `generate_reports`, otherwise the revision date changes the inputs every day.
+    """
+
+    def __init__(
+        self,
+        pdf_generator: Optional[PDFGenerator] = None,
+        xls_generator: Optional[XLSGenerator] = None,
+        artifact_cache: Optional[ArtifactCache] = None,
+    ) -> None:
+        self._pdf_generator = pdf_generator or PDFGenerator()
+        self._xls_generator = xls_generator or XLSGenerator()
+        self._artifact_cache = artifact_cache
+
+    def _run(self, kind: str, generate: Callable[[], Optional[Path]]) -> ArtifactResult:
+        start = time.perf_counter()
+        try:
+            path = generate()
+        except Exception:
+            logger.exception(f"Unable to generate the {kind} report")
+            return ArtifactResult(
+                kind, "failed", None, time.perf_counter() - start, traceback.format_exc()
+            )
+
+        status = "generated" if path is not None else "skipped"
+        return ArtifactResult(kind, status, path, time.perf_counter() - start)
+
+    def _run_cached(
+        self,
+        kind: str,
+        key: Optional[str],
+        destination: Path,
+        generate: Callable[[], Optional[Path]],
+    ) -> ArtifactResult:
+        if key is None:
+            return self._run(kind, generate)
+
+        start = time.perf_counter()
+        suffix = destination.suffix
+        if self._artifact_cache.fetch(key, suffix, destination):
+            logger.info(f"{kind} report copied from the artifact cache")
+            return ArtifactResult(kind, "cached", destination, time.perf_counter() - start)
+
+        if self._artifact_cache.link:
+            # The previous report may be a hardlink to a cached artifact: never write through it
+            destination.unlink(missing_ok=True)
+
+        result = self._run(kind, generate)
+        if result.status == "generated":
+            self._artifact_cache.put(key, suffix, result.path)
+        return result
+
+    def _pdf_cache_key(
+        self, results_key: str, report_information: dict, theme_dir: str, pdf_theme: str
+    ) -> str:
+        theme_directory = self._pdf_generator._get_theme_directory(theme_dir)
+        logo = report_information.get("auditee_logo_path")
+        return fingerprint(
+            "pdf",
+            __version__,
+            octoconf_version,
+            asciidoctor_pdf_version(),
+            results_key,
+            report_information,
+            self._pdf_generator._get_locale(),
+            directory_fingerprint(theme_directory),
+            pdf_theme,
+            files_fingerprint([Path(logo)]) if logo else None,
+        )
+
+    def _xlsx_cache_key(
+        self, results_key: str, report_information: dict, streaming: bool
+    ) -> str:
+        return fingerprint(
+            "xlsx",
+            __version__,
+            octoconf_version,
+            xlsxwriter.__version__,
+            results_key,
+            report_information,
+            self._xls_generator._get_locale(),
+            {
+                name: dict(values)
+                for name, values in self._xls_generator._get_style_sheet().formats.items()
+            },
+            streaming,
+            self._xls_generator._table_layout,
+        )
+
+    def _load_report_information(
+        self,
+        filename: str,
+        baseline_title: str,
+        ini_file: Optional[Path],
+        report_date: Optional[str],
+    ) -> dict:
+        # Loaded before starting the threads: without ini file, the information is prompted
+        if ini_file:
+            return self._pdf_generator._initialize_report_from_ini(
+                filename, baseline_title, ini_file, report_date
+            )
+        return self._pdf_generator._initialize_report(filename, baseline_title, report_date)
+
+    def _generate(
+        self,
+        filename: str,
+        baseline: Baseline,
+        output_directory: Path,
+        ini_file: Optional[Path],
+        theme_dir: str,
+        pdf_theme: str,
+        streaming: bool,
+        report_information: dict,
+        model: ReportModel,
+        results_key: Optional[str],
+        profile: bool = False,
+    ) -> ReportResult:
+        start = time.perf_counter()
+        xls_report_information = to_xls_report_information(report_information)
+
+        pdf_key = xlsx_key = None
+        if self._artifact_cache is not None:
+            pdf_key = self._pdf_cache_key(
+                results_key, report_information, theme_dir, pdf_theme
+            )
+            xlsx_key = self._xlsx_cache_key(results_key, xls_report_information, streaming)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            pdf_future = executor.submit(
+                self._run_cached,
+                "PDF",
+                pdf_key,
+                output_directory / f"{filename}.pdf",
+                lambda: self._pdf_generator.generate_pdf(
+                    filename,
+                    baseline,
+                    output_directory,
+                    ini_file=ini_file,
+                    theme_dir=theme_dir,
+                    pdf_theme=pdf_theme,
+                    model=model,
+                    report_information=report_information,
+                    profile=profile,
+                ),
+            )
+            xlsx_result = self._run_cached(
+                "XLSX",
+                xlsx_key,
+                output_directory / f"{filename}.xlsx",
+                lambda: self._xls_generator.generate_xls(
+                    filename,
+                    baseline,
+                    output_directory,
+                    ini_file=ini_file,
+                    streaming=streaming,
+                    model=model,
+                    report_information=xls_report_information,
+                    profile=profile,
+                ),
+            )
+            pdf_result = pdf_future.result()
+
+        return ReportResult(pdf_result, xlsx_result, time.perf_counter() - start)
+
+    def generate_reports(
+        self,
+        filename: str,
+        baseline: Baseline,
+        output_directory: Path,
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        streaming: bool = False,
+        report_date: Optional[str] = None,
+        profile: bool = False,
+        results_store: Optional[ResultsStore] = None,
+    ) -> ReportResult:
+        """
+        Generates `<filename>.pdf` and `<filename>.xlsx`.
+
+        The report information and the report model are loaded once for both reports. The PDF
+        report is generated in a thread, so that the XLSX report is written while asciidoctor-pdf
+        renders the PDF.
+
+        `report_date` is the revision date of both reports, today by default.
+
+        With `profile`, both generations are profiled, see `PDFGenerator.generate_pdf` and
+        `XLSGenerator.generate_xls`.
+
+        With `results_store`, the results are recorded as a single run of the audited asset,
+        with the names of the reports, once at least one of them exists.
+        """
+        logger.info("Running PDF and XLSX report generation")
+        start = time.perf_counter()
+
+        report_information = self._load_report_information(
+            filename, baseline.title, ini_file, report_date
+        )
+        result = self._generate(
+            filename,
+            baseline,
+            output_directory,
+            ini_file,
+            theme_dir,
+            pdf_theme,
+            streaming,
+            report_information,
+            ReportModel.build(baseline, self._pdf_generator._gettext),
+            results_fingerprint(baseline) if self._artifact_cache is not None else None,
+            profile,
+        )
+        result.elapsed = time.perf_counter() - start
+
+        reports = [
+            artifact.path.name
+            for artifact in (result.pdf, result.xlsx)
+            if artifact.status in ("generated", "cached")
+        ]
+        if results_store is not None and reports:
+            results_store.record_run(
+                report_information["audited_asset"], baseline, report=", ".join(reports)
+            )
+
+        logger.info(f"Reports generation done: {result}")
+        return result
+
+    def generate_localized_reports(
+        self,
+        filename: str,
+        baseline: Baseline,
+        output_directory: Path,
+        locales: List[str],
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        streaming: bool = False,
+        report_date: Optional[str] = None,
+    ) -> Dict[str, ReportResult]:
+        """
+        Generates `<filename>_<locale>.pdf` and `<filename>_<locale>.xlsx` for each locale, and
+        returns the results by locale.
+
+        The locale independent work is done once: the report information is loaded, and the
+        report model (anchors, worksheet names, counts and non-conformities) and the results
+        fingerprint are computed once. Only the labels are localized again. The reports of all
+        the locales are then generated concurrently, each by generators with their own
+        translations: the global octoconf locale is never changed.
+        """
+        logger.info(f"Running PDF and XLSX report generation in {locales}")
+        start = time.perf_counter()
+
+        report_information = self._load_report_information(
+            filename, baseline.title, ini_file, report_date
+        )
+        model = ReportModel.build(baseline)
+        results_key = (
+            results_fingerprint(baseline) if self._artifact_cache is not None else None
+        )
+        style_sheet = self._xls_generator._get_style_sheet()
+        # The PDF reports of the locales must not share a build directory
+        workspace_manager = self._pdf_generator._workspace_manager or WorkspaceManager()
+
+        def generate(locale: str) -> ReportResult:
+            localization = load_localization(locale)
+            generator = ReportGenerator(
+                PDFGenerator(
+                    self._pdf_generator._template_registry,
+                    workspace_manager,
+                    localization,
+                ),
+                XLSGenerator(
+                    style_sheet,
+                    self._xls_generator._workspace_manager,
+                    localization,
+                    self._xls_generator._table_layout,
+                ),
+                self._artifact_cache,
+            )
+            return generator._generate(
+                f"{filename}_{locale}",
+                baseline,
+                output_directory,
+                ini_file,
+                theme_dir,
+                pdf_theme,
+                streaming,
+                {
+                    **report_information,
+                    "filename": f"{filename}_{locale}",
+                    "document-title": localization.gettext("compliance_report_title"),
+                },
+                model.with_labels(localization.gettext),
+                results_key,
+            )
+
+        with ThreadPoolExecutor(max_workers=max(len(locales), 1)) as executor:
+            results = dict(zip(locales, executor.map(generate, locales)))
+
+        logger.info(
+            f"Localized reports generation done in {time.perf_counter() - start:.2f}s: {results}"
+        )
+        return results
@@ -4,254 +4,103 @@
 # @link https://github.com/nillyr/octowriter
 # @since 0.1.0
 
+from __future__ import annotations
+
+from collections import Counter
+import io
 from itertools import chain
 import logging
 from pathlib import Path
 import re
 import shutil
-from typing import List, Optional
-import zipfile
+from typing import TYPE_CHECKING, BinaryIO, List, Optional, Tuple, Union
 
 import configparser
-import xlsxwriter
 
-from octoconf.entities.baseline import Baseline
-from octoconf.entities.category import Category
-from octoconf.entities.rule import Rule
-import octoconf.utils.config as config
 import octoconf.utils.global_values as global_values
 from octoconf.utils.logger import *
 from octoconf.utils.timestamp import today
 
 from octoconf.__init__ import __version__, __url__
 
-logger = logging.getLogger(__name__)
+from .delta import BaselineDelta, compute_delta
+from .fleet_matrix import COMPLIANT, FAILED, FleetMatrix
+from .lazy_import import lazy_import
+from .localization import Localization
+from .profiling import Profiler, phase, profiling
+from .report_model import (
+    LEVELS,
+    CategoryEntry,
+    ReportModel,
+    RuleEntry,
+    result_key,
+    sanitize_worksheet_name,
+)
+from .workspace import WorkspaceManager
+from .xls_styles import StyleSheet, compile_style_sheet
 
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
 
-class XLSGenerator:
-    wb: xlsxwriter.workbook.Workbook = None
-    _formats: dict = {}
+    from .results_store import ResultsStore
 
-    def __init__(self) -> None:
-        pass
+# Loaded on first use, so that importing the module does not cost the XLSX dependencies
+xlsxwriter = lazy_import("xlsxwriter")
+zipfile = lazy_import("zipfile")
 
-    def _add_new_format(self, name: str, values: dict) -> None:
-        # fmt:off
-        self._formats[name] = self.wb.add_format(
-            {
-                "bold": values["bold"],
-                "border": values["border"],
-                "align": values["align"],
-                "valign": values["valign"],
-                "font_color": values["font_color"],
-                "bg_color": values["bg_color"]
-            })
+logger = logging.getLogger(__name__)
+
+
+class XLSGenerator:
+    def __init__(
+        self,
+        style_sheet: Optional[StyleSheet] = None,
+        workspace_manager: Optional[WorkspaceManager] = None,
+        localization: Optional[Localization] = None,
+        table_layout: bool = False,
+    ) -> None:
+        self.wb: Optional[xlsxwriter.workbook.Workbook] = None
+        self._formats: dict = {}
+        self._style_sheet = style_sheet
+        # With a workspace manager, the workbook is generated in a workspace and only the final
+        # file is written into the output directory
+        self._workspace_manager = workspace_manager
+        # Locale of the reports, the global octoconf locale by default
+        self._localization = localization
+        # Profiler of the current generation, see `generate_xls`
+        self._profiler: Optional[Profiler] = None
+        # Localized labels of the report model being written
+        self._labels: dict = {}
+        # Category sheets written as worksheet tables, see `_write_results_table`
+        self._table_layout = table_layout
 
     def _get_format(self, name: str) -> xlsxwriter.workbook.Format:
         if name in self._formats:
             return self._formats.get(name)
 
+    def _get_style_sheet(self) -> StyleSheet:
+        # Compiled on first use, when the configuration has been loaded
+        if self._style_sheet is None:
+            self._style_sheet = compile_style_sheet()
+        return self._style_sheet
+
     def _init_all_format(self):
-        self._add_new_format(
-            "information_header",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_size": 14,
-                "font_color": config.get_config("report_colors", "header_font_color"),
-                "bg_color": config.get_config(
-                    "report_colors", "header_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "header",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("report_colors", "header_font_color"),
-                "bg_color": config.get_config(
-                    "report_colors", "header_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "sub_header",
-            {
-                "bold": 0,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("report_colors", "header_font_color"),
-                "bg_color": config.get_config(
-                    "report_colors", "sub_header_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "minimal",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("level_colors", "lvl_minimal"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "intermediary",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("level_colors", "lvl_intermediary"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "enhanced",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("level_colors", "lvl_enhanced"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "high",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("level_colors", "lvl_high"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "check",
-            {
-                "bold": 0,
-                "border": 1,
-                "align": "left",
-                "valign": "vcenter",
-                "font_color": config.get_config("report_colors", "default_font_color"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "success",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("status_colors", "success"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "failed",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("status_colors", "failed"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "na",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config("status_colors", "to_be_defined"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "bold",
-            {
-                "bold": 1,
-                "border": 1,
-                "align": "left",
-                "valign": "vcenter",
-                "font_color": config.get_config("report_colors", "default_font_color"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "regular",
-            {
-                "bold": 0,
-                "border": 1,
-                "align": "left",
-                "valign": "vcenter",
-                "font_color": config.get_config("report_colors", "default_font_color"),
-                "bg_color": config.get_config(
-                    "report_colors", "default_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "classification",
-            {
-                "bold": 0,
-                "border": 1,
-                "align": "left",
-                "valign": "vcenter",
-                "font_color": config.get_config(
-                    "classification", "classification_font_color"
-                ),
-                "bg_color": config.get_config(
-                    "classification", "classification_background_color"
-                ),
-            },
-        )
-        self._add_new_format(
-            "classification_center",
-            {
-                "bold": 0,
-                "border": 0,
-                "align": "center",
-                "valign": "vcenter",
-                "font_color": config.get_config(
-                    "classification", "classification_font_color"
-                ),
-                "bg_color": config.get_config(
-                    "classification", "classification_background_color"
-                ),
-            },
-        )
+        self._formats = self._get_style_sheet().bind(self.wb)
+
+    def _gettext(self, message: str) -> str:
+        if self._localization is not None:
+            return self._localization.gettext(message)
+        return global_values.localize.gettext(message)
+
+    def _get_locale(self) -> str:
+        if self._localization is not None:
+            return self._localization.locale
+        return global_values.get_locale()
+
+    def _label(self, key: str) -> str:
+        if key in self._labels:
+            return self._labels[key]
+        return self._gettext(key)
 
     def _add_conditional_formatting(
         self, ws: xlsxwriter.workbook.Worksheet, range
@@ -260,134 +109,200 @@ class XLSGenerator:
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("minimal"),
+            'value': self._gettext("minimal"),
             'format': self._get_format("minimal")
         })
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("intermediary"),
+            'value': self._gettext("intermediary"),
             'format': self._get_format("intermediary")
         })
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("enhanced"),
+            'value': self._gettext("enhanced"),
             'format': self._get_format("enhanced")
         })
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("high"),
+            'value': self._gettext("high"),
             'format': self._get_format("high")
         })
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("success"),
+            'value': self._gettext("success"),
             'format': self._get_format("success")
         })
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("failed"),
+            'value': self._gettext("failed"),
             'format': self._get_format("failed")
         })
         ws.conditional_format(range, {
             'type': 'text',
             'criteria': 'containing',
-            'value': global_values.localize.gettext("na"),
+            'value': self._gettext("na"),
             'format': self._get_format("na")
         })
         # fmt:on
 
+    def _add_results_data_validation(
+        self, ws: xlsxwriter.workbook.Worksheet, first_row: int, last_row: int
+    ) -> None:
+        # Rows are 1-indexed, as in the A1 notation used by the callers
+        ws.data_validation(
+            f"B{first_row}:B{last_row}",
+            {
+                "validate": "list",
+                "source": [
+                    self._gettext("minimal"),
+                    self._gettext("intermediary"),
+                    self._gettext("enhanced"),
+                    self._gettext("high"),
+                ],
+            },
+        )
+        ws.data_validation(
+            f"F{first_row}:F{last_row}",
+            {
+                "validate": "list",
+                "source": [
+                    self._gettext("success"),
+                    self._gettext("failed"),
+                    self._gettext("na"),
+                ],
+            },
+        )
+
     def _write_results_on_worksheet(
-        self, ws: xlsxwriter.workbook.Worksheet, rules: List[Rule]
+        self,
+        ws: xlsxwriter.workbook.Worksheet,
+        rules: List[RuleEntry],
+        streaming: bool = False,
     ) -> None:
         checkpoint_row = 4
         ws.write(
             f"B{checkpoint_row}",
-            global_values.localize.gettext("level"),
+            self._gettext("level"),
             self._get_format("sub_header"),
         )
         ws.merge_range(
             f"C{checkpoint_row}:E{checkpoint_row}",
-            "Rule",
+            self._gettext("rule_name"),
             self._get_format("sub_header"),
         )
         ws.write(
             f"F{checkpoint_row}",
-            global_values.localize.gettext("result"),
+            self._gettext("result"),
             self._get_format("sub_header"),
         )
 
         check_row = checkpoint_row + 1
+        first_row = check_row
         for rule in rules:
-            ws.data_validation(
-                f"B{check_row}",
-                {
-                    "validate": "list",
-                    "source": [
-                        global_values.localize.gettext("minimal"),
-                        global_values.localize.gettext("intermediary"),
-                        global_values.localize.gettext("enhanced"),
-                        global_values.localize.gettext("high"),
-                    ],
-                },
-            )
-            ws.data_validation(
-                f"F{check_row}",
-                {
-                    "validate": "list",
-                    "source": [
-                        global_values.localize.gettext("success"),
-                        global_values.localize.gettext("failed"),
-                        global_values.localize.gettext("na"),
-                    ],
-                },
-            )
+            if not streaming:
+                self._add_results_data_validation(ws, check_row, check_row)
 
-            ws.write(
-                f"B{check_row}",
-                global_values.localize.gettext(rule.level),
-                self._get_format(rule.level),
-            )
-            ws.merge_range(
-                f"C{check_row}:E{check_row}", rule.title, self._get_format("check")
-            )
-
-            key = "success" if rule.compliant == True else "failed"
-            ws.write(
-                f"F{check_row}",
-                global_values.localize.gettext(key),
-                self._get_format(key),
-            )
+            self._write_rule_row(ws, rule, check_row)
 
             check_row += 1
             checkpoint_row = check_row
 
-    def _write_results(self, categories: List[Category]) -> None:
-        for category in categories:
-            # It is not possible to use a worksheet's title > 31 chars, so we need to slice
-            regex = r"(</?x>)|[^a-zàâçéèêëîïôûù0-9\s\-]"
-            category_name = re.sub(
-                regex,
-                "",
-                category.name[0:31],
-                0,
-                re.IGNORECASE,
+        # In streaming mode, one validation per column is added once all the rows are
+        # known, instead of keeping two validation records in memory for each rule
+        if streaming and check_row > first_row:
+            self._add_results_data_validation(ws, first_row, check_row - 1)
+
+    def _write_rule_row(
+        self, ws: xlsxwriter.workbook.Worksheet, entry: RuleEntry, row: int
+    ) -> None:
+        rule = entry.rule
+        ws.write(f"B{row}", self._label(rule.level), self._get_format(rule.level))
+        ws.merge_range(f"C{row}:E{row}", rule.title, self._get_format("check"))
+        ws.write(
+            f"F{row}",
+            self._label(entry.result_key),
+            self._get_format(entry.result_key),
+        )
+
+    def _write_results_table(
+        self,
+        ws: xlsxwriter.workbook.Worksheet,
+        rules: List[RuleEntry],
+        streaming: bool = False,
+    ) -> None:
+        """
+        Writes the rules as a worksheet table: one plain row per rule (level, rule, severity, id
+        and result), styled by the table and the conditional formatting, with an autofilter.
+        The level and the result stay in the columns B and F read by the summary.
+        """
+        header_row = 4
+        first_row = header_row + 1
+        last_row = header_row + len(rules)
+        headers = [
+            self._gettext("level"),
+            self._gettext("rule_name"),
+            self._gettext("rule_severity"),
+            self._gettext("rule_id"),
+            self._gettext("result"),
+        ]
+
+        if streaming:
+            # Worksheet tables are not supported in constant memory mode: the rows are
+            # written in order, with a plain autofilter
+            ws.write_row(f"B{header_row}", headers, self._get_format("sub_header"))
+        for row, entry in enumerate(rules, start=first_row):
+            rule = entry.rule
+            ws.write_row(
+                f"B{row}",
+                [
+                    self._label(rule.level),
+                    rule.title,
+                    self._label(rule.severity),
+                    rule.id,
+                    self._label(entry.result_key),
+                ],
+            )
+
+        if streaming:
+            ws.autofilter(f"B{header_row}:F{max(last_row, header_row)}")
+        else:
+            # A table needs a data row, even when the category is empty
+            ws.add_table(
+                f"B{header_row}:F{max(last_row, first_row)}",
+                {
+                    "style": "Table Style Light 1",
+                    "columns": [{"header": header} for header in headers],
+                },
             )
-            ws = self.wb.add_worksheet(name=category_name)
+
+        if rules:
+            self._add_results_data_validation(ws, first_row, last_row)
+
+    def _write_results(
+        self, categories: List[CategoryEntry], streaming: bool = False
+    ) -> None:
+        for entry in categories:
+            category = entry.category
+            ws = self.wb.add_worksheet(name=entry.worksheet_name)
             ws.hide_gridlines(2)
             ws.set_column("A:A", 2)
             ws.set_column("B:B", 20)
-            ws.set_column("C:E", 35)
+            if self._table_layout:
+                ws.set_column("C:C", 70)
+                ws.set_column("D:E", 18)
+            else:
+                ws.set_column("C:E", 35)
             ws.set_column("F:F", 20)
 
             ws.merge_range("C1:E1", "", self._get_format("classification_center"))
             ws.write_formula(
                 "C1:E1",
-                "=%s!D10" % (global_values.localize.gettext("information")),
+                "=%s!D10" % (self._gettext("information")),
                 self._get_format("classification_center"),
                 "",
             )
@@ -401,7 +316,10 @@ class XLSGenerator:
             range_e = xlsxwriter.utility.xl_range(0, 5, 1048575, 5)
             self._add_conditional_formatting(ws, range_e)
             # Write results in the worksheet and get nb of success/failed for stacked chart
-            self._write_results_on_worksheet(ws, category.rules)
+            if self._table_layout:
+                self._write_results_table(ws, entry.rules, streaming)
+            else:
+                self._write_results_on_worksheet(ws, entry.rules, streaming)
 
     def _add_charts(self, ws: xlsxwriter.worksheet.Worksheet, last_row: int) -> None:
         # fmt:on
@@ -413,14 +331,14 @@ class XLSGenerator:
             {"type": "column", "subtype": "stacked"}
         )
         staked_chart_by_lvl.set_title(
-            {"name": global_values.localize.gettext("compliance_chart_title")}
+            {"name": self._gettext("compliance_chart_title")}
         )
         staked_chart_by_lvl.set_x_axis(
-            {"name": global_values.localize.gettext("levels")}
+            {"name": self._gettext("levels")}
         )
         staked_chart_by_lvl.set_y_axis(
             {
-                "name": global_values.localize.gettext("nb_checks"),
+                "name": self._gettext("nb_checks"),
                 "major_gridlines": {"visible": False},
             }
         )
@@ -431,7 +349,7 @@ class XLSGenerator:
                 "categories": f"={ws_name}!$E$5:$H$5",
                 "values": f"={ws_name}!$E${last_row}:H${last_row}",
                 "data_labels": {"value": True},
-                "fill": {"color": "#" + config.get_config("status_colors", "success")},
+                "fill": {"color": "#" + self._get_style_sheet().success_color},
                 "gap": 20,
             }
         )
@@ -442,7 +360,7 @@ class XLSGenerator:
                 "categories": f"={ws_name}!$L$5:$L$5",
                 "values": f"={ws_name}!$I${last_row}:L${last_row}",
                 "data_labels": {"value": True},
-                "fill": {"color": "#" + config.get_config("status_colors", "failed")},
+                "fill": {"color": "#" + self._get_style_sheet().failed_color},
                 "gap": 20,
             }
         )
@@ -450,11 +368,11 @@ class XLSGenerator:
         # Do not stick the chart on the far left
         ws.insert_chart(f"E{last_row+5}", staked_chart_by_lvl)
 
-    def _add_synthesis_worksheet(self, categories: List[Category]) -> None:
+    def _add_synthesis_worksheet(self, categories: List[CategoryEntry]) -> None:
         """
         Resumes all the sheets (categories) of the excel file in order to present in the same sheet the synthesis of the results.
         """
-        ws = self.wb.add_worksheet(name=global_values.localize.gettext("summary"))
+        ws = self.wb.add_worksheet(name=self._gettext("summary"))
 
         ws.hide_gridlines(2)
         ws.set_column("A:A", 2)
@@ -464,87 +382,82 @@ class XLSGenerator:
         ws.merge_range("B1:L1", "", self._get_format("classification_center"))
         ws.write_formula(
             "B1:L1",
-            "=%s!D10" % (global_values.localize.gettext("information")),
+            "=%s!D10" % (self._gettext("information")),
             self._get_format("classification_center"),
             "",
         )
 
         ws.merge_range(
             "B3:L3",
-            global_values.localize.gettext("summary"),
+            self._gettext("summary"),
             self._get_format("header"),
         )
+        # Row 4 must be complete before "B4:D5" starts row 5: once a row is left,
+        # it is flushed to disk in constant memory mode and cannot be written again
         ws.merge_range(
-            "B4:D5",
-            global_values.localize.gettext("categories"),
+            "E4:H4",
+            self._gettext("success"),
             self._get_format("sub_header"),
         )
         ws.merge_range(
-            "E4:H4",
-            global_values.localize.gettext("success"),
+            "I4:L4",
+            self._gettext("failed"),
             self._get_format("sub_header"),
         )
         ws.merge_range(
-            "I4:L4",
-            global_values.localize.gettext("failed"),
+            "B4:D5",
+            self._gettext("categories"),
             self._get_format("sub_header"),
         )
         ws.write(
             "E5",
-            global_values.localize.gettext("minimal"),
+            self._gettext("minimal"),
             self._get_format("sub_header"),
         )
         ws.write(
             "F5",
-            global_values.localize.gettext("intermediary"),
+            self._gettext("intermediary"),
             self._get_format("sub_header"),
         )
         ws.write(
             "G5",
-            global_values.localize.gettext("enhanced"),
+            self._gettext("enhanced"),
             self._get_format("sub_header"),
         )
         ws.write(
-            "H5", global_values.localize.gettext("high"), self._get_format("sub_header")
+            "H5", self._gettext("high"), self._get_format("sub_header")
         )
         ws.write(
             "I5",
-            global_values.localize.gettext("minimal"),
+            self._gettext("minimal"),
             self._get_format("sub_header"),
         )
         ws.write(
             "J5",
-            global_values.localize.gettext("intermediary"),
+            self._gettext("intermediary"),
             self._get_format("sub_header"),
         )
         ws.write(
             "K5",
-            global_values.localize.gettext("enhanced"),
+            self._gettext("enhanced"),
             self._get_format("sub_header"),
         )
         ws.write(
-            "L5", global_values.localize.gettext("high"), self._get_format("sub_header")
+            "L5", self._gettext("high"), self._get_format("sub_header")
         )
 
         row = 5
-        for category in categories:
+        for entry in categories:
             row += 1
             # A = 0, B = 1, C =2, D = 3
             # E = 4, F = 5, G = 6, H = 7
             # I = 8, J = 9, K = 10
             ws.merge_range(
                 xlsxwriter.utility.xl_range(row - 1, 1, row - 1, 3),
-                category.name,
+                entry.category.name,
                 self._get_format("check"),
             )
-            regex = r"(</?x>)|[^a-zàâçéèêëîïôûù0-9\s\-]"
-            category_name = re.sub(
-                regex,
-                "",
-                category.name[0:31],
-                0,
-                re.IGNORECASE,
-            )
+            category_name = entry.worksheet_name
             lvl_range = (
                 f"'{category_name}'!{xlsxwriter.utility.xl_range(0, 1, 1048575, 1)}"
             )
@@ -553,17 +466,17 @@ class XLSGenerator:
             )
 
             levels = [
-                f"{lvl_range};\"={global_values.localize.gettext('minimal')}\"",
-                f"{lvl_range};\"={global_values.localize.gettext('intermediary')}\"",
-                f"{lvl_range};\"={global_values.localize.gettext('enhanced')}\"",
-                f"{lvl_range};\"={global_values.localize.gettext('high')}\"",
+                f"{lvl_range};\"={self._gettext('minimal')}\"",
+                f"{lvl_range};\"={self._gettext('intermediary')}\"",
+                f"{lvl_range};\"={self._gettext('enhanced')}\"",
+                f"{lvl_range};\"={self._gettext('high')}\"",
             ]
 
             success = {
-                f"{results_range};\"={global_values.localize.gettext('success')}\"": levels
+                f"{results_range};\"={self._gettext('success')}\"": levels
             }
             failed = {
-                f"{results_range};\"={global_values.localize.gettext('failed')}\"": levels
+                f"{results_range};\"={self._gettext('failed')}\"": levels
             }
 
             start, stop = (4, 8)
@@ -609,7 +522,7 @@ class XLSGenerator:
     def _add_information_worksheet(
         self, baseline_title: str, report_information: dict
     ) -> None:
-        ws = self.wb.add_worksheet(name=global_values.localize.gettext("information"))
+        ws = self.wb.add_worksheet(name=self._gettext("information"))
         ws.hide_gridlines(2)
         ws.set_column("A:A", 2)
         ws.set_column("B:B", 12)
@@ -620,32 +533,27 @@ class XLSGenerator:
             f"D10",
             {
                 "validate": "list",
-                "source": [
-                    option.lstrip()[0:31]
-                    for option in config.get_config(
-                        "classification", "classification_options"
-                    ).split(",")
-                ],
+                "source": list(self._get_style_sheet().classification_options),
             },
         )
 
         # Title
         ws.merge_range(
             "B2:D7",
-            global_values.localize.gettext("information_header_title"),
+            self._gettext("information_header_title"),
             self._get_format("information_header"),
         )
 
         # Title
         ws.merge_range(
             "B9:D9",
-            global_values.localize.gettext("data_classification"),
+            self._gettext("data_classification"),
             self._get_format("sub_header"),
         )
         # Key
         ws.merge_range(
             "B10:C10",
-            global_values.localize.gettext("classification_level"),
+            self._gettext("classification_level"),
             self._get_format("bold"),
         )
         # Value
@@ -661,21 +569,25 @@ class XLSGenerator:
         # Title
         ws.merge_range(
             "B12:D12",
-            global_values.localize.gettext("general_information"),
+            self._gettext("general_information"),
             self._get_format("sub_header"),
         )
         # Key
         ws.merge_range(
             "B13:C13",
-            global_values.localize.gettext("date_of_completion"),
+            self._gettext("date_of_completion"),
             self._get_format("bold"),
         )
         # Value
-        ws.write("D13", today(), self._get_format("regular"))
+        ws.write(
+            "D13",
+            report_information.get("report-date") or today(),
+            self._get_format("regular"),
+        )
         # Key
         ws.merge_range(
             "B14:C14",
-            global_values.localize.gettext("used_baseline"),
+            self._gettext("used_baseline"),
             self._get_format("bold"),
         )
         # Value
@@ -683,7 +595,7 @@ class XLSGenerator:
         # Key
         ws.merge_range(
             "B15:C15",
-            global_values.localize.gettext("tool_version"),
+            self._gettext("tool_version"),
             self._get_format("bold"),
         )
         # Value
@@ -691,7 +603,7 @@ class XLSGenerator:
         # Key
         ws.merge_range(
             "B16:C16",
-            global_values.localize.gettext("online_tool_version"),
+            self._gettext("online_tool_version"),
             self._get_format("bold"),
         )
         # Value
@@ -700,12 +612,12 @@ class XLSGenerator:
         # Title
         ws.merge_range(
             "B18:D18",
-            global_values.localize.gettext("audited_asset"),
+            self._gettext("audited_asset"),
             self._get_format("sub_header"),
         )
         # Key
         ws.merge_range(
-            "B19:C19", global_values.localize.gettext("asset"), self._get_format("bold")
+            "B19:C19", self._gettext("asset"), self._get_format("bold")
         )
         # Value
         if "audited-asset" in report_information:
@@ -724,7 +636,10 @@ class XLSGenerator:
 
     def _create_xlsx_from_folder(self, xlsx_folder, output_file) -> None:
         logger.debug(f"Compressing folder {xlsx_folder} into {output_file}")
-        with zipfile.ZipFile(Path(output_file), "w") as zip_ref:
+        # Deflated as xlsxwriter does: the default (stored) makes the workbook several times larger
+        with zipfile.ZipFile(
+            Path(output_file), "w", compression=zipfile.ZIP_DEFLATED
+        ) as zip_ref:
             xlsx_folder_path = Path(xlsx_folder)
             xml_or_rels_files = chain(
                 xlsx_folder_path.rglob("*.xml"), xlsx_folder_path.rglob("*.rels")
@@ -754,27 +669,30 @@ class XLSGenerator:
         logger.debug(f"Result: {input_str}")
         return input_str
 
-    def _format_formulae_for_ms_excel(self, xlsx_folder: Path) -> None:
+    def _format_sheet_for_ms_excel(self, sheet_content: str) -> str:
         regex = r"<f>[a-z0-9\.]+\(\s?('|\")[a-zàâçéèêëîïôûù0-9\s\-\=\(\)]*('|\")![A-Z]+[0-9]*:[A-Z]+[0-9]*;\s?('|\")[a-zàâçéèêëîïôûù0-9\s\-\=\(\)]*\s?('|\");\s?('|\")[a-zàâçéèêëîïôûù0-9\s\-\=\(\)]*('|\")![A-Z]+[0-9]*:[A-Z]+[0-9]*;\s?('|\")[a-zàâçéèêëîïôûù0-9\s\-\=\(\)]*\s?('|\")\)</f><v></v>"
 
-        # sheet2 = synthesis sheet with all the formulae
-        logger.debug(f"Opening {xlsx_folder}/xl/worksheets/sheet2.xml")
-        with open(f"{xlsx_folder}/xl/worksheets/sheet2.xml", "r") as sheet2:
-            og_sheet2_content = sheet2.read()
-
         logger.debug("Looking for formulae")
         start_index = 0
-        formatted_sheet2_content = ""
-        matches = re.finditer(regex, og_sheet2_content, re.MULTILINE | re.IGNORECASE)
+        formatted_sheet_content = ""
+        matches = re.finditer(regex, sheet_content, re.MULTILINE | re.IGNORECASE)
         logger.debug(f"Any matches? {matches}")
         for _, match in enumerate(matches, start=1):
-            formatted_sheet2_content += og_sheet2_content[start_index : match.start()]
-            formatted_sheet2_content += self._replace_chars(match.group())
+            formatted_sheet_content += sheet_content[start_index : match.start()]
+            formatted_sheet_content += self._replace_chars(match.group())
             start_index = match.end()
 
-        formatted_sheet2_content += og_sheet2_content[start_index:]
+        formatted_sheet_content += sheet_content[start_index:]
+        return formatted_sheet_content
+
+    def _format_formulae_for_ms_excel(self, xlsx_folder: Path) -> None:
+        # sheet2 = synthesis sheet with all the formulae
+        logger.debug(f"Opening {xlsx_folder}/xl/worksheets/sheet2.xml")
+        with open(f"{xlsx_folder}/xl/worksheets/sheet2.xml", "r") as sheet2:
+            og_sheet2_content = sheet2.read()
+
         formatted_sheet2_path = Path(f"{xlsx_folder}/xl/worksheets/sheet2.xml")
-        formatted_sheet2_path.write_text(formatted_sheet2_content)
+        formatted_sheet2_path.write_text(self._format_sheet_for_ms_excel(og_sheet2_content))
 
     def _generate_microsoft_excel_file(self, input_file: Path) -> None:
         extract_dir = input_file.parent / f"{input_file.stem}_extract"
@@ -784,15 +702,85 @@ class XLSGenerator:
         self._create_xlsx_from_folder(extract_dir, output_file)
         self._remove_folder(extract_dir)
 
-    def generate_xls(
-        self, filename: str, results: Baseline, output_dir: Path, ini_file: Optional[Path] = None
+    def _write_microsoft_excel_file(self, workbook: bytes, file: BinaryIO) -> None:
+        """
+        Same as `_generate_microsoft_excel_file`, without files: the formulae of the synthesis
+        sheet of the `workbook` are fixed in memory, and the workbook is written into `file`.
+        """
+        with zipfile.ZipFile(io.BytesIO(workbook), "r") as src, zipfile.ZipFile(
+            file, "w", compression=zipfile.ZIP_DEFLATED
+        ) as dest:
+            for info in src.infolist():
+                content = src.read(info)
+                if info.filename == "xl/worksheets/sheet2.xml":
+                    content = self._format_sheet_for_ms_excel(
+                        content.decode("utf-8")
+                    ).encode("utf-8")
+                dest.writestr(info.filename, content)
+
+    def _add_delta_worksheet(
+        self, delta: BaselineDelta, categories: List[CategoryEntry]
     ) -> None:
-        logger.info("Running XLSX report generation")
-        logger.debug(
-            f"args: filename = {filename}, results = {results}, output_dir = {output_dir}, ini_file = {ini_file}"
+        """
+        Lists the rules whose result changed since the previous results: the newly failing rules,
+        then the newly fixed rules, with their current result.
+        """
+        used_names = {
+            self._gettext("information").lower(),
+            self._gettext("summary").lower(),
+            *(entry.worksheet_name.lower() for entry in categories),
+        }
+        title = self._gettext("delta")
+        ws = self.wb.add_worksheet(name=self._unique_worksheet_name(title, used_names))
+        ws.hide_gridlines(2)
+        ws.set_column("A:A", 2)
+        ws.set_column("B:C", 20)
+        ws.set_column("D:E", 35)
+        ws.set_column("F:F", 20)
+
+        ws.merge_range("C1:E1", "", self._get_format("classification_center"))
+        ws.write_formula(
+            "C1:E1",
+            "=%s!D10" % (self._gettext("information")),
+            self._get_format("classification_center"),
+            "",
+        )
+
+        ws.set_row(2, 25)
+        ws.merge_range("B3:F3", title, self._get_format("header"))
+        ws.write(
+            "B4",
+            self._gettext("categories"),
+            self._get_format("sub_header"),
+        )
+        ws.write(
+            "C4",
+            self._gettext("level"),
+            self._get_format("sub_header"),
+        )
+        ws.merge_range("D4:E4", self._gettext("rule_name"), self._get_format("sub_header"))
+        ws.write(
+            "F4",
+            self._gettext("result"),
+            self._get_format("sub_header"),
         )
 
+        row = 5
+        for rule_delta in delta.changed:
+            rule = rule_delta.rule
+            key = result_key(rule)
+            ws.write(f"B{row}", rule_delta.category.name, self._get_format("check"))
+            ws.write(f"C{row}", self._label(rule.level), self._get_format(rule.level))
+            ws.merge_range(f"D{row}:E{row}", rule.title, self._get_format("check"))
+            ws.write(f"F{row}", self._label(key), self._get_format(key))
+            row += 1
+
+    def _load_report_information(
+        self, ini_file: Optional[Path], report_date: Optional[str] = None
+    ) -> dict:
         report_information: dict = dict()
+        if report_date is not None:
+            report_information["report-date"] = report_date
         if ini_file:
             cfg_parser = configparser.ConfigParser()
             cfg_parser.read(ini_file)
@@ -805,22 +793,657 @@ class XLSGenerator:
             )
             logger.debug(f"Loaded information from {ini_file}: {report_information}")
 
-        logger.info("Generating LibreOffice/ONLYOFFICE file")
-        self.wb = xlsxwriter.Workbook(f"{output_dir / filename}.xlsx")
+        return report_information
+
+    def _write_level_headers(
+        self, ws: xlsxwriter.worksheet.Worksheet, row: int, first_col: int
+    ) -> None:
+        # Writes the success levels then the failed levels, as in the summary worksheet
+        for offset, level in enumerate(LEVELS * 2):
+            ws.write(
+                row,
+                first_col + offset,
+                self._gettext(level),
+                self._get_format("sub_header"),
+            )
+
+    def _write_counts(
+        self,
+        ws: xlsxwriter.worksheet.Worksheet,
+        row: int,
+        first_col: int,
+        counts: Counter,
+        cell_format: str,
+    ) -> None:
+        col = first_col
+        for key in ("success", "failed"):
+            for level in LEVELS:
+                ws.write_number(row, col, counts[(key, level)], self._get_format(cell_format))
+                col += 1
+
+    def _add_fleet_summary_worksheet(self) -> xlsxwriter.worksheet.Worksheet:
+        # A = 0, B = 1 (host), C = 2 (category)
+        # D = 3 ... G = 6 (success by level), H = 7 ... K = 10 (failed by level)
+        ws = self.wb.add_worksheet(name=self._gettext("summary"))
+        ws.hide_gridlines(2)
+        ws.set_column("A:A", 2)
+        ws.set_column("B:C", 35)
+        ws.set_column("D:K", 20)
+
+        ws.merge_range("B1:K1", "", self._get_format("classification_center"))
+        ws.write_formula(
+            "B1:K1",
+            "=%s!D10" % (self._gettext("information")),
+            self._get_format("classification_center"),
+            "",
+        )
+
+        ws.set_row(2, 25)
+        ws.merge_range(
+            "B3:K3",
+            self._gettext("summary"),
+            self._get_format("header"),
+        )
+        # No vertical merge here, so that the rows are written strictly in order
+        ws.merge_range("B4:C4", "", self._get_format("sub_header"))
+        ws.merge_range(
+            "D4:G4",
+            self._gettext("success"),
+            self._get_format("sub_header"),
+        )
+        ws.merge_range(
+            "H4:K4",
+            self._gettext("failed"),
+            self._get_format("sub_header"),
+        )
+        ws.write(
+            "B5",
+            self._gettext("asset"),
+            self._get_format("sub_header"),
+        )
+        ws.write(
+            "C5",
+            self._gettext("categories"),
+            self._get_format("sub_header"),
+        )
+        self._write_level_headers(ws, 4, 3)
+        return ws
+
+    def _unique_worksheet_name(self, name: str, used_names: set) -> str:
+        sheet_name = sanitize_worksheet_name(name) or "-"
+        suffix = 1
+        candidate = sheet_name
+        # Worksheet names are case insensitive and must be unique
+        while candidate.lower() in used_names:
+            suffix += 1
+            candidate = f"{sheet_name[0:31 - len(str(suffix)) - 1]}~{suffix}"
+        used_names.add(candidate.lower())
+        return candidate
+
+    def _add_fleet_detail_worksheet(
+        self, name: str, title: str, used_names: set
+    ) -> xlsxwriter.worksheet.Worksheet:
+        ws = self.wb.add_worksheet(name=self._unique_worksheet_name(name, used_names))
+        ws.hide_gridlines(2)
+        ws.set_column("A:A", 2)
+        ws.set_column("B:B", 20)
+        ws.set_column("C:E", 35)
+        ws.set_column("F:F", 20)
+
+        ws.merge_range("C1:E1", "", self._get_format("classification_center"))
+        ws.write_formula(
+            "C1:E1",
+            "=%s!D10" % (self._gettext("information")),
+            self._get_format("classification_center"),
+            "",
+        )
+
+        ws.set_row(2, 25)
+        ws.merge_range("B3:F3", title, self._get_format("header"))
+        ws.write("B4", self._gettext("level"), self._get_format("sub_header"))
+        ws.merge_range("C4:E4", self._gettext("rule_name"), self._get_format("sub_header"))
+        ws.write("F4", self._gettext("result"), self._get_format("sub_header"))
+        return ws
+
+    def _write_fleet_detail_group(
+        self,
+        ws: xlsxwriter.worksheet.Worksheet,
+        row: int,
+        title: str,
+        rules: List[RuleEntry],
+    ) -> int:
+        """
+        Writes a group of rules under a title row and returns the next free row (1-indexed).
+        """
+        ws.merge_range(f"B{row}:F{row}", title, self._get_format("bold"))
+        row += 1
+        first_row = row
+        for entry in rules:
+            self._write_rule_row(ws, entry, row)
+            row += 1
+
+        if row > first_row:
+            self._add_results_data_validation(ws, first_row, row - 1)
+        return row
+
+    # Columns of a worksheet (XFD): the rules past the last column are split across worksheets
+    max_columns = 16384
+
+    def _add_heatmap_worksheets(self, matrix: FleetMatrix, used_names: set) -> None:
+        """
+        Hosts x rules heatmap: one row per host with its compliance score, one column per rule
+        with its level, and the failure rate of each rule on the last row. The failed results
+        are written as 0, the rules not checked on a host as "-", and the compliant results are
+        left blank.
+
+        When the rules do not fit in the columns of a worksheet, they are split across several
+        heatmap worksheets, with the same rows.
+        """
+        # A = 0, B = 1 (host), C = 2 (score), D = 3 ... (rules)
+        first_col = 3
+        chunk = self.max_columns - first_col
+        scores = matrix.host_scores().tolist()
+        failure_rates = matrix.rule_failure_rates().tolist()
+        levels = matrix.levels.tolist()
+        for start in range(0, max(len(matrix.rule_ids), 1), chunk):
+            stop = min(start + chunk, len(matrix.rule_ids))
+            ws = self.wb.add_worksheet(
+                name=self._unique_worksheet_name(self._gettext("heatmap"), used_names)
+            )
+            self._write_heatmap_worksheet(
+                ws,
+                matrix,
+                start,
+                stop,
+                scores,
+                failure_rates[start:stop],
+                levels[start:stop],
+            )
+
+    def _write_heatmap_worksheet(
+        self,
+        ws: xlsxwriter.worksheet.Worksheet,
+        matrix: FleetMatrix,
+        start: int,
+        stop: int,
+        scores: list,
+        failure_rates: list,
+        levels: list,
+    ) -> None:
+        first_col = 3
+        last_col = first_col + (stop - start) - 1
+        ws.hide_gridlines(2)
+        ws.set_column("A:A", 2)
+        ws.set_column("B:B", 35)
+        ws.set_column("C:C", 12)
+        ws.set_column(first_col, max(first_col, last_col), 6)
+
+        ws.write_formula(
+            "B1",
+            "=%s!D10" % (self._gettext("information")),
+            self._get_format("classification_center"),
+            "",
+        )
+
+        ws.write(2, 1, self._gettext("level"), self._get_format("sub_header"))
+        ws.write_blank(2, 2, None, self._get_format("sub_header"))
+        for offset, level in enumerate(levels):
+            ws.write(
+                2,
+                first_col + offset,
+                self._gettext(LEVELS[level]) if level >= 0 else "",
+                self._get_format(LEVELS[level] if level >= 0 else "check"),
+            )
+
+        ws.write(3, 1, self._gettext("asset"), self._get_format("sub_header"))
+        ws.write(3, 2, self._gettext("result"), self._get_format("sub_header"))
+        ws.write_row(3, first_col, matrix.rule_ids[start:stop], self._get_format("sub_header"))
+
+        row = 4
+        for host, score, results in zip(matrix.hosts, scores, matrix.results[:, start:stop]):
+            ws.write(row, 1, host, self._get_format("check"))
+            if score == score:  # not NaN
+                ws.write_number(row, 2, score, self._get_format("percentage"))
+            # Only the failed and missing results are written: the compliant results are the
+            # blank cells of the heatmap, which keeps the number of written cells low
+            for offset in (results != COMPLIANT).nonzero()[0].tolist():
+                if results[offset] == FAILED:
+                    ws.write_number(
+                        row, first_col + offset, FAILED, self._get_format("heatmap_failed")
+                    )
+                else:
+                    ws.write(row, first_col + offset, "-", self._get_format("check"))
+            row += 1
+
+        ws.write(row, 1, self._gettext("failed"), self._get_format("bold"))
+        ws.write_blank(row, 2, None, self._get_format("bold"))
+        for offset, rate in enumerate(failure_rates):
+            if rate == rate:  # not NaN
+                ws.write_number(row, first_col + offset, rate, self._get_format("percentage"))
+
+        if matrix.hosts and stop > start:
+            ws.conditional_format(
+                xlsxwriter.utility.xl_range(4, first_col, row - 1, last_col),
+                {"type": "blanks", "format": self._get_format("heatmap_success")},
+            )
+        ws.freeze_panes(4, first_col)
+
+    def _add_categories_rollup_worksheet(self, matrix: FleetMatrix, used_names: set) -> None:
+        """
+        Hosts x categories failure rates, colored from the success to the failed color.
+        """
+        failed, checked = matrix.category_rollup()
+        ws = self.wb.add_worksheet(
+            name=self._unique_worksheet_name(self._gettext("categories"), used_names)
+        )
+        ws.hide_gridlines(2)
+        ws.set_column("A:A", 2)
+        ws.set_column("B:B", 35)
+        ws.set_column(2, max(2, 1 + len(matrix.categories)), 20)
+
+        ws.write_formula(
+            "B1",
+            "=%s!D10" % (self._gettext("information")),
+            self._get_format("classification_center"),
+            "",
+        )
+        ws.write(3, 1, self._gettext("asset"), self._get_format("sub_header"))
+        ws.write_row(3, 2, matrix.category_names, self._get_format("sub_header"))
+
+        row = 4
+        for host, host_failed, host_checked in zip(
+            matrix.hosts, failed.tolist(), checked.tolist()
+        ):
+            ws.write(row, 1, host, self._get_format("check"))
+            for col, (nb_failed, nb_checked) in enumerate(
+                zip(host_failed, host_checked), start=2
+            ):
+                if nb_checked:
+                    ws.write_number(
+                        row, col, nb_failed / nb_checked, self._get_format("percentage")
+                    )
+            row += 1
+
+        if matrix.hosts and matrix.categories:
+            ws.conditional_format(
+                xlsxwriter.utility.xl_range(4, 2, row - 1, 1 + len(matrix.categories)),
+                {
+                    "type": "2_color_scale",
+                    "min_type": "num",
+                    "min_value": 0,
+                    "max_type": "num",
+                    "max_value": 1,
+                    "min_color": "#" + self._get_style_sheet().success_color,
+                    "max_color": "#" + self._get_style_sheet().failed_color,
+                },
+            )
+        ws.freeze_panes(4, 2)
+
+    def generate_heatmap_xls(
+        self,
+        filename: str,
+        results: List[Tuple[str, Baseline]],
+        output_dir: Path,
+        ini_file: Optional[Path] = None,
+        report_date: Optional[str] = None,
+    ) -> Optional[Path]:
+        """
+        Generates the fleet compliance heatmap of the (host, results) pairs: the hosts x rules
+        heatmap worksheets, then the failure rates by host and category.
+
+        The workbook is written in constant memory mode, the heatmap having one cell per host and
+        rule. Requires the optional `numpy` dependency.
+        """
+        logger.info("Running XLSX heatmap generation")
+        logger.debug(
+            f"args: filename = {filename}, hosts = {[host for host, _ in results]}, output_dir = {output_dir}, ini_file = {ini_file}"
+        )
+
+        if not results:
+            logger.error("There are no results to consolidate")
+            return None
+
+        matrix = FleetMatrix.from_results(results)
+        report_information = self._load_report_information(ini_file, report_date)
+
+        output_path = Path(f"{output_dir / filename}.xlsx")
+        self.wb = xlsxwriter.Workbook(str(output_path), {"constant_memory": True})
         self._init_all_format()
 
-        self._add_information_worksheet(results.title, report_information)
-        self._add_synthesis_worksheet(results.categories)
-        self._write_results(results.categories)
+        self._add_information_worksheet(results[0][1].title, report_information)
+        # The rollup name is reserved first: it is written after the heatmap worksheets
+        used_names = {
+            self._gettext("information").lower(),
+            self._gettext("categories").lower(),
+        }
+        self._add_heatmap_worksheets(matrix, used_names)
+        used_names.discard(self._gettext("categories").lower())
+        self._add_categories_rollup_worksheet(matrix, used_names)
 
         self.wb.close()
         self.wb = None
+        return output_path
+
+    def generate_fleet_xls(
+        self,
+        filename: str,
+        results: List[Tuple[str, Baseline]],
+        output_dir: Path,
+        ini_file: Optional[Path] = None,
+        detail: str = "host",
+        streaming: bool = False,
+        report_date: Optional[str] = None,
+    ) -> None:
+        """
+        Generates one consolidated XLSX report for several hosts audited with the same baseline.
+
+        `results` is a list of (host, results) pairs. The workbook contains the information
+        worksheet, a fleet summary with the success/failed counts by host, category and level,
+        then one detail worksheet per host (`detail="host"`) or per category
+        (`detail="category"`). The counts are computed while the results are written, in a
+        single pass, and stored as values: the workbook does not contain any cross-sheet formula.
+        """
+        logger.info("Running consolidated XLSX report generation")
+        logger.debug(
+            f"args: filename = {filename}, hosts = {[host for host, _ in results]}, output_dir = {output_dir}, ini_file = {ini_file}, detail = {detail}, streaming = {streaming}"
+        )
+
+        if detail not in ("host", "category"):
+            raise ValueError(f"Unknown detail worksheets '{detail}', expected 'host' or 'category'")
+
+        if not results:
+            logger.error("There are no results to consolidate")
+            return
+
+        baseline_titles = {baseline.title for _, baseline in results}
+        if len(baseline_titles) > 1:
+            logger.warning(f"The results do not come from the same baseline: {baseline_titles}")
+
+        report_information = self._load_report_information(ini_file, report_date)
+
+        self.wb = xlsxwriter.Workbook(
+            f"{output_dir / filename}.xlsx", {"constant_memory": streaming}
+        )
+        self._init_all_format()
+
+        self._add_information_worksheet(results[0][1].title, report_information)
+        summary_ws = self._add_fleet_summary_worksheet()
+        summary_row = 5
+
+        used_names = {
+            self._gettext("information").lower(),
+            self._gettext("summary").lower(),
+        }
+        # detail="category": category id -> (worksheet, next free row)
+        category_worksheets: dict = dict()
+
+        for host, baseline in results:
+            model = ReportModel.build(baseline, self._gettext)
+            self._labels = model.labels
+            if detail == "host":
+                host_ws = self._add_fleet_detail_worksheet(host, host, used_names)
+                host_row = 5
+
+            for entry in model.categories:
+                category = entry.category
+                summary_ws.write(summary_row, 1, host, self._get_format("check"))
+                summary_ws.write(summary_row, 2, category.name, self._get_format("check"))
+                self._write_counts(summary_ws, summary_row, 3, entry.counts, "check")
+                summary_row += 1
+
+                if detail == "host":
+                    host_row = self._write_fleet_detail_group(
+                        host_ws, host_row, category.name, entry.rules
+                    )
+                else:
+                    if category.category not in category_worksheets:
+                        category_worksheets[category.category] = (
+                            self._add_fleet_detail_worksheet(
+                                category.name, category.name, used_names
+                            ),
+                            5,
+                        )
+                    category_ws, category_row = category_worksheets[category.category]
+                    category_worksheets[category.category] = (
+                        category_ws,
+                        self._write_fleet_detail_group(
+                            category_ws, category_row, host, entry.rules
+                        ),
+                    )
+
+            summary_ws.write(summary_row, 1, host, self._get_format("bold"))
+            summary_ws.write(summary_row, 2, "Total", self._get_format("bold"))
+            self._write_counts(summary_ws, summary_row, 3, model.counts, "bold")
+            summary_row += 1
+
+        self.wb.close()
+        self.wb = None
+        self._labels = {}
+
+    def _prepare_report_information(
+        self,
+        ini_file: Optional[Path],
+        report_information: Optional[dict],
+        report_date: Optional[str],
+    ) -> dict:
+        if report_information is None:
+            return self._load_report_information(ini_file, report_date)
+        if report_date is not None:
+            return {**report_information, "report-date": report_date}
+        return report_information
+
+    def _record_run(
+        self,
+        results_store: Optional[ResultsStore],
+        filename: str,
+        results: Baseline,
+        report_information: dict,
+    ) -> None:
+        # Recorded once the workbook is written
+        if results_store is not None:
+            results_store.record_run(
+                report_information.get("audited-asset", filename),
+                results,
+                report=f"{filename}.xlsx",
+            )
+
+    def _write_workbook(
+        self,
+        file: Union[str, BinaryIO],
+        options: dict,
+        results: Baseline,
+        model: Optional[ReportModel],
+        report_information: dict,
+        previous_results: Optional[Baseline],
+        streaming: bool,
+    ) -> None:
+        logger.info("Generating LibreOffice/ONLYOFFICE file")
+        self.wb = xlsxwriter.Workbook(file, options)
+        self._init_all_format()
+
+        with phase(self._profiler, "model"):
+            if model is None:
+                model = ReportModel.build(results, self._gettext)
+            self._labels = model.labels
+
+        with phase(self._profiler, "synthesis"):
+            self._add_information_worksheet(results.title, report_information)
+            self._add_synthesis_worksheet(model.categories)
+        with phase(self._profiler, "results"):
+            self._write_results(model.categories, streaming)
+            if previous_results is not None:
+                self._add_delta_worksheet(
+                    compute_delta(previous_results, results), model.categories
+                )
+
+        # The worksheets are written into the file on close (except in constant memory mode)
+        with phase(self._profiler, "close"):
+            self.wb.close()
+        self.wb = None
+        self._labels = {}
 
-        logger.info("Generating Microsoft Excel file from previous XLSX and replacing it")
-        self._generate_microsoft_excel_file(Path(f"{output_dir / filename}.xlsx"))
+    def generate_xls(
+        self,
+        filename: str,
+        results: Baseline,
+        output_dir: Path,
+        ini_file: Optional[Path] = None,
+        streaming: bool = False,
+        results_store: Optional[ResultsStore] = None,
+        previous_results: Optional[Baseline] = None,
+        model: Optional[ReportModel] = None,
+        report_information: Optional[dict] = None,
+        report_date: Optional[str] = None,
+        profile: bool = False,
+    ) -> Path:
+        """
+        Generates the XLSX report of the results and returns its path.
+
+        With `streaming`, the workbook is written in xlsxwriter's constant memory mode: each
+        row is flushed to disk as soon as the next one is started, so the memory usage does not
+        grow with the number of rules. All the rows are then written strictly in order.
+
+        With `results_store`, the results are also recorded as a run of the audited asset
+        (or of `filename` when there is no ini file), once the workbook is written. To record a
+        single run for the PDF and XLSX reports, pass the store to
+        `ReportGenerator.generate_reports` instead of each generator.
+
+        With `previous_results` of the same host, a last worksheet lists the rules whose result
+        changed since then.
+
+        `model` is the report model of the results, and `report_information` the information
+        loaded by `_load_report_information`, when they were already built for another writer.
 
-        logger.info(f"Replacing {output_dir/filename}.xlsx with {output_dir/filename}-ms-excel-compatible.xlsx")
-        target = Path(f"{output_dir / filename}.xlsx")
-        og = Path(f"{output_dir / filename}-ms-excel-compatible.xlsx")
-        og.replace(target)
+        `report_date` is the date of completion written in the information worksheet, today by
+        default, so that the same inputs always produce the same report.
 
+        With a workspace manager, the workbook and its post-processing files are written in a
+        workspace, then the final workbook is moved into `output_dir`.
+
+        With `profile`, the generation is profiled (see `Profiler`), and `<filename>-xlsx.prof`
+        and `<filename>-xlsx.profile.json` are written into `output_dir`.
+        """
+        logger.info("Running XLSX report generation")
+        logger.debug(
+            f"args: filename = {filename}, results = {results}, output_dir = {output_dir}, ini_file = {ini_file}, streaming = {streaming}"
+        )
+
+        with profiling(profile, output_dir, f"{filename}-xlsx") as self._profiler:
+            try:
+                return self._generate_xls(
+                    filename,
+                    results,
+                    output_dir,
+                    ini_file,
+                    streaming,
+                    results_store,
+                    previous_results,
+                    model,
+                    report_information,
+                    report_date,
+                )
+            finally:
+                self._profiler = None
+
+    def _generate_xls(
+        self,
+        filename: str,
+        results: Baseline,
+        output_dir: Path,
+        ini_file: Optional[Path],
+        streaming: bool,
+        results_store: Optional[ResultsStore],
+        previous_results: Optional[Baseline],
+        model: Optional[ReportModel],
+        report_information: Optional[dict],
+        report_date: Optional[str],
+    ) -> Path:
+        with phase(self._profiler, "report_information"):
+            report_information = self._prepare_report_information(
+                ini_file, report_information, report_date
+            )
+
+        workspace = None
+        options = {"constant_memory": streaming}
+        work_dir = output_dir
+        if self._workspace_manager is not None:
+            workspace = self._workspace_manager.create("xlsx-")
+            work_dir = workspace.path
+            # Also the temporary files of the constant memory mode
+            options["tmpdir"] = str(workspace.path)
+
+        try:
+            self._write_workbook(
+                f"{work_dir / filename}.xlsx",
+                options,
+                results,
+                model,
+                report_information,
+                previous_results,
+                streaming,
+            )
+
+            logger.info("Generating Microsoft Excel file from previous XLSX and replacing it")
+            with phase(self._profiler, "ms_excel"):
+                self._generate_microsoft_excel_file(Path(f"{work_dir / filename}.xlsx"))
+
+            logger.info(f"Replacing {work_dir/filename}.xlsx with {work_dir/filename}-ms-excel-compatible.xlsx")
+            target = Path(f"{work_dir / filename}.xlsx")
+            og = Path(f"{work_dir / filename}-ms-excel-compatible.xlsx")
+            og.replace(target)
+            if workspace is not None:
+                target = workspace.promote(target, output_dir)
+            self._record_run(results_store, filename, results, report_information)
+            return target
+        finally:
+            if workspace is not None:
+                workspace.close()
+
+    def write_xls(
+        self,
+        file: BinaryIO,
+        results: Baseline,
+        filename: str = "report",
+        ini_file: Optional[Path] = None,
+        results_store: Optional[ResultsStore] = None,
+        previous_results: Optional[Baseline] = None,
+        model: Optional[ReportModel] = None,
+        report_information: Optional[dict] = None,
+        report_date: Optional[str] = None,
+    ) -> None:
+        """
+        Same as `generate_xls`, but the workbook is written into `file` (e.g. an HTTP response
+        or an upload stream) instead of the output directory: it is built and post-processed in
+        memory, without any file. `file` only needs a `write` method.
+
+        `filename` is the name recorded in the results store.
+        """
+        logger.info("Running in-memory XLSX report generation")
+        report_information = self._prepare_report_information(
+            ini_file, report_information, report_date
+        )
+
+        # xlsxwriter's in memory mode: the constant memory mode does not apply
+        workbook = io.BytesIO()
+        self._write_workbook(
+            workbook,
+            {"in_memory": True},
+            results,
+            model,
+            report_information,
+            previous_results,
+            False,
+        )
+
+        # zipfile also writes into non seekable streams
+        logger.info("Generating Microsoft Excel workbook in memory")
+        self._write_microsoft_excel_file(workbook.getvalue(), file)
+        self._record_run(results_store, filename, results, report_information)
+
+    def generate_xls_bytes(self, results: Baseline, **kwargs) -> bytes:
+        """
+        Returns the XLSX report of the results, see `write_xls` for the arguments.
+        """
+        file = io.BytesIO()
+        self.write_xls(file, results, **kwargs)
+        return file.getvalue()
@@ -0,0 +1,130 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+"""
+Measures the import time of the report modules and guards against startup regressions.
+
+Each module is imported in a fresh interpreter (`python -X importtime`), several times, and the
+median cumulative time is compared to its budget. The heavy dependencies of the other output
+formats must not be executed by the import.
+
+Usage: python -m scripts.import_benchmark [--repeat N] [--scale FACTOR]
+"""
+
+import argparse
+from dataclasses import dataclass
+import json
+import re
+import statistics
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+# Dependencies which must only be loaded when the generator using them actually runs
+HEAVY_MODULES = ("xlsxwriter", "numpy", "pyarrow", "sqlite3", "zipfile")
+
+
+@dataclass
+class ImportBudget:
+    module: str
+    # Median cumulative import time, in milliseconds
+    budget_ms: float
+    # Heavy modules which may be executed by the import
+    allowed: Tuple[str, ...] = ()
+
+
+# The budgets are loose on purpose (~2x the time measured on a developer workstation): they catch
+# a heavy dependency being imported eagerly again, not a few milliseconds of noise
+BUDGETS = [
+    ImportBudget("scripts", 5),
+    ImportBudget("scripts.generate_pdf", 200),
+    ImportBudget("scripts.generate_xls", 200),
+    ImportBudget("scripts.generate_report", 250),
+    ImportBudget("scripts.generate_columnar", 150),
+    ImportBudget("scripts.batch", 250),
+]
+
+_IMPORTTIME_REGEX = re.compile(r"^import time:\s+\d+\s+\|\s+(\d+)\s+\|\s*(\S+)\s*$")
+
+# Lists the heavy modules actually imported: a lazily imported module is only registered in
+# sys.modules when it is used
+_PROBE = """
+import json, sys
+import {module}
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps(loaded))
+"""
+
+
+def _measure(module: str) -> Tuple[float, List[str]]:
+    """
+    Imports `module` in a fresh interpreter and returns its cumulative import time (ms) and the
+    heavy modules it executed.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise RuntimeError(f"Unable to import {module}:\n{process.stderr}")
+
+    cumulative: Optional[float] = None
+    for line in process.stderr.splitlines():
+        match = _IMPORTTIME_REGEX.match(line)
+        if match and match.group(2) == module:
+            cumulative = int(match.group(1)) / 1000
+    if cumulative is None:
+        raise RuntimeError(f"No import time reported for {module}")
+
+    return cumulative, json.loads(process.stdout.splitlines()[-1])
+
+
+def run(budgets: List[ImportBudget], repeat: int = 5, scale: float = 1.0) -> bool:
+    """
+    Measures each module and prints a report. Returns False when a module exceeds its budget or
+    executes a heavy dependency it does not need.
+    """
+    success = True
+    print(f"{'module':<30} {'median':>9} {'budget':>9}  status")
+    for budget in budgets:
+        timings = []
+        loaded = set()
+        for _ in range(repeat):
+            elapsed, modules = _measure(budget.module)
+            timings.append(elapsed)
+            loaded.update(modules)
+
+        median = statistics.median(timings)
+        unexpected = sorted(loaded - set(budget.allowed))
+        problems = []
+        if median > budget.budget_ms * scale:
+            problems.append("over budget")
+        if unexpected:
+            problems.append(f"loads {', '.join(unexpected)}")
+        success &= not problems
+
+        print(
+            f"{budget.module:<30} {median:>7.1f}ms {budget.budget_ms * scale:>7.1f}ms  {'; '.join(problems) or 'ok'}"
+        )
+    return success
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="imports per module (default: 5)")
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="factor applied to the budgets, for slow hosts"
+    )
+    parser.add_argument("modules", nargs="*", help="only measure these modules")
+    args = parser.parse_args(argv)
+
+    budgets = [b for b in BUDGETS if not args.modules or b.module in args.modules]
+    return 0 if run(budgets, args.repeat, args.scale) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+import importlib
+import importlib.util
+import sys
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule(ModuleType):
+    """
+    Stands for a module which is imported on the first access to one of its attributes.
+
+    Unlike `importlib.util.LazyLoader`, whose module is visible to the other threads while it
+    is being executed (before Python 3.12), the actual module is imported by the import system:
+    the threads accessing it at the same time wait until it is fully executed.
+    """
+
+    def __init__(self, name: str) -> None:
+        super().__init__(name)
+        self._lazy_module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr: str):
+        # Only called for the attributes of the actual module
+        if self._lazy_module is None:
+            self._lazy_module = importlib.import_module(self.__name__)
+        return getattr(self._lazy_module, attr)
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Returns the module `name`, which is only executed on its first attribute access.
+
+    Raises ModuleNotFoundError right away when the module is not installed, like `import`, so that
+    optional dependencies are still detected at import time.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    if importlib.util.find_spec(name) is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    return LazyModule(name)
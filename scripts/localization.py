@@ -0,0 +1,69 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+import gettext
+import logging
+from pathlib import Path
+
+import octoconf
+from octoconf.utils.logger import *
+import octoconf.utils.global_values as global_values
+
+logger = logging.getLogger(__name__)
+
+# Domain and directory of the octoconf catalogs, as loaded by octoconf.utils.global_values:
+# `<LOCALE_DIR>/<locale>/LC_MESSAGES/<LOCALE_DOMAIN>.mo`
+LOCALE_DOMAIN = "octoconf"
+LOCALE_DIR = Path(octoconf.__file__).resolve().parent / "locales"
+
+
+@dataclass(frozen=True)
+class Localization:
+    """
+    Locale and translations of a generator. The generators given a localization use it instead
+    of the global octoconf locale, so that reports in several locales can be generated at the
+    same time in a process.
+    """
+
+    locale: str
+    translations: gettext.NullTranslations
+
+    def gettext(self, message: str) -> str:
+        return self.translations.gettext(message)
+
+
+def current_localization() -> Localization:
+    """
+    Returns the global octoconf locale and translations.
+    """
+    return Localization(global_values.get_locale(), global_values.localize)
+
+
+@lru_cache(maxsize=None)
+def _load_translations(locale: str) -> Localization:
+    translations = gettext.translation(
+        LOCALE_DOMAIN, str(LOCALE_DIR), languages=[locale], fallback=True
+    )
+    if not isinstance(translations, gettext.GNUTranslations):
+        logger.warning(f"There are no '{locale}' translations, the messages will not be translated")
+    return Localization(locale, translations)
+
+
+def load_localization(locale: str) -> Localization:
+    """
+    Returns the localization of `locale`, without changing the global octoconf locale: the
+    global translations when `locale` is the current global locale, otherwise the octoconf
+    catalog of `locale`, loaded once per process. Falls back on the untranslated messages when
+    octoconf has no translations for `locale`.
+    """
+    # Not cached: the global locale may change between two calls
+    if locale == global_values.get_locale():
+        return current_localization()
+    return _load_translations(locale)
@@ -0,0 +1,266 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+import cProfile
+from dataclasses import asdict, dataclass, field
+import json
+import logging
+from pathlib import Path
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from octoconf.utils.logger import *
+
+logger = logging.getLogger(__name__)
+
+# tracemalloc is global to the process: it is stopped by the last profiler using it
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+# Frames of the profiler itself, hidden from the allocation sites
+_IGNORED_FILES = (tracemalloc.__file__, __file__)
+
+
+@dataclass
+class AllocationSite:
+    site: str
+    size_bytes: int
+    count: int
+
+
+@dataclass
+class PhaseProfile:
+    name: str
+    elapsed: float
+    cpu: float
+    # Highest memory allocated over the start of the phase, and memory still allocated at its end
+    peak_bytes: int
+    allocated_bytes: int
+    # Sites which allocated the most memory kept at the end of the phase
+    top_allocations: List[AllocationSite] = field(default_factory=list)
+
+
+@dataclass
+class ProcessProfile:
+    name: str
+    elapsed: float
+    returncode: Optional[int]
+    # Only known where os.wait4 exists
+    max_rss_bytes: Optional[int] = None
+    user_time: Optional[float] = None
+    system_time: Optional[float] = None
+
+
+class Profiler:
+    """
+    Profiles a generation: the CPU time of the Python functions (cProfile, in the generating
+    thread), the memory peak and top allocation sites of each phase (tracemalloc), and the wall
+    time and maximum RSS of the child processes, so that the Python side and the asciidoctor-pdf
+    side can be told apart.
+
+    tracemalloc is global to the process: the memory of concurrent generations is mixed.
+    """
+
+    def __init__(self, name: str, top: int = 10) -> None:
+        self.name = name
+        self._top = top
+        self._cpu_profile: Optional[cProfile.Profile] = cProfile.Profile()
+        self.phases: List[PhaseProfile] = []
+        self.processes: List[ProcessProfile] = []
+        self.peak_bytes = 0
+        self._start_bytes = 0
+        # Snapshots of the start and end of each phase, compared when the report is written
+        self._snapshots: List[Tuple[tracemalloc.Snapshot, tracemalloc.Snapshot]] = []
+        self.elapsed = 0.0
+        self.cpu = 0.0
+        self._start = 0.0
+        self._start_cpu = 0.0
+
+    def start(self) -> None:
+        global _tracemalloc_users
+        with _tracemalloc_lock:
+            if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            _tracemalloc_users += 1
+        self._start_bytes = tracemalloc.get_traced_memory()[0]
+
+        try:
+            self._cpu_profile.enable()
+        except ValueError:
+            logger.warning("Another profiler is active, the CPU time will not be profiled")
+            self._cpu_profile = None
+        self._start = time.perf_counter()
+        self._start_cpu = time.thread_time()
+
+    def stop(self) -> None:
+        global _tracemalloc_users
+        self.elapsed = time.perf_counter() - self._start
+        self.cpu = time.thread_time() - self._start_cpu
+        if self._cpu_profile is not None:
+            self._cpu_profile.disable()
+
+        with _tracemalloc_lock:
+            self.peak_bytes = max(
+                self.peak_bytes, tracemalloc.get_traced_memory()[1] - self._start_bytes
+            )
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+
+    def _take_snapshot(self) -> tracemalloc.Snapshot:
+        # Not profiled: it is not part of the generation
+        if self._cpu_profile is not None:
+            self._cpu_profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        if self._cpu_profile is not None:
+            self._cpu_profile.enable()
+        return snapshot
+
+    def _top_allocations(
+        self, start: tracemalloc.Snapshot, end: tracemalloc.Snapshot
+    ) -> List[AllocationSite]:
+        filters = [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        differences = end.filter_traces(filters).compare_to(
+            start.filter_traces(filters), "lineno"
+        )
+        return [
+            AllocationSite(
+                f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                stat.size_diff,
+                stat.count_diff,
+            )
+            for stat in differences[: self._top]
+            if stat.size_diff > 0
+        ]
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        # The peak of the run so far is kept before measuring the one of the phase
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak_bytes = max(self.peak_bytes, peak - self._start_bytes)
+        start_snapshot = self._take_snapshot()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        start_cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            cpu = time.thread_time() - start_cpu
+            allocated, peak = tracemalloc.get_traced_memory()
+            self.phases.append(
+                PhaseProfile(name, elapsed, cpu, peak - current, allocated - current)
+            )
+            self._snapshots.append((start_snapshot, self._take_snapshot()))
+            self.peak_bytes = max(self.peak_bytes, peak - self._start_bytes)
+
+    def record_process(
+        self, name: str, elapsed: float, returncode: Optional[int], rusage: Any = None
+    ) -> None:
+        """
+        Records a child process, with the resource usage returned by `os.wait4` when available.
+        """
+        process = ProcessProfile(name, elapsed, returncode)
+        if rusage is not None:
+            # ru_maxrss is in kilobytes, except on macOS
+            process.max_rss_bytes = rusage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            process.user_time = rusage.ru_utime
+            process.system_time = rusage.ru_stime
+        self.processes.append(process)
+
+    def _top_functions(self, limit: int = 25) -> List[dict]:
+        if self._cpu_profile is None:
+            return []
+        stats = pstats.Stats(self._cpu_profile).sort_stats(pstats.SortKey.CUMULATIVE)
+        functions = []
+        for function in stats.fcn_list[:limit]:
+            _, calls, total_time, cumulative_time, _ = stats.stats[function]
+            filename, lineno, name = function
+            functions.append(
+                {
+                    "function": f"{filename}:{lineno}({name})",
+                    "calls": calls,
+                    "total_time": round(total_time, 6),
+                    "cumulative_time": round(cumulative_time, 6),
+                }
+            )
+        return functions
+
+    def report(self) -> Dict[str, Any]:
+        for profile, (start, end) in zip(self.phases, self._snapshots):
+            if not profile.top_allocations:
+                profile.top_allocations = self._top_allocations(start, end)
+        return {
+            "name": self.name,
+            "elapsed": round(self.elapsed, 6),
+            "cpu": round(self.cpu, 6),
+            "peak_bytes": self.peak_bytes,
+            "phases": [asdict(phase) for phase in self.phases],
+            "processes": [asdict(process) for process in self.processes],
+            "top_functions": self._top_functions(),
+        }
+
+    def write(self, output_directory: Path) -> List[Path]:
+        """
+        Writes `<name>.prof` (the cProfile statistics, for pstats or snakeviz) and
+        `<name>.profile.json` (the phases, allocation sites, processes and hot functions) into
+        `output_directory`, and returns their paths.
+        """
+        paths = []
+        if self._cpu_profile is not None:
+            prof_path = output_directory / f"{self.name}.prof"
+            self._cpu_profile.dump_stats(prof_path)
+            paths.append(prof_path)
+
+        report_path = output_directory / f"{self.name}.profile.json"
+        with open(report_path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+        paths.append(report_path)
+
+        logger.info(
+            f"Profile of {self.name}: {self.elapsed:.2f}s, {self.cpu:.2f}s of CPU, peak memory of {self.peak_bytes} bytes, written to {paths}"
+        )
+        return paths
+
+
+@contextmanager
+def profiling(
+    enabled: bool, output_directory: Path, name: str
+) -> Iterator[Optional[Profiler]]:
+    """
+    Profiles the block when `enabled` and writes the profile into `output_directory`, see
+    `Profiler`. Yields None otherwise.
+    """
+    if not enabled:
+        yield None
+        return
+
+    profiler = Profiler(name)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        profiler.write(output_directory)
+
+
+@contextmanager
+def phase(profiler: Optional[Profiler], name: str) -> Iterator[None]:
+    """
+    Measures the phase `name` of the run profiled by `profiler`, if any.
+    """
+    if profiler is None:
+        yield
+        return
+    with profiler.phase(name):
+        yield
@@ -0,0 +1,454 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, field
+import heapq
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import socket
+import statistics
+import threading
+import time
+import traceback
+import uuid
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, Optional, Tuple
+
+from octoconf.utils.logger import *
+
+from .generate_pdf import PDFGenerator
+from .generate_xls import XLSGenerator
+from .workspace import WorkspaceManager, owner_is_running, write_owner
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+logger = logging.getLogger(__name__)
+
+# The lowest value runs first
+PRIORITIES = {"interactive": 0, "bulk": 10}
+
+# Subdirectories of the spool directory
+_INCOMING = "incoming"
+_QUEUED = "queued"
+_DONE = "done"
+_FAILED = "failed"
+
+
+@dataclass
+class ReportRequest:
+    id: str
+    # "pdf" or "xlsx"
+    kind: str
+    filename: str
+    results_file: str
+    output_dir: str
+    ini_file: Optional[str] = None
+    theme_dir: str = "default"
+    pdf_theme: str = "default.yml"
+    streaming: bool = False
+    report_date: Optional[str] = None
+    priority: int = PRIORITIES["bulk"]
+    submitted: float = field(default_factory=time.time)
+
+
+def submit_job(
+    spool_dir: Path,
+    kind: str,
+    filename: str,
+    results_file: Path,
+    output_dir: Path,
+    priority: str = "bulk",
+    **options,
+) -> str:
+    """
+    Submits a report generation to the daemon serving `spool_dir` and returns the job id. The
+    result is written to `done/<id>.json` (or `failed/<id>.json`).
+
+    `priority` is "interactive" (runs before any bulk job) or "bulk", and `options` are the
+    other fields of `ReportRequest` (ini_file, theme_dir, ...).
+    """
+    if kind not in ("pdf", "xlsx"):
+        raise ValueError(f"Unknown report kind: '{kind}'")
+
+    options = {
+        key: str(value) if isinstance(value, Path) else value for key, value in options.items()
+    }
+    request = ReportRequest(
+        id=f"{time.time_ns()}-{uuid.uuid4().hex[:8]}",
+        kind=kind,
+        filename=filename,
+        results_file=str(results_file),
+        output_dir=str(output_dir),
+        priority=PRIORITIES[priority],
+        **options,
+    )
+    incoming = Path(spool_dir) / _INCOMING
+    incoming.mkdir(parents=True, exist_ok=True)
+    # Renamed once complete: the daemon never reads a partial job
+    tmp = incoming / f".{request.id}.tmp"
+    tmp.write_text(json.dumps(asdict(request)))
+    os.replace(tmp, incoming / f"{request.id}.json")
+    return request.id
+
+
+def _percentile(values: List[float], percentile: float) -> Optional[float]:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(percentile) - 1]
+
+
+class ReportDaemon:
+    """
+    Generates the reports submitted into a spool directory (see `submit_job`) by several audit
+    runners.
+
+    The jobs are run by `max_workers` threads, by priority then in order of submission, so
+    interactive requests jump ahead of the bulk work. At most `max_pdf` asciidoctor-pdf
+    processes run at the same time, and a job only starts when its estimated memory
+    (`estimate_memory`) fits in `max_memory` with the running jobs (a job always starts when
+    nothing is running). The memory of a job is estimated once, when it is queued. A job which
+    cannot start does not block the next runnable ones, until they have started ahead of it
+    `max_skips` times: then no other job starts before it, so that a large job is not starved by
+    a stream of small ones.
+
+    The generators are kept warm across the jobs: each worker keeps its generators, the
+    templates are read once by the shared template registry and the XLSX style sheet is compiled
+    once. The PDF reports are generated in workspaces, so that concurrent jobs never share a
+    build directory.
+
+    The claimed jobs are kept in `queued/<host>-<pid>/`, with the daemon recorded as their owner,
+    until they are done: the jobs of a daemon which is gone are run again by the next daemon
+    starting on the spool, while the jobs of the running daemons are left to them. The statistics (queue depth, running jobs, wait and run latencies)
+    are returned by `stats` and written to `stats.json`.
+
+    `load_results` reads a results file into a `Baseline`.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path,
+        load_results: Callable[[Path], Baseline],
+        max_workers: int = 4,
+        max_pdf: int = 2,
+        max_memory: int = 4 << 30,
+        estimate_memory: Optional[Callable[[ReportRequest], int]] = None,
+        interval: float = 0.5,
+        workspace_manager: Optional[WorkspaceManager] = None,
+        max_skips: int = 8,
+    ) -> None:
+        self._spool_dir = Path(spool_dir)
+        self._load_results = load_results
+        self._max_workers = max_workers
+        self._max_pdf = max_pdf
+        self._max_memory = max_memory
+        self._estimate_memory = estimate_memory or self.default_memory_estimate
+        self._interval = interval
+        self._max_skips = max_skips
+        self._workspace_manager = workspace_manager or WorkspaceManager()
+        # Set by serve, in the process running the jobs
+        self._owned_dir = self._spool_dir / _QUEUED
+
+        for name in (_INCOMING, _QUEUED, _DONE, _FAILED):
+            (self._spool_dir / name).mkdir(parents=True, exist_ok=True)
+
+        self._condition = threading.Condition()
+        # (priority, sequence, request, estimated memory)
+        self._queue: List[Tuple[int, int, ReportRequest, int]] = []
+        # Number of times each queued job was passed over by a job started ahead of it
+        self._skips: Counter = Counter()
+        self._sequence = itertools.count()
+        self._running: Counter = Counter()
+        self._reserved_memory = 0
+        self._stopping = False
+
+        self._warm = threading.local()
+        self._style_sheet = None
+        self._completed: Counter = Counter()
+        # Latencies of the last jobs, by priority: (waited, ran)
+        self._latencies: Dict[int, Deque[Tuple[float, float]]] = dict()
+        logger.info(
+            f"Init ReportDaemon with spool_dir = {self._spool_dir}, max_workers = {max_workers}, max_pdf = {max_pdf}, max_memory = {max_memory}"
+        )
+
+    @staticmethod
+    def default_memory_estimate(request: ReportRequest) -> int:
+        """
+        Estimates the memory of a job from the size of its results: the PDF report also runs
+        asciidoctor-pdf, whose memory grows with the document.
+        """
+        try:
+            size = os.stat(request.results_file).st_size
+        except OSError:
+            size = 0
+        if request.kind == "pdf":
+            return (200 << 20) + 40 * size
+        if request.streaming:
+            return (50 << 20) + 2 * size
+        return (50 << 20) + 20 * size
+
+    # Queue
+
+    def _enqueue(self, request: ReportRequest) -> None:
+        # Once per job, outside of the lock: the estimate may stat the results file
+        memory = self._estimate_memory(request)
+        with self._condition:
+            heapq.heappush(self._queue, (request.priority, next(self._sequence), request, memory))
+            self._condition.notify()
+
+    def _claim_incoming(self) -> int:
+        claimed = 0
+        for path in sorted((self._spool_dir / _INCOMING).glob("*.json")):
+            queued = self._owned_dir / path.name
+            try:
+                # Several daemons may serve the same spool: the rename claims the job
+                os.replace(path, queued)
+            except FileNotFoundError:
+                continue
+            try:
+                request = ReportRequest(**json.loads(queued.read_text()))
+            except (TypeError, ValueError):
+                logger.exception(f"Invalid job {path.name}")
+                os.replace(queued, self._spool_dir / _FAILED / path.name)
+                continue
+            self._enqueue(request)
+            claimed += 1
+        return claimed
+
+    def _own_queue(self) -> None:
+        self._owned_dir = self._spool_dir / _QUEUED / f"{socket.gethostname()}-{os.getpid()}"
+        self._owned_dir.mkdir(parents=True, exist_ok=True)
+        write_owner(self._owned_dir)
+
+    def _recover(self) -> None:
+        # Jobs left by a previous run of this daemon, or claimed by a daemon which is gone. The
+        # jobs of the other running daemons are theirs.
+        queued = self._spool_dir / _QUEUED
+        orphans = list(queued.glob("*.json"))
+        dead_owners = []
+        for owner in queued.iterdir():
+            if not owner.is_dir():
+                continue
+            if owner == self._owned_dir or not owner_is_running(owner):
+                orphans.extend(owner.glob("*.json"))
+                if owner != self._owned_dir:
+                    dead_owners.append(owner)
+
+        for path in sorted(orphans, key=lambda path: path.name):
+            claimed = self._owned_dir / path.name
+            try:
+                # Several daemons may recover the same jobs: the rename claims the job
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            try:
+                self._enqueue(ReportRequest(**json.loads(claimed.read_text())))
+            except (TypeError, ValueError):
+                logger.exception(f"Invalid job {path.name}")
+                os.replace(claimed, self._spool_dir / _FAILED / path.name)
+
+        for owner in dead_owners:
+            shutil.rmtree(owner, ignore_errors=True)
+
+    def _can_start(self, request: ReportRequest, memory: int) -> bool:
+        if request.kind == "pdf" and self._running["pdf"] >= self._max_pdf:
+            return False
+        if sum(self._running.values()) and self._reserved_memory + memory > self._max_memory:
+            return False
+        return True
+
+    def _next_job(self) -> Optional[Tuple[ReportRequest, int]]:
+        """
+        Pops the first job which can start, or waits for one. Returns None when stopping.
+        """
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+
+                skipped = []
+                found = None
+                while self._queue:
+                    entry = heapq.heappop(self._queue)
+                    _, _, request, memory = entry
+                    if self._can_start(request, memory):
+                        found = (request, memory)
+                        break
+                    skipped.append(entry)
+                    if self._skips[request.id] >= self._max_skips:
+                        # Waited long enough: nothing else starts before it
+                        break
+                for entry in skipped:
+                    heapq.heappush(self._queue, entry)
+
+                if found is not None:
+                    request, memory = found
+                    del self._skips[request.id]
+                    for entry in skipped:
+                        self._skips[entry[2].id] += 1
+                    self._running[request.kind] += 1
+                    self._reserved_memory += memory
+                    return found
+                self._condition.wait()
+
+    # Jobs
+
+    def _generators(self) -> Tuple[PDFGenerator, XLSGenerator]:
+        # Kept by each worker across the jobs
+        if not hasattr(self._warm, "pdf_generator"):
+            self._warm.pdf_generator = PDFGenerator(workspace_manager=self._workspace_manager)
+            with self._condition:
+                if self._style_sheet is None:
+                    self._style_sheet = XLSGenerator()._get_style_sheet()
+            self._warm.xls_generator = XLSGenerator(self._style_sheet)
+        return self._warm.pdf_generator, self._warm.xls_generator
+
+    def _generate(self, request: ReportRequest) -> Optional[Path]:
+        pdf_generator, xls_generator = self._generators()
+        baseline = self._load_results(Path(request.results_file))
+        ini_file = Path(request.ini_file) if request.ini_file else None
+        if request.kind == "pdf":
+            if ini_file is None:
+                raise ValueError("An ini file is required to generate the PDF report")
+            return pdf_generator.generate_pdf(
+                request.filename,
+                baseline,
+                Path(request.output_dir),
+                ini_file=ini_file,
+                theme_dir=request.theme_dir,
+                pdf_theme=request.pdf_theme,
+                report_date=request.report_date,
+            )
+        return xls_generator.generate_xls(
+            request.filename,
+            baseline,
+            Path(request.output_dir),
+            ini_file=ini_file,
+            streaming=request.streaming,
+            report_date=request.report_date,
+        )
+
+    def _run(self, request: ReportRequest, memory: int) -> None:
+        start = time.time()
+        waited = start - request.submitted
+        result = {"id": request.id, "kind": request.kind, "waited": waited}
+        try:
+            path = self._generate(request)
+            if path is None:
+                raise RuntimeError(
+                    f"The {request.kind} report '{request.filename}' was not generated"
+                )
+            result.update(status="done", output=str(path))
+        except Exception:
+            logger.exception(f"Unable to generate the {request.kind} report of the job {request.id}")
+            result.update(status="failed", error=traceback.format_exc())
+        finally:
+            ran = time.time() - start
+            with self._condition:
+                self._running[request.kind] -= 1
+                self._reserved_memory -= memory
+                self._completed[result.get("status", "failed")] += 1
+                self._latencies.setdefault(request.priority, deque(maxlen=1000)).append(
+                    (waited, ran)
+                )
+                self._condition.notify_all()
+
+        result["ran"] = ran
+        destination = _DONE if result["status"] == "done" else _FAILED
+        tmp = self._spool_dir / destination / f".{request.id}.tmp"
+        tmp.write_text(json.dumps(result))
+        os.replace(tmp, self._spool_dir / destination / f"{request.id}.json")
+        (self._owned_dir / f"{request.id}.json").unlink(missing_ok=True)
+        logger.info(f"Job {request.id} {result['status']} in {ran:.2f}s (waited {waited:.2f}s)")
+
+    def _worker(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._run(*job)
+
+    # Statistics
+
+    def stats(self) -> dict:
+        with self._condition:
+            depth = Counter(
+                name
+                for priority, *_ in self._queue
+                for name, value in PRIORITIES.items()
+                if value == priority
+            )
+            latencies = {
+                name: list(self._latencies.get(value, ()))
+                for name, value in PRIORITIES.items()
+            }
+            stats = {
+                "queue_depth": len(self._queue),
+                "queue_depth_by_priority": dict(depth),
+                "running": dict(self._running),
+                "reserved_memory": self._reserved_memory,
+                "completed": dict(self._completed),
+            }
+
+        stats["latency"] = {
+            name: {
+                "jobs": len(values),
+                "wait_p50": _percentile([waited for waited, _ in values], 50),
+                "wait_p95": _percentile([waited for waited, _ in values], 95),
+                "run_p50": _percentile([ran for _, ran in values], 50),
+                "run_p95": _percentile([ran for _, ran in values], 95),
+            }
+            for name, values in latencies.items()
+        }
+        return stats
+
+    def _write_stats(self) -> None:
+        tmp = self._spool_dir / ".stats.json.tmp"
+        tmp.write_text(json.dumps(self.stats(), indent=2))
+        os.replace(tmp, self._spool_dir / "stats.json")
+
+    # Daemon
+
+    def serve(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        Runs the jobs of the spool directory until `stop` is set (or forever). The running jobs
+        are completed before returning, the queued ones are kept for the next start.
+        """
+        stop = stop or threading.Event()
+        self._stopping = False
+        self._own_queue()
+        self._recover()
+
+        workers = [
+            threading.Thread(target=self._worker, name=f"report-daemon-{index}", daemon=True)
+            for index in range(self._max_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while True:
+                self._claim_incoming()
+                self._write_stats()
+                if stop.wait(self._interval):
+                    break
+        finally:
+            with self._condition:
+                self._stopping = True
+                self._queue.clear()
+                self._skips.clear()
+                self._condition.notify_all()
+            for worker in workers:
+                worker.join()
+            self._write_stats()
@@ -0,0 +1,128 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field, replace
+import logging
+import re
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+import octoconf.utils.global_values as global_values
+from octoconf.utils.logger import *
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+    from octoconf.entities.category import Category
+    from octoconf.entities.rule import Rule
+
+logger = logging.getLogger(__name__)
+
+LEVELS = ["minimal", "intermediary", "enhanced", "high"]
+RESULTS = ["success", "failed"]
+
+# It is not possible to use a worksheet's title > 31 chars, and some chars are forbidden
+_WORKSHEET_NAME_REGEX = re.compile(r"(</?x>)|[^a-zàâçéèêëîïôûù0-9\s\-]", re.IGNORECASE)
+
+
+def sanitize_worksheet_name(name: str) -> str:
+    return _WORKSHEET_NAME_REGEX.sub("", name[0:31])
+
+
+def anchor_id(rule_id: str) -> str:
+    # asciidoc does not like '.' char for references -> replace with '_'
+    return rule_id.replace(".", "_")
+
+
+def result_key(rule: Rule) -> str:
+    return "success" if rule.compliant == True else "failed"
+
+
+@dataclass(frozen=True)
+class RuleEntry:
+    rule: Rule
+    anchor: str
+    result_key: str
+
+    @property
+    def compliant(self) -> bool:
+        return self.result_key == "success"
+
+
+@dataclass(frozen=True)
+class CategoryEntry:
+    category: Category
+    worksheet_name: str
+    rules: List[RuleEntry]
+    # Number of rules by (result key, level), e.g. `counts[("failed", "minimal")]`
+    counts: Counter
+
+
+@dataclass(frozen=True)
+class ReportModel:
+    """
+    Precompiled view of the results shared by the report writers: the anchors, worksheet names,
+    result keys and counts are computed once, in a single traversal of the results.
+
+    The localized labels are kept apart (`labels`), so that the same model can be rendered in
+    several locales with `with_labels`.
+    """
+
+    title: str
+    categories: List[CategoryEntry]
+    counts: Counter
+    non_conformities: List[Tuple[CategoryEntry, RuleEntry]]
+    labels: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_categories(
+        cls, title: str, categories: List[Category], gettext: Optional[Callable] = None
+    ) -> "ReportModel":
+        entries: List[CategoryEntry] = []
+        non_conformities: List[Tuple[CategoryEntry, RuleEntry]] = []
+        total: Counter = Counter()
+
+        for category in categories:
+            rules = [
+                RuleEntry(rule, anchor_id(rule.id), result_key(rule))
+                for rule in category.rules
+            ]
+            counts = Counter((entry.result_key, entry.rule.level) for entry in rules)
+            entry = CategoryEntry(
+                category, sanitize_worksheet_name(category.name), rules, counts
+            )
+            entries.append(entry)
+            total.update(counts)
+            non_conformities.extend(
+                (entry, rule) for rule in rules if not rule.compliant
+            )
+
+        model = cls(title, entries, total, non_conformities)
+        logger.debug(
+            f"Built report model of {title}: {len(entries)} categories, {sum(total.values())} rules, {len(non_conformities)} non-conformities"
+        )
+        return model.with_labels(gettext)
+
+    @classmethod
+    def build(cls, baseline: Baseline, gettext: Optional[Callable] = None) -> "ReportModel":
+        return cls.from_categories(baseline.title, baseline.categories, gettext)
+
+    def with_labels(self, gettext: Optional[Callable] = None) -> "ReportModel":
+        """
+        Returns the same model with the labels of the levels, severities and results localized
+        by `gettext` (defaults to the current locale).
+        """
+        gettext = gettext or global_values.localize.gettext
+        keys = set(LEVELS) | set(RESULTS) | {"na"}
+        for entry in self.categories:
+            for rule in entry.rules:
+                keys.add(rule.rule.level)
+                keys.add(rule.rule.severity)
+        return replace(self, labels={key: gettext(key) for key in keys})
+
+    def label(self, key: str) -> str:
+        return self.labels.get(key, key)
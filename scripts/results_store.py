@@ -0,0 +1,197 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from datetime import datetime
+import logging
+from pathlib import Path
+import threading
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from octoconf.utils.logger import *
+
+from .lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+sqlite3 = lazy_import("sqlite3")
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS baselines (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    baseline_id INTEGER NOT NULL REFERENCES baselines (id),
+    rule_id TEXT NOT NULL,
+    category TEXT NOT NULL,
+    title TEXT NOT NULL,
+    level TEXT NOT NULL,
+    severity TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    host_id INTEGER NOT NULL REFERENCES hosts (id),
+    baseline_id INTEGER NOT NULL REFERENCES baselines (id),
+    run_time TEXT NOT NULL,
+    report TEXT
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    rule_id INTEGER NOT NULL REFERENCES rules (id),
+    compliant INTEGER NOT NULL,
+    PRIMARY KEY (run_id, rule_id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_rules_baseline_rule ON rules (baseline_id, rule_id);
+CREATE INDEX IF NOT EXISTS idx_runs_host_time ON runs (host_id, run_time);
+CREATE INDEX IF NOT EXISTS idx_outcomes_rule ON outcomes (rule_id, compliant);
+"""
+
+
+class ResultsStore:
+    """
+    Local SQLite store of the results of each report generation run, to query the history
+    (e.g. the hosts failing a rule, or the compliance trend of a host) without reading the
+    generated reports again.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        # The generators of a run may record from different threads, the writes are serialized
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path), check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(_SCHEMA)
+        logger.info(f"Init ResultsStore with path = {path}")
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _get_or_create(self, table: str, column: str, value: str) -> int:
+        self._connection.execute(
+            f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,)
+        )
+        return self._connection.execute(
+            f"SELECT id FROM {table} WHERE {column} = ?", (value,)
+        ).fetchone()[0]
+
+    def record_run(
+        self,
+        host: str,
+        results: Baseline,
+        run_time: Optional[datetime] = None,
+        report: Optional[str] = None,
+    ) -> int:
+        """
+        Stores the results of `host` and returns the id of the run.
+        """
+        run_time = (run_time or datetime.now()).isoformat(timespec="seconds")
+        logger.debug(f"Recording run of {host} ({results.title}) at {run_time}")
+
+        with self._lock, self._connection:
+            host_id = self._get_or_create("hosts", "name", host)
+            baseline_id = self._get_or_create("baselines", "title", results.title)
+
+            rules = [
+                (baseline_id, rule.id, category.category, rule.title, rule.level, rule.severity)
+                for category in results.categories
+                for rule in category.rules
+            ]
+            self._connection.executemany(
+                "INSERT INTO rules (baseline_id, rule_id, category, title, level, severity) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (baseline_id, rule_id) DO UPDATE SET "
+                "category = excluded.category, title = excluded.title, "
+                "level = excluded.level, severity = excluded.severity",
+                rules,
+            )
+            rule_ids = dict(
+                self._connection.execute(
+                    "SELECT rule_id, id FROM rules WHERE baseline_id = ?", (baseline_id,)
+                )
+            )
+
+            run_id = self._connection.execute(
+                "INSERT INTO runs (host_id, baseline_id, run_time, report) VALUES (?, ?, ?, ?)",
+                (host_id, baseline_id, run_time, report),
+            ).lastrowid
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO outcomes (run_id, rule_id, compliant) VALUES (?, ?, ?)",
+                [
+                    (run_id, rule_ids[rule.id], 1 if rule.compliant == True else 0)
+                    for category in results.categories
+                    for rule in category.rules
+                ],
+            )
+
+        return run_id
+
+    def failing_hosts(self, baseline_title: str, rule_id: str) -> List[str]:
+        """
+        Returns the hosts whose latest run of the baseline fails the rule. Of the runs recorded
+        at the same time, the last recorded one is the latest.
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                """
+                SELECT DISTINCT hosts.name
+                FROM rules
+                JOIN outcomes ON outcomes.rule_id = rules.id AND outcomes.compliant = 0
+                JOIN runs ON runs.id = outcomes.run_id
+                JOIN hosts ON hosts.id = runs.host_id
+                WHERE rules.baseline_id = (SELECT id FROM baselines WHERE title = ?)
+                  AND rules.rule_id = ?
+                  AND runs.id = (
+                      -- The run times are stored to the second: the last recorded run wins
+                      SELECT latest.id FROM runs AS latest
+                      WHERE latest.host_id = runs.host_id
+                        AND latest.baseline_id = runs.baseline_id
+                      ORDER BY latest.run_time DESC, latest.id DESC
+                      LIMIT 1
+                  )
+                ORDER BY hosts.name
+                """,
+                (baseline_title, rule_id),
+            ).fetchall()
+        return [name for name, in rows]
+
+    def compliance_trend(
+        self, host: str, baseline_title: Optional[str] = None
+    ) -> List[Tuple[str, str, int, int]]:
+        """
+        Returns the (run time, baseline, number of successful rules, number of rules) of the runs
+        of `host`, oldest first.
+        """
+        query = """
+            SELECT runs.run_time, baselines.title, SUM(outcomes.compliant), COUNT(*)
+            FROM runs
+            JOIN baselines ON baselines.id = runs.baseline_id
+            JOIN outcomes ON outcomes.run_id = runs.id
+            WHERE runs.host_id = (SELECT id FROM hosts WHERE name = ?)
+        """
+        parameters: tuple = (host,)
+        if baseline_title is not None:
+            query += " AND baselines.title = ?"
+            parameters += (baseline_title,)
+        query += " GROUP BY runs.id ORDER BY runs.run_time, runs.id"
+
+        with self._lock:
+            return [tuple(row) for row in self._connection.execute(query, parameters)]
@@ -0,0 +1,293 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from functools import lru_cache
+import logging
+import os
+from pathlib import Path
+import re
+import threading
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from octoconf.utils.logger import *
+
+logger = logging.getLogger(__name__)
+
+# Placeholders replaced by PDFGenerator in each template
+TEMPLATE_PLACEHOLDERS: Dict[str, FrozenSet[str]] = {
+    "header.adoc": frozenset(
+        {
+            "MATCH_AND_REPLACE_DOCUMENT_LANG",
+            "MATCH_AND_REPLACE_FILENAME",
+            "MATCH_AND_REPLACE_DOCUMENT_TITLE",
+            "MATCH_AND_REPLACE_DOCUMENT_SUBTITLE",
+            "MATCH_AND_REPLACE_AUDITEE_NAME",
+            "MATCH_AND_REPLACE_AUDITEE_CONTACT_FULL_NAME",
+            "MATCH_AND_REPLACE_AUDITEE_CONTACT_EMAIL",
+            "MATCH_AND_REPLACE_PROJECT_MANAGER_FULL_NAME",
+            "MATCH_AND_REPLACE_PROJECT_MANAGER_EMAIL",
+            "MATCH_AND_REPLACE_AUTHORS_LIST_FULL_NAME",
+            "MATCH_AND_REPLACE_AUTHORS_LIST_EMAIL",
+            "MATCH_AND_REPLACE_BASELINE_NAME",
+            "MATCH_AND_REPLACE_REVNUMBER",
+            "MATCH_AND_REPLACE_REVDATE",
+            "MATCH_AND_REPLACE_CLASSIFICATION_LEVEL",
+            "MATCH_AND_REPLACE_AUDITOR_COMPANY_NAME",
+            "MATCH_AND_REPLACE_TEMPLATE_DIR",
+            "MATCH_AND_REPLACE_PDF_THEME",
+            "MATCH_AND_REPLACE_REPO_URL",
+            "MATCH_AND_REPLACE_PROJECT_VERSION",
+        }
+    ),
+    "introduction.adoc": frozenset(
+        {
+            "MATCH_AND_REPLACE_PARTICIPANTS",
+            "MATCH_AND_REPLACE_ROLE",
+            "MATCH_AND_REPLACE_CONTACT_INFORMATION",
+            "MATCH_AND_REPLACE_AUDITEE",
+            "MATCH_AND_REPLACE_ARRAY_AUDITEE",
+            "MATCH_AND_REPLACE_PROJECT_MANAGEMENT",
+            "MATCH_AND_REPLACE_AUTHORS",
+            "MATCH_AND_REPLACE_ARRAY_AUTHORS",
+            "MATCH_AND_REPLACE_MODIFICATION_HISTORY",
+            "MATCH_AND_REPLACE_AUTHOR",
+            "MATCH_AND_REPLACE_REPORT_WRITING",
+        }
+    ),
+    "synthesis.adoc": frozenset(
+        {
+            "MATCH_AND_REPLACE_NC_SUMMARY_TITLE",
+            "MATCH_AND_REPLACE_RULE_NAME",
+            "MATCH_AND_REPLACE_RULE_LEVEL",
+            "MATCH_AND_REPLACE_RULE_SEVERITY",
+            "MATCH_AND_REPLACE_NON_CONFORMITY",
+        }
+    ),
+    "delta.adoc": frozenset(
+        {
+            "MATCH_AND_REPLACE_RULE_NAME",
+            "MATCH_AND_REPLACE_RESULT",
+            "MATCH_AND_REPLACE_RULE_LEVEL",
+            "MATCH_AND_REPLACE_RULE_SEVERITY",
+            "MATCH_AND_REPLACE_CHANGED_RULES",
+            "MATCH_AND_REPLACE_UNCHANGED_COUNT",
+        }
+    ),
+    "fleet.adoc": frozenset(
+        {
+            "MATCH_AND_REPLACE_HOST_COUNT",
+            "MATCH_AND_REPLACE_RULE_NAME",
+            "MATCH_AND_REPLACE_RULE_LEVEL",
+            "MATCH_AND_REPLACE_RULE_SEVERITY",
+            "MATCH_AND_REPLACE_FAILED",
+            "MATCH_AND_REPLACE_FAILING_RULES",
+            "MATCH_AND_REPLACE_COMPLIANT_COUNT",
+        }
+    ),
+    "fleet_hosts.adoc": frozenset(
+        {
+            "MATCH_AND_REPLACE_FAILING_COUNT",
+            "MATCH_AND_REPLACE_CHECKED_COUNT",
+            "MATCH_AND_REPLACE_HOST",
+            "MATCH_AND_REPLACE_TERMINAL_OUTPUT",
+            "MATCH_AND_REPLACE_FAILING_HOSTS",
+        }
+    ),
+}
+
+# Templates which a custom theme may omit: the ones of the default theme are used instead
+OPTIONAL_TEMPLATES: FrozenSet[str] = frozenset({"delta.adoc", "fleet.adoc", "fleet_hosts.adoc"})
+
+# The synthesis must at least list the non-conformities, the delta the changed rules and the
+# fleet report the failing rules and hosts
+REQUIRED_PLACEHOLDERS: Dict[str, FrozenSet[str]] = {
+    "synthesis.adoc": frozenset({"MATCH_AND_REPLACE_NON_CONFORMITY"}),
+    "delta.adoc": frozenset({"MATCH_AND_REPLACE_CHANGED_RULES"}),
+    "fleet.adoc": frozenset({"MATCH_AND_REPLACE_FAILING_RULES"}),
+    "fleet_hosts.adoc": frozenset({"MATCH_AND_REPLACE_FAILING_HOSTS"}),
+}
+
+_PLACEHOLDER_REGEX = re.compile(r"MATCH_AND_REPLACE_[A-Z_]+")
+
+
+@dataclass(frozen=True)
+class Theme:
+    name: str
+    directory: Path
+    # Problems found by the validation, the theme cannot be used when there are errors
+    errors: Tuple[str, ...] = ()
+    warnings: Tuple[str, ...] = ()
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    @property
+    def header_file(self) -> Path:
+        return self.directory / "header.adoc"
+
+    @property
+    def introduction_file(self) -> Path:
+        return self.directory / "introduction.adoc"
+
+    @property
+    def synthesis_file(self) -> Path:
+        return self.directory / "synthesis.adoc"
+
+    def optional_file(self, name: str, default_directory: Path) -> Path:
+        """
+        Returns the template `name` of the theme, or the one of the default theme when the theme
+        does not have it (see `OPTIONAL_TEMPLATES`).
+        """
+        path = self.directory / name
+        return path if path.exists() else default_directory / name
+
+    @property
+    def images_dir(self) -> Path:
+        return self.directory / "resources" / "images"
+
+    @property
+    def themes_dir(self) -> Path:
+        return self.directory / "resources" / "themes"
+
+
+@dataclass
+class _CachedTemplate:
+    mtime_ns: int
+    content: str
+    placeholders: FrozenSet[str] = field(default_factory=frozenset)
+
+
+class TemplateRegistry:
+    """
+    Discovers the themes of a template directory (`default` and `custom/*`) once, validates their
+    templates and keeps their content in memory.
+
+    A template is read again only when its modification time changed, and the themes are
+    discovered again when the `custom` directory changed (a theme was added or removed), so a
+    batch over many themes reads each template file once.
+    """
+
+    def __init__(self, template_dir: Path) -> None:
+        self._template_dir = Path(template_dir)
+        self._lock = threading.RLock()
+        self._templates: Dict[Path, _CachedTemplate] = dict()
+        self._themes: Dict[str, Theme] = dict()
+        self._custom_mtime_ns: Optional[int] = None
+        logger.info(f"Init TemplateRegistry with template_dir = {self._template_dir}")
+
+    def _mtime_ns(self, path: Path) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _load(self, path: Path) -> Optional[_CachedTemplate]:
+        mtime_ns = self._mtime_ns(path)
+        if mtime_ns is None:
+            self._templates.pop(path, None)
+            return None
+
+        cached = self._templates.get(path)
+        if cached is None or cached.mtime_ns != mtime_ns:
+            logger.debug(f"Reading template {path}")
+            with open(path, "r") as file:
+                content = file.read()
+            cached = _CachedTemplate(
+                mtime_ns, content, frozenset(_PLACEHOLDER_REGEX.findall(content))
+            )
+            self._templates[path] = cached
+        return cached
+
+    def read(self, path: Path) -> str:
+        """
+        Returns the content of the template `path`, from memory unless the file changed.
+        """
+        with self._lock:
+            cached = self._load(Path(path))
+        if cached is None:
+            raise FileNotFoundError(f"No such template: '{path}'")
+        return cached.content
+
+    def _validate(self, name: str, directory: Path) -> Theme:
+        errors: List[str] = []
+        warnings: List[str] = []
+        for template, known in TEMPLATE_PLACEHOLDERS.items():
+            cached = self._load(directory / template)
+            if cached is None and template in OPTIONAL_TEMPLATES:
+                continue
+            if cached is None:
+                errors.append(f"'{template}' does not exist")
+                continue
+
+            missing = REQUIRED_PLACEHOLDERS.get(template, frozenset()) - cached.placeholders
+            if missing:
+                errors.append(f"'{template}' does not contain {sorted(missing)}")
+            unknown = cached.placeholders - known
+            if unknown:
+                warnings.append(
+                    f"'{template}' contains unknown placeholders, which will not be replaced: {sorted(unknown)}"
+                )
+
+        if not (directory / "resources" / "themes").is_dir():
+            warnings.append("'resources/themes' does not exist")
+
+        return Theme(name, directory, tuple(errors), tuple(warnings))
+
+    def _discover(self) -> None:
+        custom_dir = self._template_dir / "custom"
+        custom_mtime_ns = self._mtime_ns(custom_dir)
+        if self._themes and custom_mtime_ns == self._custom_mtime_ns:
+            return
+
+        directories = {"default": self._template_dir / "default"}
+        if custom_mtime_ns is not None:
+            directories.update(
+                (path.name, path) for path in sorted(custom_dir.iterdir()) if path.is_dir()
+            )
+
+        self._themes = {
+            name: self._validate(name, directory) for name, directory in directories.items()
+        }
+        self._custom_mtime_ns = custom_mtime_ns
+        logger.debug(f"Discovered themes: {list(self._themes)}")
+
+    def themes(self) -> Dict[str, Theme]:
+        with self._lock:
+            self._discover()
+            return dict(self._themes)
+
+    def get_theme(self, name: str) -> Optional[Theme]:
+        """
+        Returns the theme `name`, validated again if one of its templates changed, or None when
+        it does not exist.
+        """
+        with self._lock:
+            self._discover()
+            theme = self._themes.get(name)
+            if theme is None:
+                return None
+
+            # The templates are kept in memory: checking their mtime is enough to know whether
+            # the validation is still up to date
+            if any(
+                self._templates.get(path) is None
+                or self._templates[path].mtime_ns != self._mtime_ns(path)
+                for path in (theme.header_file, theme.introduction_file, theme.synthesis_file)
+            ):
+                theme = self._themes[name] = self._validate(name, theme.directory)
+            return theme
+
+
+@lru_cache(maxsize=None)
+def get_template_registry(template_dir: Path) -> TemplateRegistry:
+    """
+    Returns the registry of `template_dir`, shared by all the generators of the process.
+    """
+    return TemplateRegistry(template_dir)
@@ -0,0 +1,222 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from octoconf.utils.logger import *
+
+from .artifact_cache import directory_fingerprint, fingerprint, results_fingerprint
+from .generate_pdf import PDFGenerator
+from .generate_report import to_xls_report_information
+from .generate_xls import XLSGenerator
+from .report_model import ReportModel
+from .workspace import WorkspaceManager
+
+if TYPE_CHECKING:
+    from octoconf.entities.baseline import Baseline
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class WatchResult:
+    # Paths of the regenerated reports, None when the report was up to date
+    pdf: Optional[Path]
+    xlsx: Optional[Path]
+    elapsed: float
+
+
+class ReportWatcher:
+    """
+    Watches the results file, the ini file and the theme folder, and regenerates the reports
+    when they change.
+
+    The files are polled every `interval` seconds, and a generation starts once they did not
+    change for `debounce` seconds, so that a burst of saves triggers a single generation. Only
+    the reports whose inputs actually changed are generated again (e.g. a template change only
+    rebuilds the PDF report), and only the changed AsciiDoc fragments are rewritten. A given
+    `pdf_generator` must have a workspace manager and be created with `reuse_workspaces`,
+    otherwise all the fragments are written again by each generation.
+
+    `load_results` reads the results file into a `Baseline`.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        results_file: Path,
+        load_results: Callable[[Path], Baseline],
+        output_directory: Path,
+        ini_file: Optional[Path] = None,
+        theme_dir: str = "default",
+        pdf_theme: str = "default.yml",
+        pdf: bool = True,
+        xlsx: bool = True,
+        report_date: Optional[str] = None,
+        interval: float = 0.5,
+        debounce: float = 1.0,
+        pdf_generator: Optional[PDFGenerator] = None,
+        xls_generator: Optional[XLSGenerator] = None,
+    ) -> None:
+        self._filename = filename
+        self._results_file = Path(results_file)
+        self._load_results = load_results
+        self._output_directory = output_directory
+        self._ini_file = ini_file
+        self._theme_dir = theme_dir
+        self._pdf_theme = pdf_theme
+        self._pdf = pdf
+        self._xlsx = xlsx
+        self._report_date = report_date
+        self._interval = interval
+        self._debounce = debounce
+        self._pdf_generator = pdf_generator or PDFGenerator(
+            workspace_manager=WorkspaceManager(), reuse_workspaces=True
+        )
+        self._xls_generator = xls_generator or XLSGenerator()
+
+        # Fingerprints of the inputs of the last generated reports
+        self._pdf_inputs: Optional[str] = None
+        self._xlsx_inputs: Optional[str] = None
+        # Without ini file, the information is prompted once
+        self._prompted_information: Optional[dict] = None
+        logger.info(
+            f"Init ReportWatcher with results_file = {self._results_file}, ini_file = {ini_file}, theme_dir = {theme_dir}, interval = {interval}, debounce = {debounce}"
+        )
+
+    def _watched_files(self):
+        yield self._results_file
+        if self._ini_file:
+            yield Path(self._ini_file)
+        if self._pdf:
+            theme_directory = self._pdf_generator._get_theme_directory(self._theme_dir)
+            yield from theme_directory.rglob("*")
+
+    def _snapshot(self) -> Dict[Path, int]:
+        snapshot = dict()
+        for path in self._watched_files():
+            try:
+                snapshot[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+        return snapshot
+
+    def _load_report_information(self, baseline_title: str) -> dict:
+        if self._ini_file:
+            return self._pdf_generator._initialize_report_from_ini(
+                self._filename, baseline_title, self._ini_file, self._report_date
+            )
+        if self._prompted_information is None:
+            self._prompted_information = self._pdf_generator._initialize_report(
+                self._filename, baseline_title, self._report_date
+            )
+        return self._prompted_information
+
+    def regenerate(self) -> WatchResult:
+        """
+        Generates the reports whose inputs changed since the last generation.
+        """
+        start = time.perf_counter()
+        baseline = self._load_results(self._results_file)
+        results_key = results_fingerprint(baseline)
+        report_information = self._load_report_information(baseline.title)
+        xls_report_information = to_xls_report_information(report_information)
+
+        pdf_inputs = None
+        if self._pdf:
+            theme_directory = self._pdf_generator._get_theme_directory(self._theme_dir)
+            pdf_inputs = fingerprint(
+                results_key,
+                report_information,
+                directory_fingerprint(theme_directory),
+                self._pdf_theme,
+            )
+        xlsx_inputs = fingerprint(results_key, xls_report_information) if self._xlsx else None
+
+        model = None
+        pdf_path = xlsx_path = None
+        if pdf_inputs is not None and pdf_inputs != self._pdf_inputs:
+            model = ReportModel.build(baseline)
+            pdf_path = self._pdf_generator.generate_pdf(
+                self._filename,
+                baseline,
+                self._output_directory,
+                ini_file=self._ini_file,
+                theme_dir=self._theme_dir,
+                pdf_theme=self._pdf_theme,
+                model=model,
+                report_information=report_information,
+            )
+            if pdf_path is not None:
+                self._pdf_inputs = pdf_inputs
+
+        if xlsx_inputs is not None and xlsx_inputs != self._xlsx_inputs:
+            xlsx_path = self._xls_generator.generate_xls(
+                self._filename,
+                baseline,
+                self._output_directory,
+                ini_file=self._ini_file,
+                model=model or ReportModel.build(baseline),
+                report_information=xls_report_information,
+            )
+            self._xlsx_inputs = xlsx_inputs
+
+        result = WatchResult(pdf_path, xlsx_path, time.perf_counter() - start)
+        if pdf_path is None and xlsx_path is None:
+            logger.info("The reports are up to date")
+        else:
+            logger.info(f"Reports regenerated: {result}")
+        return result
+
+    def watch(self, stop: Optional[threading.Event] = None) -> None:
+        """
+        Generates the reports, then regenerates them on each change until `stop` is set (or
+        forever).
+        """
+        stop = stop or threading.Event()
+        try:
+            self._watch(stop)
+        finally:
+            # The workspaces kept between the generations
+            self._pdf_generator.close()
+
+    def _watch(self, stop: threading.Event) -> None:
+        snapshot = self._snapshot()
+        self._safe_regenerate()
+
+        while not stop.wait(self._interval):
+            current = self._snapshot()
+            if current == snapshot:
+                continue
+
+            # Debounce: wait until the files are stable
+            logger.debug("Change detected, waiting for the files to be stable")
+            while not stop.wait(self._debounce):
+                stable = self._snapshot()
+                if stable == current:
+                    break
+                current = stable
+            if stop.is_set():
+                break
+
+            snapshot = current
+            self._safe_regenerate()
+
+    def _safe_regenerate(self) -> Optional[WatchResult]:
+        # A results file saved while being edited may not be readable: wait for the next change
+        try:
+            return self.regenerate()
+        except Exception:
+            logger.exception("Unable to regenerate the reports")
+            return None
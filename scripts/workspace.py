@@ -0,0 +1,220 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+import errno
+import logging
+import os
+from pathlib import Path
+import shutil
+import socket
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from octoconf.utils.logger import *
+
+logger = logging.getLogger(__name__)
+
+# Written in each workspace, to know whether the run owning it is still alive
+_OWNER_FILE = ".owner"
+
+
+def _default_root() -> Path:
+    # tmpfs first: the intermediate files never hit the disk
+    shm = Path("/dev/shm")
+    if shm.is_dir() and os.access(shm, os.W_OK | os.X_OK):
+        return shm / "octowriter"
+    return Path(tempfile.gettempdir()) / "octowriter"
+
+
+def write_owner(directory: Path) -> None:
+    """
+    Records the current process as the owner of `directory` (see `owner_is_running`).
+    """
+    (directory / _OWNER_FILE).write_text(f"{socket.gethostname()} {os.getpid()}")
+
+
+def owner_is_running(directory: Path) -> bool:
+    """
+    Returns whether the process recorded by `write_owner` in `directory` is still running. An
+    owner on another host cannot be checked and is considered running.
+    """
+    try:
+        hostname, pid = (directory / _OWNER_FILE).read_text().split()
+    except (FileNotFoundError, ValueError):
+        return False
+    if hostname != socket.gethostname():
+        # Cannot be checked from this host
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _directory_size(path: Path) -> int:
+    size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.lstat(os.path.join(root, name)).st_size
+            except FileNotFoundError:
+                continue
+    return size
+
+
+class Workspace:
+    """
+    Scratch directory of a single generation run. The intermediate files (AsciiDoc fragments,
+    extracted XLSX, ...) are written there, and only the final artifacts are promoted to the
+    output directory.
+    """
+
+    def __init__(self, path: Path, keep: bool = False) -> None:
+        self.path = path
+        self.build_dir = path / "build" / "adoc"
+        self._keep = keep
+
+    def __enter__(self) -> "Workspace":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def promote(self, artifact: Path, output_directory: Path) -> Path:
+        """
+        Moves `artifact` into `output_directory` and returns its new path. The artifact appears
+        atomically: a reader never sees a partial report.
+        """
+        destination = output_directory / artifact.name
+        try:
+            os.replace(artifact, destination)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Another file system (e.g. tmpfs): copied next to the destination, then renamed
+            fd, tmp = tempfile.mkstemp(dir=output_directory, prefix=f".{artifact.name}.")
+            try:
+                with os.fdopen(fd, "wb") as file, open(artifact, "rb") as src:
+                    shutil.copyfileobj(src, file)
+                os.replace(tmp, destination)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+            artifact.unlink()
+
+        logger.debug(f"Promoted {artifact} to {destination}")
+        return destination
+
+    def close(self) -> None:
+        if self._keep:
+            # Kept for debugging, until collected by the manager
+            (self.path / _OWNER_FILE).unlink(missing_ok=True)
+            logger.info(f"Workspace kept: {self.path}")
+        else:
+            shutil.rmtree(self.path, ignore_errors=True)
+
+
+class WorkspaceManager:
+    """
+    Allocates the per-run workspaces under `root` (on tmpfs when available), and garbage
+    collects the ones left behind by killed runs (or kept with `keep`): those older than
+    `max_age` seconds, then the oldest ones until all the workspaces fit in `max_size` bytes.
+    The workspaces of running generations are never collected.
+    """
+
+    # Minimum delay between two automatic collections, in seconds
+    collect_interval = 60.0
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        max_age: float = 24 * 3600,
+        max_size: int = 1 << 30,
+        keep: bool = False,
+    ) -> None:
+        self.root = Path(root) if root else _default_root()
+        self.max_age = max_age
+        self.max_size = max_size
+        self._keep = keep
+        self._lock = threading.Lock()
+        self._last_collect = 0.0
+        self.root.mkdir(parents=True, exist_ok=True)
+        logger.info(
+            f"Init WorkspaceManager with root = {self.root}, max_age = {max_age}, max_size = {max_size}"
+        )
+
+    def create(self, prefix: str = "run-") -> Workspace:
+        with self._lock:
+            collect = time.monotonic() - self._last_collect > self.collect_interval
+            if collect:
+                self._last_collect = time.monotonic()
+        if collect:
+            self.collect()
+
+        path = Path(tempfile.mkdtemp(prefix=prefix, dir=self.root))
+        write_owner(path)
+        logger.debug(f"Created workspace {path}")
+        return Workspace(path, self._keep)
+
+    def collect(self) -> int:
+        """
+        Removes the workspaces left behind which are too old, then the oldest ones while over
+        `max_size`. Returns the number of removed workspaces.
+        """
+        workspaces: List[Tuple[float, Path]] = []
+        for path in self.root.iterdir():
+            try:
+                if path.is_dir():
+                    workspaces.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+
+        now = time.time()
+        removed = 0
+        total = 0
+        candidates: List[Tuple[Path, int]] = []
+        for mtime, path in sorted(workspaces):
+            size = _directory_size(path)
+            if owner_is_running(path):
+                total += size
+            elif now - mtime > self.max_age:
+                logger.debug(f"Removing stale workspace {path}")
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+            else:
+                total += size
+                candidates.append((path, size))
+
+        # Oldest first
+        for path, size in candidates:
+            if total <= self.max_size:
+                break
+            logger.debug(f"Removing workspace {path} ({size} bytes) to fit in {self.max_size} bytes")
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+
+        if removed:
+            logger.info(f"Removed {removed} workspaces from {self.root}")
+        return removed
+
+    @staticmethod
+    def clean_output_directory(output_directory: Path) -> None:
+        """
+        Removes the intermediate files written into `output_directory` by the generations run
+        without workspace: the `build/adoc` folder and the `<report>_extract` folders.
+        """
+        for path in [output_directory / "build" / "adoc", *output_directory.glob("*_extract")]:
+            if path.is_dir():
+                logger.debug(f"Removing {path}")
+                shutil.rmtree(path, ignore_errors=True)
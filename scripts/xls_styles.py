@@ -0,0 +1,122 @@
+# @copyright Copyright (c) 2021 Nicolas GRELLETY
+# @license https://opensource.org/licenses/GPL-3.0 GNU GPLv3
+# @link https://gitlab.internal.lan/octo-project/octowriter
+# @link https://github.com/nillyr/octowriter
+# @since 1.0.0
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from functools import lru_cache
+import logging
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Mapping, Tuple
+
+from octoconf.utils.logger import *
+
+from .lazy_import import lazy_import
+
+if TYPE_CHECKING:
+    import xlsxwriter
+
+config = lazy_import("octoconf.utils.config")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StyleSheet:
+    """
+    Immutable description of the formats used by the XLSX reports.
+
+    The configuration is read once when the style sheet is compiled, then the same style sheet
+    can be bound to any number of workbooks.
+    """
+
+    formats: Mapping[str, Mapping[str, object]]
+    success_color: str
+    failed_color: str
+    classification_options: Tuple[str, ...]
+
+    def bind(
+        self, wb: xlsxwriter.workbook.Workbook
+    ) -> Dict[str, xlsxwriter.workbook.Format]:
+        return {name: wb.add_format(dict(values)) for name, values in self.formats.items()}
+
+
+def _format(
+    bold: int, border: int, align: str, font_color: str, bg_color: str, **kwargs
+) -> Mapping[str, object]:
+    values = {
+        "bold": bold,
+        "border": border,
+        "align": align,
+        "valign": "vcenter",
+        "font_color": font_color,
+        "bg_color": bg_color,
+    }
+    values.update(kwargs)
+    return MappingProxyType(values)
+
+
+@lru_cache(maxsize=None)
+def compile_style_sheet() -> StyleSheet:
+    """
+    Reads the color and classification configuration and compiles the style sheet.
+
+    The result is cached, so that all the workbooks of a batch share the same style sheet.
+    Call `compile_style_sheet.cache_clear()` to take a configuration change into account.
+    """
+    header_font_color = config.get_config("report_colors", "header_font_color")
+    header_bg_color = config.get_config("report_colors", "header_background_color")
+    sub_header_bg_color = config.get_config(
+        "report_colors", "sub_header_background_color"
+    )
+    default_font_color = config.get_config("report_colors", "default_font_color")
+    default_bg_color = config.get_config("report_colors", "default_background_color")
+    success_color = config.get_config("status_colors", "success")
+    failed_color = config.get_config("status_colors", "failed")
+    to_be_defined_color = config.get_config("status_colors", "to_be_defined")
+    classification_font_color = config.get_config(
+        "classification", "classification_font_color"
+    )
+    classification_bg_color = config.get_config(
+        "classification", "classification_background_color"
+    )
+    classification_options = tuple(
+        option.lstrip()[0:31]
+        for option in config.get_config(
+            "classification", "classification_options"
+        ).split(",")
+    )
+
+    # fmt:off
+    formats = {
+        "information_header": _format(1, 1, "center", header_font_color, header_bg_color, font_size=14),
+        "header": _format(1, 1, "center", header_font_color, header_bg_color),
+        "sub_header": _format(0, 1, "center", header_font_color, sub_header_bg_color),
+        "minimal": _format(1, 1, "center", config.get_config("level_colors", "lvl_minimal"), default_bg_color),
+        "intermediary": _format(1, 1, "center", config.get_config("level_colors", "lvl_intermediary"), default_bg_color),
+        "enhanced": _format(1, 1, "center", config.get_config("level_colors", "lvl_enhanced"), default_bg_color),
+        "high": _format(1, 1, "center", config.get_config("level_colors", "lvl_high"), default_bg_color),
+        "check": _format(0, 1, "left", default_font_color, default_bg_color),
+        "success": _format(1, 1, "center", success_color, default_bg_color),
+        "failed": _format(1, 1, "center", failed_color, default_bg_color),
+        "na": _format(1, 1, "center", to_be_defined_color, default_bg_color),
+        "bold": _format(1, 1, "left", default_font_color, default_bg_color),
+        "regular": _format(0, 1, "left", default_font_color, default_bg_color),
+        "classification": _format(0, 1, "left", classification_font_color, classification_bg_color),
+        "classification_center": _format(0, 0, "center", classification_font_color, classification_bg_color),
+        "percentage": _format(0, 1, "center", default_font_color, default_bg_color, num_format="0%"),
+        "heatmap_success": _format(0, 1, "center", success_color, success_color),
+        "heatmap_failed": _format(0, 1, "center", failed_color, failed_color),
+    }
+    # fmt:on
+
+    logger.debug(f"Compiled XLSX style sheet: {formats}")
+    return StyleSheet(
+        formats=MappingProxyType(formats),
+        success_color=success_color,
+        failed_color=failed_color,
+        classification_options=classification_options,
+    )